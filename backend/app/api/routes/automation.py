@@ -5,6 +5,7 @@ from typing import List, Optional
 from datetime import datetime, timedelta
 from app.database.connection import get_db
 from app.database.models import AutomationSequence, Lead
+from app.services.changes import record_change
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -63,6 +64,7 @@ async def create_automation_sequence(sequence_data: AutomationSequenceCreate, db
     
     sequence = AutomationSequence(**sequence_data.dict())
     db.add(sequence)
+    record_change(db, "sequence", sequence, "insert")
     db.commit()
     db.refresh(sequence)
     
@@ -85,6 +87,7 @@ async def update_sequence_status(
     
     sequence.status = status
     sequence.updated_at = datetime.utcnow()
+    record_change(db, "sequence", sequence)
     
     db.commit()
     
@@ -109,6 +112,7 @@ async def delete_sequence(sequence_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Automation sequence not found")
     
     db.delete(sequence)
+    record_change(db, "sequence", sequence, "delete")
     db.commit()
     
     return {"message": "Sequence deleted successfully"}
@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.database.connection import get_db
+from app.database.enums import CONTRACT_STATUS
 from app.database.models import Contract
+from app.services.changes import record_change
+from app.services.fieldsets import CONTRACT_FIELDS
+from app.services.contract_events import daily_metrics, get_contract_event_buffer, parse_event_counts
+from app.services.images import image_url
+from app.services.rekey import renamed_id
+from app.services.rollups import record_sale, sale_contribution
 from pydantic import BaseModel
 
 router = APIRouter()
 
 class ContractResponse(BaseModel):
     id: str
+    property_id: Optional[str] = None
     owner_name: str
     owner_name_en: Optional[str] = None
     property_type: Optional[str] = None
@@ -39,6 +48,7 @@ class ContractResponse(BaseModel):
         orm_mode = True
 
 class ContractCreate(BaseModel):
+    property_id: Optional[str] = None
     owner_name: str
     owner_name_en: Optional[str] = None
     property_type: str
@@ -60,12 +70,33 @@ class ContractStats(BaseModel):
 
 @router.get("/", response_model=List[ContractResponse])
 async def get_contracts(
+    request: Request,
     status: Optional[str] = None,
     limit: int = Query(50, le=500),
     offset: int = Query(0, ge=0),
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get contracts with optional filtering"""
+    """Get contracts with optional filtering; `fields=id,status,...` returns and reads only those"""
+    
+    # Serve the small stored variant instead of the remote original once ingested
+    base_url = str(request.base_url).rstrip("/")
+    
+    if fields:
+        contract_fields = CONTRACT_FIELDS.extend(property_image=(
+            ("image_ref", "property_image"),
+            lambda row: base_url + image_url(row.image_ref, "thumbnail") if row.image_ref else row.property_image
+        ))
+        try:
+            names = contract_fields.parse(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = db.query(*[Contract.__table__.c[name] for name in contract_fields.columns(names)])
+        if status:
+            query = query.filter(Contract.status == status)
+        rows = query.order_by(desc(Contract.created_at)).offset(offset).limit(limit).all()
+        # Partial objects don't fit ContractResponse; returned as plain JSON
+        return JSONResponse([contract_fields.serialize(row, names) for row in rows])
     
     query = db.query(Contract)
     
@@ -73,7 +104,14 @@ async def get_contracts(
         query = query.filter(Contract.status == status)
     
     contracts = query.order_by(desc(Contract.created_at)).offset(offset).limit(limit).all()
-    return contracts
+    
+    result = []
+    for contract in contracts:
+        response = ContractResponse.from_orm(contract)
+        if contract.image_ref:
+            response.property_image = base_url + image_url(contract.image_ref, "thumbnail")
+        result.append(response)
+    return result
 
 @router.get("/stats", response_model=ContractStats)
 async def get_contract_stats(db: Session = Depends(get_db)):
@@ -118,6 +156,7 @@ async def get_contract_stats(db: Session = Depends(get_db)):
 @router.get("/{contract_id}", response_model=ContractResponse)
 async def get_contract(contract_id: str, db: Session = Depends(get_db)):
     """Get specific contract details"""
+    contract_id = renamed_id(db, contract_id) or contract_id
     
     contract = db.query(Contract).filter(Contract.id == contract_id).first()
     if not contract:
@@ -128,6 +167,10 @@ async def get_contract(contract_id: str, db: Session = Depends(get_db)):
 @router.post("/", response_model=ContractResponse)
 async def create_contract(contract_data: ContractCreate, db: Session = Depends(get_db)):
     """Create a new contract"""
+    try:
+        CONTRACT_STATUS.validate(contract_data.status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Calculate commission amount
     commission_amount = (contract_data.listing_price * contract_data.commission_rate / 100) if contract_data.listing_price else 0
@@ -141,6 +184,7 @@ async def create_contract(contract_data: ContractCreate, db: Session = Depends(g
     
     contract = Contract(**contract_dict)
     db.add(contract)
+    record_change(db, "contract", contract, "insert")
     db.commit()
     db.refresh(contract)
     
@@ -155,15 +199,18 @@ async def update_contract_status(
     db: Session = Depends(get_db)
 ):
     """Update contract status"""
+    contract_id = renamed_id(db, contract_id) or contract_id
     
-    valid_statuses = ["listed", "under_offer", "sold", "expired"]
-    if status not in valid_statuses:
-        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
+    try:
+        CONTRACT_STATUS.validate(status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     contract = db.query(Contract).filter(Contract.id == contract_id).first()
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
     
+    sold_before = sale_contribution(contract)
     contract.status = status
     
     if status == "sold" and sale_price:
@@ -179,6 +226,8 @@ async def update_contract_status(
         contract.notes = notes
     
     contract.updated_at = datetime.utcnow()
+    record_change(db, "contract", contract)
+    record_sale(db, sold_before, sale_contribution(contract))
     
     db.commit()
     
@@ -187,6 +236,7 @@ async def update_contract_status(
 @router.put("/{contract_id}/commission/paid")
 async def mark_commission_paid(contract_id: str, db: Session = Depends(get_db)):
     """Mark commission as paid"""
+    contract_id = renamed_id(db, contract_id) or contract_id
     
     contract = db.query(Contract).filter(Contract.id == contract_id).first()
     if not contract:
@@ -194,6 +244,7 @@ async def mark_commission_paid(contract_id: str, db: Session = Depends(get_db)):
     
     contract.commission_paid = True
     contract.updated_at = datetime.utcnow()
+    record_change(db, "contract", contract)
     
     db.commit()
     
@@ -209,6 +260,10 @@ async def update_contract_metrics(
     db: Session = Depends(get_db)
 ):
     """Update contract performance metrics"""
+    contract_id = renamed_id(db, contract_id) or contract_id
+    
+    # Increments recorded before this overwrite must not land on top of it
+    get_contract_event_buffer().flush()
     
     contract = db.query(Contract).filter(Contract.id == contract_id).first()
     if not contract:
@@ -224,20 +279,57 @@ async def update_contract_metrics(
         contract.offers = offers
     
     contract.updated_at = datetime.utcnow()
+    record_change(db, "contract", contract)
     
     db.commit()
     
     return {"message": "Contract metrics updated"}
 
+@router.post("/{contract_id}/events", status_code=202)
+async def record_contract_events(contract_id: str, events: dict, db: Session = Depends(get_db)):
+    """Count listing views / inquiries / viewings / offers; written in periodic batches"""
+    contract_id = renamed_id(db, contract_id) or contract_id
+    
+    try:
+        counts = parse_event_counts(events)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not db.query(Contract.id).filter(Contract.id == contract_id).first():
+        raise HTTPException(status_code=404, detail="Contract not found")
+    
+    get_contract_event_buffer().record(contract_id, counts)
+    return {"message": "Events recorded", "recorded": counts}
+
+@router.get("/{contract_id}/metrics/daily")
+async def get_contract_daily_metrics(
+    contract_id: str,
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_db)
+):
+    """Daily engagement series of a contract"""
+    contract_id = renamed_id(db, contract_id) or contract_id
+    
+    if not db.query(Contract.id).filter(Contract.id == contract_id).first():
+        raise HTTPException(status_code=404, detail="Contract not found")
+    
+    return {
+        "contract_id": contract_id,
+        "days": daily_metrics(db, contract_id, days),
+        "pending": get_contract_event_buffer().pending(contract_id)
+    }
+
 @router.delete("/{contract_id}")
 async def delete_contract(contract_id: str, db: Session = Depends(get_db)):
     """Delete a contract"""
+    contract_id = renamed_id(db, contract_id) or contract_id
     
     contract = db.query(Contract).filter(Contract.id == contract_id).first()
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
     
+    record_sale(db, sale_contribution(contract), None)
     db.delete(contract)
+    record_change(db, "contract", contract, "delete")
     db.commit()
     
     return {"message": "Contract deleted successfully"} 
\ No newline at end of file
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
 from typing import List, Optional
 from datetime import datetime
 import json
 from app.database.connection import get_db
-from app.database.models import Lead
+from app.database.enums import LEAD_STATUS
+from app.database.models import ArchivedLead, Lead
+from app.database.shards import get_shard_router
+from app.services.archive import archived_status_counts, lead_listing, restore_leads
+from app.services.call_queue import CALL_QUEUE_SIZE, call_queue_key, call_queue_query, format_window, minute_of_day
+from app.services.caller_id import lookup_phone
+from app.services.changes import record_change
+from app.services.fieldsets import CONTRACT_FIELDS, LEAD_FIELDS
+from app.services.images import image_url, lead_image_refs
+from app.services.lead_status import lead_filter, update_statuses_by_filter, update_statuses_by_id
+from app.services.payload_store import get_payload_store
+from app.services.rekey import renamed_id
+from app.services.rollups import record_funnel
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -44,6 +57,12 @@ class LeadCreate(BaseModel):
     property_value: Optional[float] = None
     source: str = "manual"
 
+class LeadStatusBatch(BaseModel):
+    status: str
+    notes: Optional[str] = None
+    lead_ids: Optional[List[str]] = None
+    filter: Optional[dict] = None
+
 class CallQueueLead(BaseModel):
     id: str
     score: int
@@ -57,19 +76,29 @@ class CallQueueLead(BaseModel):
     last_response: str
     response_time: str
     best_call_time: str
+    call_window: Optional[dict] = None  # {"from": "HH:MM", "to": "HH:MM"}, Bangkok time
     automation_stage: str
     urgency: str
-    property_image: str
+    property_image: Optional[str] = None
 
 @router.get("/call-queue", response_model=List[CallQueueLead])
-async def get_call_queue(db: Session = Depends(get_db)):
+async def get_call_queue(
+    request: Request,
+    sort_by: str = "score",
+    callable_now: bool = False,
+    db: Session = Depends(get_db)
+):
     """Get priority leads ready for calling"""
+    try:
+        call_queue_key(sort_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Get high-priority leads
-    leads = db.query(Lead).filter(
-        Lead.status.in_(["interested", "responded", "new"]),
-        Lead.lead_score >= 70
-    ).order_by(desc(Lead.lead_score)).limit(20).all()
+    minute = minute_of_day() if callable_now else None
+    leads = call_queue_query(db, sort_by, minute).limit(CALL_QUEUE_SIZE).all()
+    image_refs = lead_image_refs(db, [lead.id for lead in leads])
+    base_url = str(request.base_url).rstrip("/")
     
     # Convert to call queue format
     call_queue_leads = []
@@ -87,31 +116,83 @@ async def get_call_queue(db: Session = Depends(get_db)):
             last_response=lead.notes or "Initial contact needed",
             response_time="2 hours ago" if lead.last_contact else "No response yet",
             best_call_time=lead.best_call_time or "9 AM - 5 PM",
+            call_window=format_window(lead.call_window_start, lead.call_window_end),
             automation_stage=lead.automation_stage or "initial_contact",
             urgency=lead.urgency,
-            property_image="https://images.unsplash.com/photo-1613490493576-7fde63acd811?w=400"
+            property_image=base_url + image_url(image_refs[lead.id], "card") if lead.id in image_refs else None
         ))
     
     return call_queue_leads
 
+@router.get("/by-phone/{number}")
+async def get_lead_by_phone(number: str, request: Request):
+    """Caller ID: the lead with this phone number, in any format, and its latest contract"""
+    try:
+        found = lookup_phone(get_shard_router(), number)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=404, detail="No lead with this phone number")
+    
+    contract = found["contract"]
+    if contract is not None:
+        base_url = str(request.base_url).rstrip("/")
+        contract = {
+            **CONTRACT_FIELDS.serialize(contract, CONTRACT_FIELDS.parse(None)),
+            "property_image": base_url + image_url(contract.image_ref, "thumbnail") if contract.image_ref
+            else contract.property_image
+        }
+    return JSONResponse({
+        "phone_key": found["phone_key"],
+        "lead": {**LEAD_FIELDS.serialize(found["lead"], LEAD_FIELDS.parse(None)), "archived": found["archived"]},
+        "contract": contract,
+        "other_lead_ids": found["other_lead_ids"]
+    })
+
 @router.get("/", response_model=List[LeadResponse])
 async def get_leads(
     status: Optional[str] = None,
     source: Optional[str] = None,
     limit: int = Query(50, le=500),
     offset: int = Query(0, ge=0),
+    include_archived: bool = False,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get leads with optional filtering"""
+    """Get leads with optional filtering; `fields=id,owner_name,...` returns and reads only those"""
     
-    query = db.query(Lead)
+    if fields:
+        lead_fields = LEAD_FIELDS
+        if include_archived:
+            lead_fields = LEAD_FIELDS.extend(archived=(("archived",), lambda row: bool(row.archived)))
+        try:
+            names = lead_fields.parse(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        selected = lead_fields.columns(names)
+        columns = lead_listing([*selected, "status", "source", "created_at"]).c if include_archived else Lead.__table__.c
+        query = db.query(*[columns[name] for name in selected])
+        if status:
+            query = query.filter(columns.status == status)
+        if source:
+            query = query.filter(columns.source == source)
+        rows = query.order_by(desc(columns.created_at)).offset(offset).limit(limit).all()
+        # Partial objects don't fit LeadResponse; returned as plain JSON
+        return JSONResponse([lead_fields.serialize(row, names) for row in rows])
+    
+    # The archive is only scanned when explicitly requested
+    if include_archived:
+        listing = lead_listing()
+        columns, query = listing.c, db.query(listing)
+    else:
+        columns, query = Lead, db.query(Lead)
     
     if status:
-        query = query.filter(Lead.status == status)
+        query = query.filter(columns.status == status)
     if source:
-        query = query.filter(Lead.source == source)
+        query = query.filter(columns.source == source)
     
-    leads = query.order_by(desc(Lead.created_at)).offset(offset).limit(limit).all()
+    leads = query.order_by(desc(columns.created_at)).offset(offset).limit(limit).all()
     
     # Convert leads and parse tags
     result = []
@@ -145,24 +226,28 @@ async def get_leads(
 async def get_lead_stats(db: Session = Depends(get_db)):
     """Get lead statistics for dashboard"""
     
-    total_leads = db.query(func.count(Lead.id)).scalar() or 0
-    new_leads = db.query(func.count(Lead.id)).filter(Lead.status == "new").scalar() or 0
-    qualified_leads = db.query(func.count(Lead.id)).filter(Lead.status == "interested").scalar() or 0
-    converted_leads = db.query(func.count(Lead.id)).filter(Lead.status == "converted").scalar() or 0
+    archived = archived_status_counts(db)  # Archived leads still count
+    total_leads = (db.query(func.count(Lead.id)).scalar() or 0) + sum(archived.values())
+    new_leads = (db.query(func.count(Lead.id)).filter(Lead.status == "new").scalar() or 0) + archived.get("new", 0)
+    qualified_leads = (db.query(func.count(Lead.id)).filter(Lead.status == "interested").scalar() or 0) + archived.get("interested", 0)
+    converted_leads = (db.query(func.count(Lead.id)).filter(Lead.status == "converted").scalar() or 0) + archived.get("converted", 0)
     
     return {
         "total_leads": total_leads,
         "new_leads": new_leads,
         "qualified_leads": qualified_leads,
         "converted_leads": converted_leads,
+        "archived_leads": sum(archived.values()),
         "conversion_rate": round((converted_leads / total_leads * 100) if total_leads > 0 else 0, 1)
     }
 
 @router.get("/{lead_id}", response_model=LeadResponse)
 async def get_lead(lead_id: str, db: Session = Depends(get_db)):
     """Get specific lead details"""
+    lead_id = renamed_id(db, lead_id) or lead_id
     
-    lead = db.query(Lead).filter(Lead.id == lead_id).first()
+    lead = (db.query(Lead).filter(Lead.id == lead_id).first()
+            or db.query(ArchivedLead).filter(ArchivedLead.id == lead_id).first())
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     
@@ -191,6 +276,27 @@ async def get_lead(lead_id: str, db: Session = Depends(get_db)):
     
     return LeadResponse(**lead_dict)
 
+@router.get("/{lead_id}/raw")
+async def get_lead_raw_data(lead_id: str, db: Session = Depends(get_db)):
+    """Stream the original scraped page of a lead (stored out-of-row)"""
+    lead_id = renamed_id(db, lead_id) or lead_id
+    
+    lead = (db.query(Lead.raw_data_ref).filter(Lead.id == lead_id).first()
+            or db.query(ArchivedLead.raw_data_ref).filter(ArchivedLead.id == lead_id).first())
+    if not lead:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    
+    store = get_payload_store()
+    info = store.info(lead.raw_data_ref) if lead.raw_data_ref else None
+    if not info:
+        raise HTTPException(status_code=404, detail="Payload not found")
+    
+    return StreamingResponse(
+        store.iter_chunks(lead.raw_data_ref),
+        media_type=info["content_type"],
+        headers={"ETag": f'"{lead.raw_data_ref}"'}
+    )
+
 @router.post("/", response_model=LeadResponse)
 async def create_lead(lead_data: LeadCreate, db: Session = Depends(get_db)):
     """Create a new lead"""
@@ -200,6 +306,8 @@ async def create_lead(lead_data: LeadCreate, db: Session = Depends(get_db)):
     
     lead = Lead(**lead_dict)
     db.add(lead)
+    record_change(db, "lead", lead, "insert")
+    record_funnel(db, [lead.id], lead.status, lead.created_at)
     db.commit()
     db.refresh(lead)
     
@@ -236,29 +344,67 @@ async def update_lead_status(
     db: Session = Depends(get_db)
 ):
     """Update lead status"""
+    lead_id = renamed_id(db, lead_id) or lead_id
+    try:
+        LEAD_STATUS.validate(status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     lead = db.query(Lead).filter(Lead.id == lead_id).first()
+    if not lead and restore_leads(db.connection(), [lead_id])["leads"]:
+        # Touching an archived lead brings it back to the hot table
+        lead = db.query(Lead).filter(Lead.id == lead_id).first()
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     
+    previous_status = lead.status
     lead.status = status
     if notes:
         lead.notes = notes
     lead.updated_at = datetime.utcnow()
+    record_change(db, "lead", lead)
+    if lead.status != previous_status:
+        record_funnel(db, [lead.id], lead.status, lead.updated_at)
     
     db.commit()
     
     return {"message": "Lead status updated successfully"}
 
+@router.post("/status/batch")
+async def update_lead_statuses(batch: LeadStatusBatch, db: Session = Depends(get_db)):
+    """Update the status of many leads, picked by id or by filter"""
+    
+    if (batch.lead_ids is None) == (batch.filter is None):
+        raise HTTPException(status_code=400, detail="Pass either lead_ids or filter")
+    try:
+        LEAD_STATUS.validate(batch.status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    engine = db.get_bind()
+    if batch.lead_ids is not None:
+        totals = update_statuses_by_id(engine, batch.lead_ids, batch.status, batch.notes)
+        totals["not_found"] = len(set(batch.lead_ids)) - totals["updated"]
+    else:
+        try:
+            lead_filter(batch.filter)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        totals = update_statuses_by_filter(engine, batch.filter, batch.status, batch.notes)
+    
+    return {"message": f"{totals['updated']} leads updated to {batch.status}", **totals}
+
 @router.delete("/{lead_id}")
 async def delete_lead(lead_id: str, db: Session = Depends(get_db)):
     """Delete a lead"""
+    lead_id = renamed_id(db, lead_id) or lead_id
     
     lead = db.query(Lead).filter(Lead.id == lead_id).first()
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     
     db.delete(lead)
+    record_change(db, "lead", lead, "delete")
     db.commit()
     
     return {"message": "Lead deleted successfully"} 
\ No newline at end of file
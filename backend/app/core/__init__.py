@@ -0,0 +1 @@
+# Application configuration
\ No newline at end of file
@@ -0,0 +1,46 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Settings:
+    """Runtime settings, overridable through environment variables or `.env`"""
+
+    # Database
+    DATABASE_PATH: str = os.getenv("DATABASE_PATH", "leadgen_pro.db")
+    SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", "data/snapshots")  # snapshot.py save / restore
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", "data/exports")  # Arrow / Parquet exports (export_tables.py)
+    LEAD_SHARDS: str = os.getenv("LEAD_SHARDS", "")  # "huahin=Hua Hin|Cha-am;samui=Koh Samui" (app/database/shards.py)
+    SHARD_DIR: str = os.getenv("SHARD_DIR", "data/shards")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 8))  # SQLite connections kept open per database file
+    DB_POOL_OVERFLOW: int = int(os.getenv("DB_POOL_OVERFLOW", 8))  # extra connections per file under load, closed after use
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds to wait for one once all are in use
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", 180))  # Untouched leads move to leads_archive
+    CHANGE_RETENTION_DAYS: int = int(os.getenv("CHANGE_RETENTION_DAYS", 7))  # change_log records kept for consumers
+    CHANGE_COMPACT_AFTER_HOURS: int = int(os.getenv("CHANGE_COMPACT_AFTER_HOURS", 24))  # then only the newest per row
+
+    # Scraping configuration
+    FACEBOOK_RATE_LIMIT: int = int(os.getenv("FACEBOOK_RATE_LIMIT", 3))  # Seconds between requests
+    MAX_DAILY_REQUESTS: int = int(os.getenv("MAX_DAILY_REQUESTS", 1000))
+    DEFAULT_RATE_LIMIT: int = int(os.getenv("DEFAULT_RATE_LIMIT", 3))  # ScrapingJob.rate_limit_delay default
+    FETCH_CACHE_DIR: str = os.getenv("FETCH_CACHE_DIR", "data/http_cache")
+    FETCH_CONNECTIONS_PER_HOST: int = int(os.getenv("FETCH_CONNECTIONS_PER_HOST", 4))
+
+    # Instrumentation
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", 100))  # Log statements slower than this
+    REQUEST_QUERY_WARNING: int = int(os.getenv("REQUEST_QUERY_WARNING", 20))  # Warn above this many queries per request
+
+    # Analytics (app/services/analytics.py)
+    ANALYTICS_ENGINE: str = os.getenv("ANALYTICS_ENGINE", "sql")  # "columnar": stats endpoints read the Arrow copies
+    ANALYTICS_REFRESH_SECONDS: float = float(os.getenv("ANALYTICS_REFRESH_SECONDS", 2))  # Change feed poll interval
+
+    # Call queue
+    CALL_TIMEZONE: str = os.getenv("CALL_TIMEZONE", "Asia/Bangkok")  # best_call_time windows are local times here
+
+    # Property images
+    IMAGE_DIR: str = os.getenv("IMAGE_DIR", "data/images")
+    IMAGE_CACHE_MAX_AGE: int = int(os.getenv("IMAGE_CACHE_MAX_AGE", 31536000))  # Seconds, variants never change
+
+
+settings = Settings()
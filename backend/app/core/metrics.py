@@ -0,0 +1,283 @@
+# Per-request instrumentation exposed in Prometheus text format
+#
+# - route latency histograms, labelled by method, route template and status
+# - SQL queries and SQL time per request, counted from SQLAlchemy engine events
+#   and attributed to the route through a context variable
+# - a slow-query log (statements over SLOW_QUERY_MS with parameters and route)
+#   and a warning for requests issuing more than REQUEST_QUERY_WARNING queries
+#
+# Flask: instrument_flask(app). FastAPI / ASGI: app.add_middleware(MetricsMiddleware)
+# and serve render_metrics() at /metrics. Engines: instrument_engine(engine).
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger("leadgen.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BACKGROUND_ROUTE = "<background>"  # queries run outside a request (flushers, CLI scripts)
+UNMATCHED_ROUTE = "<unmatched>"
+MAX_LOGGED_PARAMETER = 200  # characters per bound parameter in the slow-query log
+
+
+class RequestStats:
+    """Counters for the request being handled, carried in a context variable."""
+
+    def __init__(self, route: str, method: str):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.recorded = False
+
+
+_current_request: contextvars.ContextVar = contextvars.ContextVar("leadgen_request_stats", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[position] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.series.items()):
+            label_text = _label_text(labels)
+            prefix = f"{label_text}," if label_text else ""
+            for bound, count in zip(self.buckets, series):
+                yield f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {count}'
+            yield f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}'
+            yield f"{self.name}_sum{{{label_text}}} {series[-2]:.6f}"
+            yield f"{self.name}_count{{{label_text}}} {series[-1]}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.series: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple, amount: float = 1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.series.items()):
+            yield f"{self.name}{{{_label_text(labels)}}} {value:g}"
+
+
+class MetricsRegistry:
+    """All instruments of the process; every update holds one lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "Request latency by route", LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            "http_request_db_queries", "SQL statements issued per request", QUERY_COUNT_BUCKETS)
+        self.request_sql_duration = Histogram(
+            "http_request_db_duration_seconds", "Total SQL time per request", LATENCY_BUCKETS)
+        self.queries = Counter("db_queries_total", "SQL statements executed, by route")
+        self.query_seconds = Counter("db_query_duration_seconds_total", "Time spent in SQL, by route")
+        self.slow_queries = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS, by route")
+
+    def record_query(self, route: str, seconds: float, slow: bool):
+        labels = (("route", route),)
+        with self._lock:
+            self.queries.inc(labels)
+            self.query_seconds.inc(labels, seconds)
+            if slow:
+                self.slow_queries.inc(labels)
+
+    def record_request(self, stats: RequestStats, status: int):
+        duration = time.perf_counter() - stats.started
+        route_labels = (("method", stats.method), ("route", stats.route))
+        with self._lock:
+            self.request_duration.observe(route_labels + (("status", str(status)),), duration)
+            self.request_queries.observe(route_labels, stats.query_count)
+            self.request_sql_duration.observe(route_labels, stats.sql_seconds)
+        if stats.query_count > settings.REQUEST_QUERY_WARNING:
+            logger.warning("%s %s issued %d SQL queries (%.1f ms) - possible N+1",
+                           stats.method, stats.route, stats.query_count, stats.sql_seconds * 1000)
+        return duration
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for instrument in (self.request_duration, self.request_queries, self.request_sql_duration,
+                               self.queries, self.query_seconds, self.slow_queries):
+                lines.extend(instrument.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+def begin_request(route: str, method: str) -> RequestStats:
+    stats = RequestStats(route, method)
+    _current_request.set(stats)
+    return stats
+
+
+def end_request(stats: RequestStats, status: int) -> Optional[float]:
+    """Record a finished request once; returns its duration in seconds."""
+    if stats.recorded:
+        return None
+    stats.recorded = True
+    if _current_request.get() is stats:
+        _current_request.set(None)
+    return registry.record_request(stats, status)
+
+
+def server_timing(stats: RequestStats) -> str:
+    """Server-Timing header value, so browser dev tools show SQL time per request."""
+    return (f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.query_count} queries", '
+            f"app;dur={(time.perf_counter() - stats.started) * 1000:.1f}")
+
+
+# SQLAlchemy ---------------------------------------------------------------
+
+def _format_parameters(parameters, executemany: bool) -> str:
+    def short(value):
+        text = repr(value)
+        return text if len(text) <= MAX_LOGGED_PARAMETER else text[:MAX_LOGGED_PARAMETER] + "..."
+
+    def row(values):
+        if isinstance(values, dict):
+            return "{" + ", ".join(f"{key!r}: {short(value)}" for key, value in values.items()) + "}"
+        if isinstance(values, (list, tuple)):
+            return "(" + ", ".join(short(value) for value in values) + ")"
+        return short(values)
+
+    if executemany and parameters:
+        return f"{len(parameters)} rows, first: {row(parameters[0])}"
+    return row(parameters)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    stats = _current_request.get()
+    route = stats.route if stats else BACKGROUND_ROUTE
+    if stats:
+        stats.query_count += 1
+        stats.sql_seconds += elapsed
+
+    slow = elapsed * 1000 >= settings.SLOW_QUERY_MS
+    registry.record_query(route, elapsed, slow)
+    if slow:
+        logger.warning("Slow query (%.1f ms) on %s: %s | parameters: %s", elapsed * 1000, route,
+                       " ".join(statement.split()), _format_parameters(parameters, executemany))
+
+
+def instrument_engine(engine):
+    """Count and time every statement run on `engine` (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# Flask --------------------------------------------------------------------
+
+def instrument_flask(app):
+    """Time every Flask request by its URL rule and add a Server-Timing header."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_metrics():
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        g.request_stats = begin_request(route, request.method)
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        stats = g.get("request_stats")
+        if stats:
+            response.headers["Server-Timing"] = server_timing(stats)
+            end_request(stats, response.status_code)
+        return response
+
+    @app.teardown_request
+    def _failed_request_metrics(exc):
+        # after_request does not run when a view raises
+        stats = g.get("request_stats")
+        if stats and exc is not None:
+            end_request(stats, 500)
+
+
+# ASGI (FastAPI) -----------------------------------------------------------
+
+class MetricsMiddleware:
+    """ASGI middleware timing requests by their route template (e.g. /api/leads/{lead_id})."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route_for(self, scope) -> str:
+        from starlette.routing import Match
+
+        for route in getattr(scope.get("app"), "routes", []):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", UNMATCHED_ROUTE)
+        return UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = begin_request(self._route_for(scope), scope["method"])
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing(stats).encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request(stats, status)
@@ -0,0 +1,91 @@
+# Small-integer storage for status, urgency, source and automation stage
+#
+# These columns hold a handful of distinct words repeated in every row. They
+# are stored as their position in a catalogue below instead (SQLite stores 0
+# and 1 in no payload bytes at all, 2..127 in one), and EnumType translates at
+# the SQLAlchemy boundary: bound values and comparisons (`Lead.status ==
+# "new"`, `.in_()`, updates) are encoded, results are decoded, so the ORM, the
+# API and its JSON keep seeing the words, while a status filter is an integer
+# comparison in SQL. Raw SQL uses code() / decoded() (app/services/rollups.py).
+#
+# - Catalogues only grow: codes are stored, so never reorder or remove a value.
+# - Closed enums (statuses, urgency) are validated at the API boundary with
+#   validate(); open ones (source, automation stage) accept new words.
+# - A word outside the catalogue is stored as text and read back unchanged, so
+#   nothing written by older code or scripts is lost.
+# - The catalogues are mirrored into the `enum_values` lookup table for SQL
+#   readers by sync_enum_values(), a migration in app/database/schema.py: a
+#   catalogue that grows needs a new migration calling it again.
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+
+class Enum:
+    """A catalogue of words and the small integers they are stored as."""
+
+    def __init__(self, name: str, label: str, values: Sequence[str], open: bool = False):
+        self.name = name
+        self.label = label
+        self.values = tuple(values)
+        self.open = open
+        self.codes: Dict[str, int] = {value: code for code, value in enumerate(self.values)}
+
+    def validate(self, value: str) -> str:
+        """`value` if it may be written; ValueError otherwise (always passes for open enums)."""
+        if not self.open and value not in self.codes:
+            raise ValueError(f"Invalid {self.label}. Must be one of: {list(self.values)}")
+        return value
+
+    def code(self, value: str) -> int:
+        return self.codes[value]
+
+    def stored(self, value: Optional[str]):
+        """What is stored for `value`: its code, or the word itself when it has none."""
+        return self.codes.get(value, value) if value is not None else None
+
+    def decoded(self, expression: str) -> str:
+        """SQL turning a stored `expression` back into the word."""
+        cases = " ".join(f"WHEN {code} THEN '{value}'" for value, code in self.codes.items())
+        return f"(CASE {expression} {cases} ELSE {expression} END)"
+
+
+LEAD_STATUS = Enum("lead_status", "status",
+                   ["new", "contacted", "interested", "responded", "not_interested", "converted"])
+URGENCY = Enum("urgency", "urgency", ["urgent", "high", "medium", "low"])  # most urgent first: ORDER BY sorts
+LEAD_SOURCE = Enum("lead_source", "source",
+                   ["facebook", "google_maps", "thai_sites", "manual", "referral", "website"], open=True)
+AUTOMATION_STAGE = Enum("automation_stage", "automation stage",
+                        ["initial_contact", "facebook_initial", "day_3_email", "email_follow_up", "ready_to_call",
+                         "property_valuation", "negotiation_stage", "contract_signed", "stopped"], open=True)
+CONTRACT_STATUS = Enum("contract_status", "status", ["listed", "under_offer", "sold", "expired"])
+
+ENUMS = [LEAD_STATUS, URGENCY, LEAD_SOURCE, AUTOMATION_STAGE, CONTRACT_STATUS]
+
+
+class EnumType(TypeDecorator):
+    """SMALLINT column holding an Enum's codes; reads and writes its words."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum: Enum):
+        super().__init__()
+        self.enum = enum
+
+    def process_bind_param(self, value, dialect):
+        return self.enum.stored(value)
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, int) and 0 <= value < len(self.enum.values):
+            return self.enum.values[value]
+        return value
+
+
+def sync_enum_values(conn):
+    """Write every catalogue into `enum_values` (enum, code, value)."""
+    conn.exec_driver_sql(
+        "INSERT OR REPLACE INTO enum_values (enum, code, value) VALUES (?, ?, ?)",
+        [(enum.name, code, value) for enum in ENUMS for value, code in enum.codes.items()]
+    )
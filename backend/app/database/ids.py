@@ -0,0 +1,74 @@
+# Time-ordered public ids for leads, contracts, sequences, properties and jobs
+#
+# Ids used to be `lead_` plus 8 random hex digits: 32 bits, so collisions are
+# likely past ~77k rows, and random, so every insert lands on a random page of
+# the primary-key index (and of every foreign-key index on it) instead of
+# appending to its right edge. An id is now the prefix plus a ULID: 48 bits of
+# millisecond timestamp and 80 random bits in 26 Crockford base32 characters,
+# e.g. `lead_01JAB7Q9ZKX3M4N5P6R7S8T9VW`. Ids sort by creation time, so inserts
+# append; within one millisecond the random part is incremented (monotonic), so
+# one process's ids stay ordered and unique.
+#
+# SQLite already gives every table an integer rowid, and secondary indexes
+# (status, location, ...) point at that, not at the text id. The id itself is
+# the public key used in URLs and foreign-key columns. Ids from before the
+# scheme are rewritten by rekey_ids.py, which keeps old -> new aliases so old
+# URLs still resolve (app/services/rekey.py).
+import re
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+ID_PATTERN = re.compile(r"^[a-z]+_[0-7][0-9A-HJKMNP-TV-Z]{25}$")
+
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+def ulid(ms: int, randomness: int) -> str:
+    """26-character ULID of a millisecond timestamp and 80 random bits."""
+    value = (ms << RANDOM_BITS) | randomness
+    return "".join(CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+
+def is_current_id(value: Optional[str]) -> bool:
+    """Whether `value` is a prefixed ULID (rather than an id from before them)."""
+    return bool(value and ID_PATTERN.match(value))
+
+
+def epoch_ms(at: datetime) -> int:
+    """Milliseconds since the Unix epoch of a naive UTC datetime."""
+    return (at - _UNIX_EPOCH) // timedelta(milliseconds=1)
+
+
+class IdGenerator:
+    """Monotonic prefixed ULIDs: ordered by time, and by call order within a millisecond."""
+
+    def __init__(self, randbits: Callable[[int], int] = secrets.randbits):
+        # `randbits` draws the random part; seed.py passes a seeded one so generated ids repeat
+        self._randbits = randbits
+        self._lock = threading.Lock()
+        self._ms = -1
+        self._randomness = 0
+
+    def __call__(self, prefix: str, at: Optional[datetime] = None) -> str:
+        ms = epoch_ms(at) if at else time.time_ns() // 1_000_000
+        with self._lock:
+            if ms > self._ms:
+                self._ms, self._randomness = ms, self._randbits(RANDOM_BITS)
+            elif self._randomness + 1 < 1 << RANDOM_BITS:
+                self._randomness += 1
+            else:  # random part exhausted within one millisecond: borrow the next one
+                self._ms, self._randomness = self._ms + 1, self._randbits(RANDOM_BITS)
+            return f"{prefix}_{ulid(self._ms, self._randomness)}"
+
+
+_generator = IdGenerator()
+
+
+def new_id(prefix: str) -> str:
+    """A fresh id for a new row, e.g. new_id("lead")."""
+    return _generator(prefix)
@@ -1,19 +1,36 @@
 # Simplified database models for Phase 1 - SQLAlchemy 1.4 compatible
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, DateTime, Boolean, Float, Text, ForeignKey, JSON, LargeBinary, Index, Table
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
-import uuid
+
+from app.database.enums import AUTOMATION_STAGE, CONTRACT_STATUS, LEAD_SOURCE, LEAD_STATUS, URGENCY, EnumType
+from app.database.ids import new_id
+from app.services.normalize import to_e164
 
 Base = declarative_base()
 
+CALL_QUEUE_MIN_SCORE = 70  # Leads below this score never reach the call queue, nor its indexes
+
+def call_window_default(bound):
+    """Insert default of call_window_start (0) / _end (1): parsed from the row's best_call_time"""
+    def default(context):
+        from app.services.call_queue import call_window
+        return call_window(context.get_current_parameters().get("best_call_time"))[bound]
+    return default
+
+def phone_key_default(context):
+    """Insert default of phone_key: the row's phone in E.164"""
+    return to_e164(context.get_current_parameters().get("phone"))
+
 class Lead(Base):
     __tablename__ = "leads"
     
-    id = Column(String, primary_key=True, default=lambda: f"lead_{uuid.uuid4().hex[:8]}")
+    id = Column(String, primary_key=True, default=lambda: new_id("lead"))  # Time-ordered ULID (app/database/ids.py)
     owner_name = Column(String, nullable=False)
     owner_name_en = Column(String)
     phone = Column(String)
+    phone_key = Column(String, default=phone_key_default, index=True)  # E.164 ("+66812345678"), for caller ID
     email = Column(String)
     messenger_link = Column(String)
     
@@ -22,17 +39,20 @@ class Lead(Base):
     location = Column(String)
     property_value = Column(Float)
     commission_potential = Column(Float)
+    estimated_value = Column(Float)  # Comparable-sales estimate (app/services/valuation.py)
     
     # Lead management
-    status = Column(String, default="new")  # new, contacted, interested, not_interested, converted
+    status = Column(EnumType(LEAD_STATUS), default="new")  # new, contacted, interested, ... (codes: app/database/enums.py)
     lead_score = Column(Integer, default=0)  # 0-100 scoring
-    urgency = Column(String, default="medium")  # urgent, high, medium, low
-    source = Column(String)  # facebook, google_maps, thai_sites, etc.
+    urgency = Column(EnumType(URGENCY), default="medium")  # urgent, high, medium, low
+    source = Column(EnumType(LEAD_SOURCE))  # facebook, google_maps, thai_sites, etc.
     
     # Automation tracking
-    automation_stage = Column(String)  # facebook_initial, day_3_email, etc.
+    automation_stage = Column(EnumType(AUTOMATION_STAGE))  # facebook_initial, day_3_email, etc.
     last_contact = Column(DateTime)
     best_call_time = Column(String)
+    call_window_start = Column(SmallInteger, default=call_window_default(0))  # Minutes after midnight, Bangkok time
+    call_window_end = Column(SmallInteger, default=call_window_default(1))  # Exclusive; below start wraps past midnight
     
     # Metadata
     date_scraped = Column(DateTime, default=datetime.utcnow)
@@ -42,11 +62,64 @@ class Lead(Base):
     # Additional data
     tags = Column(Text)  # JSON string for tags
     notes = Column(Text)
+    raw_data_ref = Column(String)  # payload_blobs digest of the original scraped page
+    
+    # Call queue (app/services/call_queue.py): one partial index per sort order, covering the
+    # status and window filters, so a page is read in index order without visiting other rows
+    __table_args__ = (
+        Index("ix_leads_call_queue_score", lead_score.desc(),
+              status, call_window_start, call_window_end, sqlite_where=lead_score >= CALL_QUEUE_MIN_SCORE),
+        Index("ix_leads_call_queue_value", property_value.desc(), lead_score.desc(),
+              status, call_window_start, call_window_end, sqlite_where=lead_score >= CALL_QUEUE_MIN_SCORE),
+        Index("ix_leads_call_queue_urgency", urgency, lead_score.desc(),
+              status, call_window_start, call_window_end, sqlite_where=lead_score >= CALL_QUEUE_MIN_SCORE),
+    )
+
+class Property(Base):
+    __tablename__ = "properties"
+    
+    id = Column(String, primary_key=True, default=lambda: new_id("prop"))
+    lead_id = Column(String, ForeignKey("leads.id"), index=True)
+    
+    # Property details
+    property_type = Column(String)
+    address = Column(String)
+    location = Column(String)
+    coordinates_lat = Column(Float)  # Indexed through the property_rtree R*Tree
+    coordinates_lng = Column(Float)
+    
+    # Pricing
+    listing_price = Column(Float)
+    price_per_sqm = Column(Float)
+    rental_yield = Column(Float)
+    
+    # Features
+    bedrooms = Column(Integer)
+    bathrooms = Column(Integer)
+    area_sqm = Column(Float)
+    furnished = Column(Boolean, default=False)
+    
+    # Descriptions
+    description_thai = Column(Text)
+    description_english = Column(Text)
+    
+    # Images and media
+    images = Column(JSON)  # Array of image URLs
+    image_ref = Column(String)  # image_assets digest of the cover image
+    virtual_tour_url = Column(String)
+    
+    # Market data
+    days_on_market = Column(Integer, default=0)
+    views_count = Column(Integer, default=0)
+    inquiries_count = Column(Integer, default=0)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class AutomationSequence(Base):
     __tablename__ = "automation_sequences"
     
-    id = Column(String, primary_key=True, default=lambda: f"seq_{uuid.uuid4().hex[:8]}")
+    id = Column(String, primary_key=True, default=lambda: new_id("seq"))
     name = Column(String, nullable=False)
     type = Column(String)  # facebook_message, email, email_with_attachment
     status = Column(String, default="active")  # active, paused, stopped
@@ -70,7 +143,8 @@ class AutomationSequence(Base):
 class Contract(Base):
     __tablename__ = "contracts"
     
-    id = Column(String, primary_key=True, default=lambda: f"contract_{uuid.uuid4().hex[:8]}")
+    id = Column(String, primary_key=True, default=lambda: new_id("contract"))
+    property_id = Column(String, ForeignKey("properties.id"), index=True)  # Features for comparable sales
     
     # Basic contract info
     owner_name = Column(String, nullable=False)
@@ -88,7 +162,7 @@ class Contract(Base):
     commission_paid = Column(Boolean, default=False)
     
     # Contract status
-    status = Column(String)  # listed, under_offer, sold, expired
+    status = Column(EnumType(CONTRACT_STATUS))  # listed, under_offer, sold, expired
     
     # Important dates
     date_signed = Column(DateTime)
@@ -105,6 +179,158 @@ class Contract(Base):
     # Additional information
     notes = Column(Text)
     property_image = Column(String)  # Image URL
+    image_ref = Column(String)  # image_assets digest once property_image is ingested
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) 
+
+class ScrapingJob(Base):
+    __tablename__ = "scraping_jobs"
+    
+    id = Column(String, primary_key=True, default=lambda: new_id("job"))
+    source = Column(String)  # facebook, google_maps, thai_sites, ... or dump (ingest_listings.py --dump)
+    target_location = Column(String)
+    status = Column(String)  # running, completed, failed, paused, scheduled
+    
+    # Progress tracking
+    progress = Column(Integer, default=0)  # 0-100
+    items_found = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    
+    # Execution details
+    start_time = Column(DateTime)
+    end_time = Column(DateTime)
+    estimated_completion = Column(String)
+    
+    # Configuration
+    search_keywords = Column(JSON)
+    max_results = Column(Integer, default=1000)
+    rate_limit_delay = Column(Integer, default=3)  # Seconds between requests
+    
+    # Results (payload_blobs digests; the payloads live out-of-row)
+    results_ref = Column(String)
+    error_log_ref = Column(String)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PayloadBlob(Base):
+    __tablename__ = "payload_blobs"
+    
+    digest = Column(String, primary_key=True)  # sha256 of the uncompressed payload
+    content_type = Column(String)  # application/json, text/html
+    encoding = Column(String, default="zlib")
+    size = Column(Integer)  # Uncompressed bytes
+    stored_size = Column(Integer)  # Compressed bytes
+    chunk_count = Column(Integer)
     
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) 
\ No newline at end of file
+
+class PayloadChunk(Base):
+    __tablename__ = "payload_chunks"
+    
+    digest = Column(String, ForeignKey("payload_blobs.digest"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    data = Column(LargeBinary)  # Independently compressed chunk
+
+class ImageAsset(Base):
+    __tablename__ = "image_assets"
+    
+    digest = Column(String, primary_key=True)  # sha256 of the original image
+    source_url = Column(String, index=True)
+    width = Column(Integer)  # Original dimensions
+    height = Column(Integer)
+    size = Column(Integer)  # Original bytes
+    variants = Column(JSON)  # {"card": {"width", "height", "size"}, ...}
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+def archive_table(source, name, *extra):
+    """Same columns as `source` (no defaults, foreign keys or indexes) plus archived_at.
+
+    Built from the live table, so columns added to a model are archived too.
+    """
+    columns = [Column(column.name, column.type, primary_key=column.primary_key) for column in source.columns]
+    return Table(name, Base.metadata, *columns, Column("archived_at", DateTime), *extra)
+
+class ArchivedLead(Base):
+    # Cold leads moved out of `leads` (app/services/archive.py)
+    __table__ = archive_table(Lead.__table__, "leads_archive",
+                              Index("ix_leads_archive_phone_key", "phone_key"))
+
+class ArchivedProperty(Base):
+    # Properties of archived leads
+    __table__ = archive_table(Property.__table__, "properties_archive",
+                              Index("ix_properties_archive_lead_id", "lead_id"))
+
+class LeadArchiveCount(Base):
+    __tablename__ = "lead_archive_counts"
+    
+    status = Column(String, primary_key=True)
+    leads = Column(Integer, default=0)  # Archived leads with this status, kept in step by archive / restore
+
+class ContractDailyMetric(Base):
+    __tablename__ = "contract_daily_metrics"
+    
+    # Engagement per contract and UTC day, written by the event buffer (app/services/contract_events.py)
+    contract_id = Column(String, ForeignKey("contracts.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    views = Column(Integer, default=0)
+    inquiries = Column(Integer, default=0)
+    viewings = Column(Integer, default=0)
+    offers = Column(Integer, default=0)
+
+class ChangeRecord(Base):
+    __tablename__ = "change_log"
+    # AUTOINCREMENT: a seq is never handed out twice, even after old records are trimmed
+    __table_args__ = (Index("ix_change_log_entity", "entity", "entity_id"), {"sqlite_autoincrement": True})
+    
+    # Outbox of lead / contract / sequence changes, written in the same transaction (app/services/changes.py)
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # lead, contract, sequence
+    entity_id = Column(String, nullable=False)
+    op = Column(String, nullable=False)  # insert, update, delete, archive, restore
+    fields = Column(String)  # Comma-separated changed columns of an update
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChangeLogState(Base):
+    __tablename__ = "change_log_state"
+    
+    id = Column(Integer, primary_key=True)  # single row
+    trimmed_through = Column(Integer, default=0)  # Highest seq removed by retention; older cursors must resync
+
+class LeadFunnelDaily(Base):
+    __tablename__ = "lead_funnel_daily"
+    
+    # Leads entering each status per UTC day, source and automation stage (app/services/rollups.py)
+    day = Column(Date, primary_key=True)
+    source = Column(String, primary_key=True)  # '' when unknown
+    automation_stage = Column(String, primary_key=True)  # '' when not in a sequence
+    stage = Column(String, primary_key=True)  # Lead status entered: new, contacted, interested, converted, ...
+    leads = Column(Integer, default=0)
+
+class ContractCommissionMonthly(Base):
+    __tablename__ = "contract_commission_monthly"
+    
+    month = Column(String, primary_key=True)  # YYYY-MM of Contract.date_sold
+    sold = Column(Integer, default=0)
+    sale_value = Column(Float, default=0.0)
+    commission_earned = Column(Float, default=0.0)
+
+class IdAlias(Base):
+    __tablename__ = "id_aliases"
+    __table_args__ = {"sqlite_with_rowid": False}  # keyed by old_id only: no separate rowid B-tree
+    
+    # Ids from before the ULID scheme and what rekey_ids.py renamed them to (app/services/rekey.py)
+    old_id = Column(String, primary_key=True)
+    new_id = Column(String, nullable=False)
+    entity = Column(String, nullable=False)  # lead, contract, sequence
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class EnumValue(Base):
+    __tablename__ = "enum_values"
+    
+    # Lookup table of the small-integer codes in enum columns, written from app/database/enums.py
+    enum = Column(String, primary_key=True)  # lead_status, urgency, lead_source, automation_stage, contract_status
+    code = Column(Integer, primary_key=True)
+    value = Column(String, nullable=False)
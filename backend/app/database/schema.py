@@ -0,0 +1,192 @@
+# Versioned schema migrations
+#
+# The schema version of a database is SQLite's `PRAGMA user_version`, a number
+# in the file header. MIGRATIONS lists every change with the version it brings
+# a database to; init_db() applies the pending ones, each in its own
+# transaction together with the version bump, and is run out-of-band:
+# `python migrate.py` (main database and every shard) before a deploy, the
+# development server (run.py) and the maintenance scripts.
+#
+# Workers only call check_schema(): one header read instead of create_all's
+# table probes, DDL and the write lock they took on every start, so a worker
+# starts in the same time whatever the schema holds, and never migrates (or
+# waits on another worker migrating) while requests queue.
+#
+# - Migrations are append-only: a released one never changes, a schema change
+#   is a new entry (a new model column: another _add_missing_columns entry).
+# - Each runs under BEGIN IMMEDIATE and re-reads the version under that lock,
+#   so two migrators don't apply the same migration twice.
+# - Databases from before versioning are at version 0; every migration below
+#   is idempotent, so they are brought up whatever state they are in.
+import logging
+from typing import List
+
+from sqlalchemy import Integer, MetaData, inspect
+from sqlalchemy.schema import CreateTable
+
+from app.database.connection import engine as default_engine
+from app.database.enums import EnumType, sync_enum_values
+from app.database.models import Base, Lead
+from app.services.call_queue import backfill_call_windows
+from app.services.caller_id import backfill_phone_keys
+from app.services.geo import ensure_spatial_index
+
+logger = logging.getLogger("leadgen.schema")
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def _add_missing_columns(conn):
+    """Create missing tables and add columns that newer models introduced.
+
+    `create_all` never alters an existing table, so databases created before a
+    column was added get it through ALTER TABLE here, so new columns must be
+    nullable.
+    """
+    Base.metadata.create_all(bind=conn)
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}')
+
+
+def _encode_enum_columns(conn, table):
+    """Rebuild `table` so its enum columns are SMALLINT codes instead of text.
+
+    SQLite can't change a column's type in place: the rows are copied into a
+    new table with the model's types, each word mapped to its code (words
+    outside the catalogue are kept), then the tables are swapped and the
+    indexes recreated.
+    """
+    scratch = MetaData()
+    for other in table.metadata.sorted_tables:  # foreign keys need their targets
+        other.to_metadata(scratch)
+    rebuilt = table.to_metadata(scratch, name=f"{table.name}__encoded")
+    names = [column.name for column in table.columns]
+    values = []
+    for column in table.columns:
+        if isinstance(column.type, EnumType):
+            cases = " ".join(f"WHEN '{value}' THEN {code}" for value, code in column.type.enum.codes.items())
+            values.append(f'CASE "{column.name}" {cases} ELSE "{column.name}" END')
+        else:
+            values.append(f'"{column.name}"')
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {rebuilt.name}")
+    conn.execute(CreateTable(rebuilt))
+    conn.exec_driver_sql(f"INSERT INTO {rebuilt.name} ({', '.join(names)}) "
+                         f"SELECT {', '.join(values)} FROM {table.name} ORDER BY rowid")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    conn.exec_driver_sql(f"ALTER TABLE {rebuilt.name} RENAME TO {table.name}")
+    for index in table.indexes:
+        index.create(conn)
+
+
+def _encode_text_enums(conn):
+    """Rebuild the tables whose enum columns still hold text (app/database/enums.py)."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        if any(isinstance(column.type, EnumType) and not isinstance(existing[column.name], Integer)
+               for column in table.columns):
+            logger.warning("Encoding the enum columns of %s as small integers", table.name)
+            _encode_enum_columns(conn, table)
+    sync_enum_values(conn)
+
+
+def _add_call_windows(conn):
+    """Add the call-window columns, parse them from best_call_time, and index the call queue."""
+    _add_missing_columns(conn)
+    for table in Base.metadata.sorted_tables:
+        if "call_window_start" in table.columns:
+            backfill_call_windows(conn, table.name)
+    for index in Lead.__table__.indexes:  # create_all skips the indexes of existing tables
+        index.create(conn, checkfirst=True)
+
+
+def _add_phone_keys(conn):
+    """Add phone_key, fill it from phone, and index it (app/services/caller_id.py)."""
+    _add_missing_columns(conn)
+    for table in Base.metadata.sorted_tables:
+        if "phone_key" in table.columns:
+            backfill_phone_keys(conn, table.name)
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+# (version, description, migration(conn)); append only
+MIGRATIONS = [
+    (1, "Create tables and add columns missing from older databases", _add_missing_columns),
+    (2, "R*Tree index of property coordinates", ensure_spatial_index),
+    (3, "Store status, urgency, source and stage columns as small-integer codes", _encode_text_enums),
+    (4, "Best-call-time windows and the call-queue indexes", _add_call_windows),
+    (5, "E.164 phone keys of leads, indexed for caller ID", _add_phone_keys),
+    (6, "Key the property R*Tree through property_rtree_keys instead of rowids", ensure_spatial_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def init_db(engine=None) -> List[int]:
+    """Apply the pending migrations to one database; returns the versions applied."""
+    engine = engine or default_engine
+    with engine.connect() as conn:
+        if schema_version(conn) >= SCHEMA_VERSION:
+            return []
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        with engine.begin() as conn:
+            # Take the write lock before reading the version: another migrator may be ahead
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            if schema_version(conn) >= version:
+                continue
+            logger.warning("Migrating %s to schema version %d: %s", engine.url.database, version, description)
+            migrate(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+        applied.append(version)
+    return applied
+
+
+def migrate_all() -> dict:
+    """Apply the pending migrations to the main database and every LEAD_SHARDS shard.
+
+    Returns {shard name: versions applied}.
+    """
+    from sqlalchemy import create_engine
+    from app.database.shards import MAIN_SHARD, shard_paths
+
+    applied = {MAIN_SHARD: init_db(default_engine)}
+    for name, path in shard_paths().items():
+        shard_engine = create_engine(f"sqlite:///{path}")
+        try:
+            applied[name] = init_db(shard_engine)
+        finally:
+            shard_engine.dispose()
+    return applied
+
+
+def check_schema(engine=None) -> int:
+    """The database's schema version; SchemaOutOfDate when migrations are pending.
+
+    All a worker does on startup. A database newer than this code is served
+    with a warning, so workers of the previous release keep starting while a
+    deploy that migrated first rolls out.
+    """
+    engine = engine or default_engine
+    with engine.connect() as conn:
+        version = schema_version(conn)
+    if version < SCHEMA_VERSION:
+        raise SchemaOutOfDate(
+            f"{engine.url.database} is at schema version {version}, this code needs {SCHEMA_VERSION}: "
+            "run `python migrate.py`"
+        )
+    if version > SCHEMA_VERSION:
+        logger.warning("%s is at schema version %d, newer than this code (%d)",
+                       engine.url.database, version, SCHEMA_VERSION)
+    return version
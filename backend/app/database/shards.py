@@ -0,0 +1,153 @@
+# Optional sharding of leads and contracts by region
+#
+# LEAD_SHARDS names shards and the locations each one owns, e.g.
+#
+#     LEAD_SHARDS="huahin=Hua Hin|Cha-am|Pranburi;samui=Koh Samui;prachuap=Prachuap Khiri Khan"
+#
+# Every shard is its own SQLite file (SHARD_DIR/<name>.db) with the full schema
+# and holds the leads and contracts of its locations, with their archive rows
+# and raw payloads. Everything else (properties, sequences, scraping jobs,
+# images), and leads / contracts of locations no shard owns, stays in the main
+# database (DATABASE_PATH), shard "main". Without LEAD_SHARDS there is only
+# "main" and every call runs inline, exactly as an unsharded app would.
+#
+# Writes go to the one shard that owns the row's location, so scrapers of
+# different regions write to different files instead of queueing on one write
+# lock. Reads fan out to all shards in a thread pool (sqlite3 releases the GIL
+# while a statement runs) and are merged: ordered pages with a k-way merge,
+# aggregates by summing.
+import contextvars
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.database.connection import app_engine
+
+MAIN_SHARD = "main"
+
+
+def parse_shard_spec(spec: str) -> Dict[str, List[str]]:
+    """{"huahin": ["Hua Hin", "Cha-am"], ...} from "huahin=Hua Hin|Cha-am;samui=Koh Samui"."""
+    shards = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        name, _, locations = entry.partition("=")
+        name = name.strip()
+        if not name or name == MAIN_SHARD or not name.replace("_", "").replace("-", "").isalnum():
+            raise ValueError(f"Invalid shard name {name!r} in LEAD_SHARDS")
+        shards[name] = [location.strip() for location in locations.split("|") if location.strip()]
+    return shards
+
+
+class ShardRouter:
+    """Engines and sessions of every shard, with write routing and scatter-gather reads."""
+
+    def __init__(self, main_engine, shard_paths: Optional[Dict[str, str]] = None,
+                 locations: Optional[Dict[str, List[str]]] = None):
+        self.engines = {MAIN_SHARD: main_engine}
+        self.paths = {MAIN_SHARD: main_engine.url.database}
+        for name, path in (shard_paths or {}).items():
+            engine = app_engine(f"sqlite:///{path}")
+            self.engines[name] = engine
+            self.paths[name] = path
+        self.sessions = {name: sessionmaker(bind=engine) for name, engine in self.engines.items()}
+        # Longest location first, so "Hua Hin Beachfront" isn't claimed by a shorter prefix
+        self._owners = sorted(
+            ((location.lower(), name) for name, owned in (locations or {}).items() for location in owned),
+            key=lambda owner: -len(owner[0]),
+        )
+        self._pool = ThreadPoolExecutor(len(self.engines), "shard") if self.sharded else None
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.engines) > 1
+
+    def shard_for(self, location: Optional[str]) -> str:
+        """Shard owning `location`: exact match, or the owned name followed by a qualifier."""
+        key = (location or "").strip().lower()
+        for owned, name in self._owners:
+            if key == owned or key.startswith(owned + " "):
+                return name
+        return MAIN_SHARD
+
+    def session(self, shard: str = MAIN_SHARD):
+        return self.sessions[shard]()
+
+    def session_for(self, location: Optional[str]):
+        """Session on the shard that owns `location`, for writes."""
+        return self.session(self.shard_for(location))
+
+    def scatter(self, fn: Callable) -> Dict[str, object]:
+        """fn(session) on every shard in parallel; {shard: result}."""
+        def run(name):
+            db = self.sessions[name]()
+            try:
+                return fn(db)
+            finally:
+                db.close()
+
+        if not self._pool:
+            return {MAIN_SHARD: run(MAIN_SHARD)}
+        # Each task runs in a copy of the caller's context, so its SQL is
+        # attributed to the request in /metrics
+        futures = {name: self._pool.submit(contextvars.copy_context().run, run, name) for name in self.engines}
+        return {name: future.result() for name, future in futures.items()}
+
+    def merged(self, fetch: Callable, key: Callable, offset: int, limit: int, reverse: bool = True) -> list:
+        """One page across shards; fetch(session, offset, limit) returns rows ordered by `key`."""
+        if not self.sharded:
+            return self.scatter(lambda db: fetch(db, offset, limit))[MAIN_SHARD]
+        pages = self.scatter(lambda db: fetch(db, 0, offset + limit)).values()
+        return list(islice(heapq.merge(*pages, key=key, reverse=reverse), offset, offset + limit))
+
+    def total(self, fn: Callable) -> dict:
+        """Sum the numeric values of the dicts fn(session) returns on every shard."""
+        totals = {}
+        for result in self.scatter(fn).values():
+            for name, value in result.items():
+                totals[name] = totals.get(name, 0) + (value or 0)
+        return totals
+
+    def find(self, row_id: str, *models) -> str:
+        """Shard holding a row with this id in any of `models` ("main" when none does)."""
+        if not self.sharded:
+            return MAIN_SHARD
+
+        def holds(db):
+            return any(db.query(model.id).filter(model.id == row_id).first() is not None for model in models)
+
+        found = self.scatter(holds)
+        return next((name for name, hit in found.items() if hit), MAIN_SHARD)
+
+
+_router = None
+
+
+def shard_paths() -> Dict[str, str]:
+    """{shard name: SQLite file} of the LEAD_SHARDS shards, creating SHARD_DIR."""
+    locations = parse_shard_spec(settings.LEAD_SHARDS)
+    if locations:
+        os.makedirs(settings.SHARD_DIR, exist_ok=True)
+    return {name: os.path.join(settings.SHARD_DIR, f"{name}.db") for name in locations}
+
+
+def get_shard_router() -> ShardRouter:
+    """The shared router, built from LEAD_SHARDS / SHARD_DIR on first use.
+
+    Shards are only checked to be migrated (migrate.py migrates them).
+    """
+    global _router
+    if _router is None:
+        from app.database.connection import engine
+        from app.database.schema import check_schema
+
+        router = ShardRouter(engine, shard_paths(), parse_shard_spec(settings.LEAD_SHARDS))
+        for name, shard_engine in router.engines.items():
+            if name != MAIN_SHARD:
+                check_schema(shard_engine)
+        _router = router
+    return _router
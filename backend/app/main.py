@@ -1,19 +1,61 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, abort, jsonify, make_response, request, send_file, stream_with_context
 from flask_cors import CORS
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import func
+from app.core.config import settings
+from app.core.metrics import METRICS_CONTENT_TYPE, instrument_flask, render_metrics
 from app.database.connection import engine
-from app.database.models import Base, Lead, AutomationSequence, Contract
+from app.database.enums import CONTRACT_STATUS, LEAD_STATUS
+from app.database.ids import is_current_id
+from app.database.models import Lead, ArchivedLead, AutomationSequence, Contract, ScrapingJob, Property
+from app.database.schema import check_schema
+from app.database.shards import MAIN_SHARD, get_shard_router
+from app.services.archive import archived_status_counts, lead_listing, restore_leads
+from app.services.call_queue import CALL_QUEUE_SIZE, call_queue_key, call_queue_query, format_window, minute_of_day
+from app.services.caller_id import lookup_phone
+from app.services.changes import ChangeCursorExpired, FEED_LIMIT, get_change_feed, record_change
+from app.services.contract_events import daily_metrics, get_contract_event_buffer, parse_event_counts
+from app.services.fieldsets import CONTRACT_FIELDS, LEAD_FIELDS
+from app.services.geo import properties_in_bbox, properties_nearby
+from app.services.images import ImageIngester, ImageStore, image_url, lead_image_refs
+from app.services.lead_status import lead_filter, update_statuses_by_filter, update_statuses_by_id
+from app.services.payload_store import PayloadStore, get_payload_store
+from app.services.rekey import renamed_id
+from app.services.rollups import (
+    FUNNEL_GROUPS, FUNNEL_STAGES, commission_report, commission_rows, funnel_report, funnel_rows, record_funnel,
+    record_sale, sale_contribution
+)
+from app.services.snapshots import check_restored
+from app.services.scraping_progress import FLUSH_INTERVAL, STREAM_MIN_INTERVAL, TERMINAL_STATUSES, get_progress_tracker
 import json
-from datetime import datetime
+import math
+import os
+import time
+from datetime import date, datetime, timedelta
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Only checks the schema version: migrations run out-of-band (migrate.py).
+# Analytics, exports (pyarrow) and valuation (numpy) are imported by their
+# endpoints, so workers start serving without loading them.
+check_schema(engine)
+
+# Leads and contracts, on the main database or spread over LEAD_SHARDS
+shards = get_shard_router()
+
+# Seconds a request waits for the analytics engine's first load
+ANALYTICS_TIMEOUT = 60
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:3000", "http://localhost:4028"])
 
+# Route latency, SQL queries per request and slow-query log, served at /metrics
+instrument_flask(app)
+
+@app.before_request
+def reset_after_restore():
+    """A snapshot restored by another process leaves this one's buffers and caches stale"""
+    check_restored()
+
 # Database session
 Session = sessionmaker(bind=engine)
 
@@ -21,6 +63,16 @@ def get_db():
     """Get database session"""
     return Session()
 
+@app.url_value_preprocessor
+def resolve_renamed_ids(endpoint, values):
+    """Ids from before rekey_ids.py in /api/leads/<lead_id>/... resolve to the current ones"""
+    for key in ("lead_id", "contract_id"):
+        old_id = (values or {}).get(key)
+        if old_id and not is_current_id(old_id):
+            renamed = [new_id for new_id in shards.scatter(lambda db: renamed_id(db, old_id)).values() if new_id]
+            if renamed:
+                values[key] = renamed[0]
+
 @app.route("/")
 def root():
     return jsonify({
@@ -43,36 +95,54 @@ def health_check():
     except Exception as e:
         return jsonify({"status": "error", "detail": str(e)}), 503
 
+@app.route("/metrics")
+def metrics():
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 # Leads endpoints
 @app.route("/api/leads/stats")
 def get_lead_stats():
     """Get lead statistics for dashboard"""
-    db = get_db()
-    try:
-        total_leads = db.query(func.count(Lead.id)).scalar() or 0
-        new_leads = db.query(func.count(Lead.id)).filter(Lead.status == "new").scalar() or 0
-        qualified_leads = db.query(func.count(Lead.id)).filter(Lead.status == "interested").scalar() or 0
-        converted_leads = db.query(func.count(Lead.id)).filter(Lead.status == "converted").scalar() or 0
-        
-        return jsonify({
-            "total_leads": total_leads,
-            "new_leads": new_leads,
-            "qualified_leads": qualified_leads,
-            "converted_leads": converted_leads,
-            "conversion_rate": round((converted_leads / total_leads * 100) if total_leads > 0 else 0, 1)
-        })
-    finally:
-        db.close()
+    def count_leads(db):
+        archived = archived_status_counts(db)  # Archived leads still count
+        return {
+            "total_leads": (db.query(func.count(Lead.id)).scalar() or 0) + sum(archived.values()),
+            "new_leads": (db.query(func.count(Lead.id)).filter(Lead.status == "new").scalar() or 0) + archived.get("new", 0),
+            "qualified_leads": (db.query(func.count(Lead.id)).filter(Lead.status == "interested").scalar() or 0) + archived.get("interested", 0),
+            "converted_leads": (db.query(func.count(Lead.id)).filter(Lead.status == "converted").scalar() or 0) + archived.get("converted", 0),
+            "archived_leads": sum(archived.values()),
+        }
+    
+    if settings.ANALYTICS_ENGINE == "columnar":
+        from app.services.analytics import lead_counts
+        counts = lead_counts(analytics_tables()["leads"])
+    else:
+        counts = shards.total(count_leads)
+    total_leads, converted_leads = counts["total_leads"], counts["converted_leads"]
+    
+    return jsonify({
+        **counts,
+        "conversion_rate": round((converted_leads / total_leads * 100) if total_leads > 0 else 0, 1)
+    })
 
 @app.route("/api/leads/call-queue")
 def get_call_queue():
     """Get priority leads ready for calling"""
+    sort_by = request.args.get('sort_by', 'score')
+    callable_now = request.args.get('callable_now', '').lower() in ('1', 'true', 'yes')
+    try:
+        key = call_queue_key(sort_by)
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    minute = minute_of_day() if callable_now else None
+    
+    def fetch(db, offset, limit):
+        return call_queue_query(db, sort_by, minute).offset(offset).limit(limit).all()
+    
+    leads = shards.merged(fetch, key=key, offset=0, limit=CALL_QUEUE_SIZE)
     db = get_db()
     try:
-        leads = db.query(Lead).filter(
-            Lead.status.in_(["interested", "responded", "new"]),
-            Lead.lead_score >= 70
-        ).order_by(Lead.lead_score.desc()).limit(20).all()
+        image_refs = lead_image_refs(db, [lead.id for lead in leads])
         
         call_queue_leads = []
         for lead in leads:
@@ -89,9 +159,10 @@ def get_call_queue():
                 "last_response": lead.notes or "Initial contact needed",
                 "response_time": "2 hours ago" if lead.last_contact else "No response yet",
                 "best_call_time": lead.best_call_time or "9 AM - 5 PM",
+                "call_window": format_window(lead.call_window_start, lead.call_window_end),
                 "automation_stage": lead.automation_stage or "initial_contact",
                 "urgency": lead.urgency,
-                "property_image": "https://images.unsplash.com/photo-1613490493576-7fde63acd811?w=400"
+                "property_image": absolute_image_url(image_refs.get(lead.id), "card")
             })
         
         return jsonify(call_queue_leads)
@@ -101,58 +172,43 @@ def get_call_queue():
 @app.route("/api/leads", methods=["GET"])
 def get_leads():
     """Get leads with optional filtering"""
-    db = get_db()
+    status = request.args.get('status')
+    source = request.args.get('source')
+    limit = int(request.args.get('limit', 50))
+    offset = int(request.args.get('offset', 0))
+    include_archived = request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+    lead_fields = LEAD_FIELDS
+    if include_archived:
+        lead_fields = LEAD_FIELDS.extend(archived=(("archived",), lambda row: bool(row.archived)))
     try:
-        status = request.args.get('status')
-        source = request.args.get('source')
-        limit = int(request.args.get('limit', 50))
-        offset = int(request.args.get('offset', 0))
-        
-        query = db.query(Lead)
+        fields = lead_fields.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    selected = lead_fields.columns(fields, "created_at")
+    
+    def fetch(db, offset, limit):
+        # The archive is only scanned when explicitly requested
+        columns = lead_listing([*selected, "status", "source"]).c if include_archived else Lead.__table__.c
+        # Only the requested fields' columns are read
+        query = db.query(*[columns[name] for name in selected])
         
         if status:
-            query = query.filter(Lead.status == status)
+            query = query.filter(columns.status == status)
         if source:
-            query = query.filter(Lead.source == source)
-        
-        leads = query.order_by(Lead.created_at.desc()).offset(offset).limit(limit).all()
+            query = query.filter(columns.source == source)
         
-        result = []
-        for lead in leads:
-            lead_dict = {
-                "id": lead.id,
-                "owner_name": lead.owner_name,
-                "owner_name_en": lead.owner_name_en,
-                "phone": lead.phone,
-                "email": lead.email,
-                "property_type": lead.property_type,
-                "location": lead.location,
-                "property_value": lead.property_value,
-                "commission_potential": lead.commission_potential,
-                "status": lead.status,
-                "lead_score": lead.lead_score,
-                "urgency": lead.urgency,
-                "source": lead.source,
-                "automation_stage": lead.automation_stage,
-                "last_contact": lead.last_contact.isoformat() if lead.last_contact else None,
-                "best_call_time": lead.best_call_time,
-                "notes": lead.notes,
-                "created_at": lead.created_at.isoformat(),
-                "tags": json.loads(lead.tags) if lead.tags else []
-            }
-            result.append(lead_dict)
-        
-        return jsonify(result)
-    finally:
-        db.close()
+        return query.order_by(columns.created_at.desc()).offset(offset).limit(limit).all()
+    
+    leads = shards.merged(fetch, key=lambda lead: lead.created_at, offset=offset, limit=limit)
+    
+    return jsonify([lead_fields.serialize(lead, fields) for lead in leads])
 
 @app.route("/api/leads", methods=["POST"])
 def create_lead():
     """Create a new lead"""
-    db = get_db()
+    data = request.get_json()
+    db = shards.session_for(data.get('location'))
     try:
-        data = request.get_json()
-        
         lead = Lead(
             owner_name=data['owner_name'],
             owner_name_en=data.get('owner_name_en'),
@@ -166,6 +222,8 @@ def create_lead():
         )
         
         db.add(lead)
+        record_change(db, "lead", lead, "insert")
+        record_funnel(db, [lead.id], lead.status, lead.created_at)
         db.commit()
         db.refresh(lead)
         
@@ -178,6 +236,338 @@ def create_lead():
     finally:
         db.close()
 
+@app.route("/api/leads/<lead_id>/status", methods=["PUT"])
+def update_lead_status(lead_id):
+    """Update lead status"""
+    db = shards.session(shards.find(lead_id, Lead, ArchivedLead))
+    try:
+        data = request.get_json() or {}
+        if not data.get('status'):
+            return jsonify({"detail": "status is required"}), 400
+        try:
+            LEAD_STATUS.validate(data['status'])
+        except ValueError as e:
+            return jsonify({"detail": str(e)}), 400
+        
+        lead = db.query(Lead).filter(Lead.id == lead_id).first()
+        if not lead and restore_leads(db.connection(), [lead_id])["leads"]:
+            # Touching an archived lead brings it back to the hot table
+            lead = db.query(Lead).filter(Lead.id == lead_id).first()
+        if not lead:
+            return jsonify({"detail": "Lead not found"}), 404
+        
+        previous_status = lead.status
+        lead.status = data['status']
+        if data.get('notes'):
+            lead.notes = data['notes']
+        lead.updated_at = datetime.utcnow()
+        record_change(db, "lead", lead)
+        if lead.status != previous_status:
+            record_funnel(db, [lead.id], lead.status, lead.updated_at)
+        
+        db.commit()
+        
+        return jsonify({"message": "Lead status updated successfully"})
+    finally:
+        db.close()
+
+@app.route("/api/leads/status/batch", methods=["POST"])
+def update_lead_statuses():
+    """Update the status of many leads, picked by id or by filter"""
+    data = request.get_json() or {}
+    status = data.get('status')
+    lead_ids = data.get('lead_ids')
+    criteria = data.get('filter')
+    if not status:
+        return jsonify({"detail": "status is required"}), 400
+    try:
+        LEAD_STATUS.validate(status)
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    if (lead_ids is None) == (criteria is None):
+        return jsonify({"detail": "Pass either lead_ids or filter"}), 400
+    if lead_ids is not None and not isinstance(lead_ids, list):
+        return jsonify({"detail": "lead_ids must be a list"}), 400
+    if criteria is not None:
+        if not isinstance(criteria, dict):
+            return jsonify({"detail": "filter must be an object"}), 400
+        try:
+            lead_filter(criteria)
+        except ValueError as e:
+            return jsonify({"detail": str(e)}), 400
+    
+    # Every shard updates its own leads; ids not on a shard match nothing there
+    if lead_ids is not None:
+        totals = {"updated": 0, "restored": 0}
+        for shard_engine in shards.engines.values():
+            for key, count in update_statuses_by_id(shard_engine, lead_ids, status, data.get('notes')).items():
+                totals[key] += count
+        totals["not_found"] = len(set(lead_ids)) - totals["updated"]
+    else:
+        totals = {"updated": 0}
+        for shard_engine in shards.engines.values():
+            totals["updated"] += update_statuses_by_filter(shard_engine, criteria, status, data.get('notes'))["updated"]
+    
+    return jsonify({"message": f"{totals['updated']} leads updated to {status}", **totals})
+
+def stream_payload(digest, store=None):
+    """Stream an out-of-row payload chunk by chunk"""
+    store = store or get_payload_store()
+    info = store.info(digest) if digest else None
+    if not info:
+        return jsonify({"detail": "Payload not found"}), 404
+    
+    return Response(
+        stream_with_context(store.iter_chunks(digest)),
+        content_type=info["content_type"],
+        headers={"ETag": f'"{digest}"', "X-Payload-Size": str(info["size"])}
+    )
+
+@app.route("/api/leads/<lead_id>/raw")
+def get_lead_raw_data(lead_id):
+    """Get the original scraped page of a lead"""
+    shard = shards.find(lead_id, Lead, ArchivedLead)
+    db = shards.session(shard)
+    try:
+        lead = (db.query(Lead.raw_data_ref).filter(Lead.id == lead_id).first()
+                or db.query(ArchivedLead.raw_data_ref).filter(ArchivedLead.id == lead_id).first())
+        if not lead:
+            return jsonify({"detail": "Lead not found"}), 404
+        digest = lead.raw_data_ref
+    finally:
+        db.close()
+    
+    # A lead's payload is stored on the lead's shard
+    return stream_payload(digest, None if shard == MAIN_SHARD else PayloadStore(shards.engines[shard]))
+
+@app.route("/api/leads/<lead_id>/restore", methods=["POST"])
+def restore_archived_lead(lead_id):
+    """Move an archived lead and its properties back to the hot tables"""
+    db = shards.session(shards.find(lead_id, Lead, ArchivedLead))
+    try:
+        restored = restore_leads(db.connection(), [lead_id])
+        if not restored["leads"]:
+            if db.query(Lead.id).filter(Lead.id == lead_id).first():
+                return jsonify({"message": "Lead is not archived", "properties": 0})
+            return jsonify({"detail": "Lead not found"}), 404
+        db.commit()
+        
+        return jsonify({"message": "Lead restored successfully", "properties": restored["properties"]})
+    finally:
+        db.close()
+
+@app.route("/api/leads/by-phone/<number>")
+def get_lead_by_phone(number):
+    """Caller ID: the lead with this phone number, in any format, and its latest contract"""
+    try:
+        found = lookup_phone(shards, number)
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    if not found:
+        return jsonify({"detail": "No lead with this phone number"}), 404
+    
+    contract = found["contract"]
+    if contract is not None:
+        contract_fields = CONTRACT_FIELDS.parse(None)
+        contract = {
+            **CONTRACT_FIELDS.serialize(contract, contract_fields),
+            "property_image": absolute_image_url(contract.image_ref, "thumbnail") or contract.property_image
+        }
+    return jsonify({
+        "phone_key": found["phone_key"],
+        "lead": {**LEAD_FIELDS.serialize(found["lead"], LEAD_FIELDS.parse(None)), "archived": found["archived"]},
+        "contract": contract,
+        "other_lead_ids": found["other_lead_ids"]
+    })
+
+# Change feed
+@app.route("/api/changes")
+def get_changes():
+    """Lead / contract / sequence changes after the `since` cursor, oldest first"""
+    feed = get_change_feed()
+    limit = min(int(request.args.get('limit', FEED_LIMIT)), FEED_LIMIT)
+    since = request.args.get('since')
+    try:
+        # Without `since`, only report the head: a new consumer reads everything once and follows from there
+        cursor = feed.parse_cursor(since) if since is not None else feed.head()
+        records, next_cursor = feed.read(cursor, limit) if since is not None else ([], cursor)
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    except ChangeCursorExpired as e:
+        return jsonify({"detail": str(e), "head": feed.format_cursor(feed.head())}), 410
+    
+    return jsonify({
+        "changes": records,
+        "next": feed.format_cursor(next_cursor),
+        "has_more": len(records) == limit
+    })
+
+# Analytics endpoints (daily / monthly rollups only, never the leads table)
+def date_range_args():
+    """`from` / `to` query args as dates; the last 365 days by default"""
+    end = date.fromisoformat(request.args['to']) if request.args.get('to') else datetime.utcnow().date()
+    start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=364)
+    if start > end:
+        raise ValueError("from must not be after to")
+    return start, end
+
+@app.route("/api/analytics/funnel")
+def get_funnel_analytics():
+    """Leads entering each funnel stage per day, by source or automation stage"""
+    group_by = request.args.get('group_by', 'source')
+    if group_by not in FUNNEL_GROUPS:
+        return jsonify({"detail": f"group_by must be one of: {list(FUNNEL_GROUPS)}"}), 400
+    try:
+        start, end = date_range_args()
+    except ValueError as e:
+        return jsonify({"detail": f"Invalid date range: {e}"}), 400
+    
+    rows = [row for shard_rows in shards.scatter(lambda db: funnel_rows(db, start, end, group_by)).values()
+            for row in shard_rows]
+    return jsonify({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "group_by": group_by,
+        "stages": list(FUNNEL_STAGES),
+        "groups": funnel_report(rows, group_by)
+    })
+
+@app.route("/api/analytics/commission")
+def get_commission_analytics():
+    """Sold contracts and commission earned per month of the sale"""
+    try:
+        start, end = date_range_args()
+    except ValueError as e:
+        return jsonify({"detail": f"Invalid date range: {e}"}), 400
+    
+    rows = [row for shard_rows in shards.scatter(lambda db: commission_rows(db, start, end)).values()
+            for row in shard_rows]
+    return jsonify({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "months": commission_report(rows)
+    })
+
+def analytics_tables():
+    """Arrow copies of leads and contracts (app/services/analytics.py); 503 while they load"""
+    from app.services.analytics import AnalyticsNotReady, get_analytics_engine
+    try:
+        return get_analytics_engine().tables(ANALYTICS_TIMEOUT)
+    except AnalyticsNotReady as e:
+        # Answered here, not by an errorhandler, which would load pyarrow at startup
+        abort(make_response(jsonify({"detail": str(e)}), 503))
+
+def analytics_refreshed_at():
+    from app.services.analytics import get_analytics_engine
+    return get_analytics_engine().refreshed_at.isoformat()
+
+@app.route("/api/analytics/leads/breakdown")
+def get_lead_breakdown():
+    """Leads per status for each source, location, property type or automation stage"""
+    from app.services.analytics import LEAD_BREAKDOWNS, lead_breakdown
+    
+    by = request.args.get('by', 'source')
+    if by not in LEAD_BREAKDOWNS:
+        return jsonify({"detail": f"by must be one of: {list(LEAD_BREAKDOWNS)}"}), 400
+    groups = lead_breakdown(analytics_tables()["leads"], by)
+    return jsonify({"by": by, "as_of": analytics_refreshed_at(), "groups": groups})
+
+@app.route("/api/analytics/commission/breakdown")
+def get_commission_breakdown():
+    """Sold contracts, sale value and commission per location or property type"""
+    from app.services.analytics import COMMISSION_BREAKDOWNS, commission_breakdown
+    
+    by = request.args.get('by', 'location')
+    if by not in COMMISSION_BREAKDOWNS:
+        return jsonify({"detail": f"by must be one of: {list(COMMISSION_BREAKDOWNS)}"}), 400
+    groups = commission_breakdown(analytics_tables()["contracts"], by)
+    return jsonify({"by": by, "as_of": analytics_refreshed_at(), "groups": groups})
+
+@app.route("/api/analytics/contracts/days-on-market")
+def get_days_on_market():
+    """Days-on-market distribution of sold contracts"""
+    from app.services.analytics import days_on_market
+    
+    bucket = int(request.args.get('bucket', 30))
+    if bucket < 1:
+        return jsonify({"detail": "bucket must be at least 1"}), 400
+    distribution = days_on_market(analytics_tables()["contracts"], bucket)
+    return jsonify({"bucket": bucket, "as_of": analytics_refreshed_at(), **distribution})
+
+# Columnar exports for offline analytics (Arrow IPC / Parquet)
+@app.route("/api/exports", methods=["POST"])
+def create_export():
+    """Export leads, contracts and sequences; `incremental` continues from the last export's change_log cursors"""
+    from app.services.exports import ExportStore
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        since = datetime.fromisoformat(data['since']) if data.get('since') else None
+        manifest = ExportStore(shards).create(
+            data.get('name'), data.get('format', 'arrow'), since, bool(data.get('incremental'))
+        )
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    except FileExistsError as e:
+        return jsonify({"detail": str(e)}), 409
+    
+    return jsonify(manifest), 201
+
+@app.route("/api/exports")
+def get_exports():
+    """Manifests of every export, oldest first"""
+    from app.services.exports import ExportStore
+    return jsonify(ExportStore(shards).list())
+
+@app.route("/api/exports/<name>/<table>")
+def download_export(name, table):
+    """Download one table of an export"""
+    from app.services.exports import ExportNotFound, ExportStore
+    
+    try:
+        path = ExportStore(shards).file(name, table)
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    except ExportNotFound as e:
+        return jsonify({"detail": str(e)}), 404
+    
+    mimetype = "application/vnd.apache.parquet" if path.endswith(".parquet") else "application/vnd.apache.arrow.file"
+    # send_file resolves relative paths against the app package, not the working directory
+    return send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=True,
+                     download_name=f"{name}-{os.path.basename(path)}")
+
+# Valuation endpoints
+@app.route("/api/valuation/estimate")
+def get_valuation_estimate():
+    """Estimate a lead's value from its nearest sold comparables"""
+    from app.services.valuation import commission_for, get_valuation_index, load_lead_features
+    
+    lead_id = request.args.get('lead_id')
+    if not lead_id:
+        return jsonify({"detail": "Query parameter lead_id is required"}), 400
+
+    shard = shards.find(lead_id, Lead)
+    with shards.engines[shard].connect() as conn:
+        if shard == MAIN_SHARD:
+            targets = load_lead_features(conn, lead_ids=[lead_id])
+        else:
+            with engine.connect() as main_conn:
+                targets = load_lead_features(conn, lead_ids=[lead_id], main_conn=main_conn)
+    if not len(targets):
+        return jsonify({"detail": "Lead not found"}), 404
+
+    index = get_valuation_index()
+    estimate = index.estimate(targets)
+    value = float(estimate["value"][0])
+    value = None if math.isnan(value) else round(value, -3)  # NaN without comparables
+
+    return jsonify({
+        "lead_id": lead_id,
+        "estimated_value": value,
+        "commission_potential": round(commission_for(value), 2) if value is not None else None,
+        "comparables": index.comparables(estimate["neighbors"][0], estimate["distance"][0])
+    })
+
 # Automation endpoints
 @app.route("/api/automation/stats")
 def get_automation_stats():
@@ -239,92 +629,453 @@ def get_automation_sequences():
 @app.route("/api/contracts/stats")
 def get_contract_stats():
     """Get contract statistics for dashboard"""
-    db = get_db()
+    def contract_totals(db):
+        # Sum and count instead of an average, so shards can be added up
+        days_sum, days_count = db.query(
+            func.sum(Contract.days_on_market), func.count(Contract.days_on_market)
+        ).filter(Contract.status == "sold").one()
+        return {
+            "total_contracts": db.query(func.count(Contract.id)).scalar() or 0,
+            "active_listings": db.query(func.count(Contract.id)).filter(
+                Contract.status.in_(["listed", "under_offer"])
+            ).scalar() or 0,
+            "sold_properties": db.query(func.count(Contract.id)).filter(
+                Contract.status == "sold"
+            ).scalar() or 0,
+            "total_commission_earned": db.query(func.sum(Contract.commission_earned)).filter(
+                Contract.commission_paid == True
+            ).scalar() or 0.0,
+            "total_commission_pending": db.query(func.sum(Contract.commission_amount)).filter(
+                Contract.commission_paid == False,
+                Contract.status == "sold"
+            ).scalar() or 0.0,
+            "days_on_market_sum": days_sum or 0,
+            "days_on_market_count": days_count or 0,
+        }
+    
+    if settings.ANALYTICS_ENGINE == "columnar":
+        from app.services.analytics import contract_totals as columnar_contract_totals
+        totals = columnar_contract_totals(analytics_tables()["contracts"])
+    else:
+        totals = shards.total(contract_totals)
+    total_contracts, sold_properties = totals["total_contracts"], totals["sold_properties"]
+    days_sum, days_count = totals.pop("days_on_market_sum"), totals.pop("days_on_market_count")
+    avg_days_on_market = days_sum / days_count if days_count else 0.0
+    
+    conversion_rate = (sold_properties / total_contracts * 100) if total_contracts > 0 else 0.0
+    
+    return jsonify({
+        **totals,
+        "avg_days_on_market": round(avg_days_on_market, 1),
+        "conversion_rate": round(conversion_rate, 1)
+    })
+
+@app.route("/api/contracts", methods=["GET"])
+def get_contracts():
+    """Get contracts with optional filtering"""
+    status = request.args.get('status')
+    limit = int(request.args.get('limit', 50))
+    offset = int(request.args.get('offset', 0))
+    contract_fields = CONTRACT_FIELDS.extend(property_image=(
+        ("image_ref", "property_image"),
+        lambda row: absolute_image_url(row.image_ref, "thumbnail") or row.property_image
+    ))
     try:
-        total_contracts = db.query(func.count(Contract.id)).scalar() or 0
-        active_listings = db.query(func.count(Contract.id)).filter(
-            Contract.status.in_(["listed", "under_offer"])
-        ).scalar() or 0
-        sold_properties = db.query(func.count(Contract.id)).filter(
-            Contract.status == "sold"
-        ).scalar() or 0
+        fields = contract_fields.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    selected = contract_fields.columns(fields, "created_at")
+    
+    def fetch(db, offset, limit):
+        # Only the requested fields' columns are read
+        query = db.query(*[Contract.__table__.c[name] for name in selected])
         
-        total_commission_earned = db.query(func.sum(Contract.commission_earned)).filter(
-            Contract.commission_paid == True
-        ).scalar() or 0.0
+        if status:
+            query = query.filter(Contract.status == status)
         
-        total_commission_pending = db.query(func.sum(Contract.commission_amount)).filter(
-            Contract.commission_paid == False,
-            Contract.status == "sold"
-        ).scalar() or 0.0
+        return query.order_by(Contract.created_at.desc()).offset(offset).limit(limit).all()
+    
+    contracts = shards.merged(fetch, key=lambda contract: contract.created_at, offset=offset, limit=limit)
+    
+    return jsonify([contract_fields.serialize(contract, fields) for contract in contracts])
+
+@app.route("/api/contracts", methods=["POST"])
+def create_contract():
+    """Create a new contract"""
+    data = request.get_json()
+    status = data.get('status', 'listed')
+    try:
+        CONTRACT_STATUS.validate(status)
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    db = shards.session_for(data.get('location'))
+    try:
+        listing_price = data.get('listing_price')
+        commission_rate = data.get('commission_rate', 3.0)
         
-        avg_days_on_market = db.query(func.avg(Contract.days_on_market)).filter(
-            Contract.status == "sold"
-        ).scalar() or 0.0
+        contract = Contract(
+            property_id=data.get('property_id'),
+            owner_name=data['owner_name'],
+            owner_name_en=data.get('owner_name_en'),
+            property_type=data.get('property_type'),
+            location=data.get('location'),
+            property_value=data.get('property_value'),
+            listing_price=listing_price,
+            commission_rate=commission_rate,
+            commission_amount=(listing_price * commission_rate / 100) if listing_price else 0,
+            status=status,
+            notes=data.get('notes'),
+            date_signed=datetime.utcnow(),
+            date_listed=datetime.utcnow() if status == "listed" else None
+        )
         
-        conversion_rate = (sold_properties / total_contracts * 100) if total_contracts > 0 else 0.0
+        db.add(contract)
+        record_change(db, "contract", contract, "insert")
+        db.commit()
+        db.refresh(contract)
+        
+        return jsonify({
+            "id": contract.id,
+            "owner_name": contract.owner_name,
+            "status": contract.status,
+            "commission_amount": contract.commission_amount,
+            "created_at": contract.created_at.isoformat()
+        }), 201
+    finally:
+        db.close()
+
+@app.route("/api/contracts/<contract_id>/status", methods=["PUT"])
+def update_contract_status(contract_id):
+    """Update contract status"""
+    db = shards.session(shards.find(contract_id, Contract))
+    try:
+        data = request.get_json() or {}
+        status = data.get('status')
+        try:
+            CONTRACT_STATUS.validate(status)
+        except ValueError as e:
+            return jsonify({"detail": str(e)}), 400
+        
+        contract = db.query(Contract).filter(Contract.id == contract_id).first()
+        if not contract:
+            return jsonify({"detail": "Contract not found"}), 404
+        
+        sold_before = sale_contribution(contract)
+        contract.status = status
+        
+        sale_price = data.get('sale_price')
+        if status == "sold" and sale_price:
+            contract.sale_price = sale_price
+            contract.date_sold = datetime.utcnow()
+            # Recalculate commission based on actual sale price
+            contract.commission_earned = sale_price * contract.commission_rate / 100
+            if contract.date_listed:
+                contract.days_on_market = (datetime.utcnow() - contract.date_listed).days
+        
+        if data.get('notes'):
+            contract.notes = data['notes']
+        
+        contract.updated_at = datetime.utcnow()
+        record_change(db, "contract", contract)
+        record_sale(db, sold_before, sale_contribution(contract))
+        
+        db.commit()
+        
+        return jsonify({"message": f"Contract status updated to {status}"})
+    finally:
+        db.close()
+
+@app.route("/api/contracts/<contract_id>/events", methods=["POST"])
+def record_contract_events(contract_id):
+    """Count listing views / inquiries / viewings / offers; written in periodic batches"""
+    try:
+        counts = parse_event_counts(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+    
+    db = shards.session(shards.find(contract_id, Contract))
+    try:
+        if not db.query(Contract.id).filter(Contract.id == contract_id).first():
+            return jsonify({"detail": "Contract not found"}), 404
+    finally:
+        db.close()
+    
+    get_contract_event_buffer().record(contract_id, counts)
+    return jsonify({"message": "Events recorded", "recorded": counts}), 202
+
+@app.route("/api/contracts/<contract_id>/metrics/daily")
+def get_contract_daily_metrics(contract_id):
+    """Daily engagement series of a contract"""
+    days = min(max(int(request.args.get('days', 30)), 1), 366)
+    db = shards.session(shards.find(contract_id, Contract))
+    try:
+        if not db.query(Contract.id).filter(Contract.id == contract_id).first():
+            return jsonify({"detail": "Contract not found"}), 404
         
         return jsonify({
-            "total_contracts": total_contracts,
-            "active_listings": active_listings,
-            "sold_properties": sold_properties,
-            "total_commission_earned": total_commission_earned,
-            "total_commission_pending": total_commission_pending,
-            "avg_days_on_market": round(avg_days_on_market, 1),
-            "conversion_rate": round(conversion_rate, 1)
+            "contract_id": contract_id,
+            "days": daily_metrics(db, contract_id, days),
+            # Recorded but not flushed yet
+            "pending": get_contract_event_buffer().pending(contract_id)
         })
     finally:
         db.close()
 
-@app.route("/api/contracts")
-def get_contracts():
-    """Get contracts with optional filtering"""
+# Properties endpoints
+def property_to_dict(prop):
+    return {
+        "id": prop.id,
+        "lead_id": prop.lead_id,
+        "property_type": prop.property_type,
+        "address": prop.address,
+        "location": prop.location,
+        "coordinates_lat": prop.coordinates_lat,
+        "coordinates_lng": prop.coordinates_lng,
+        "listing_price": prop.listing_price,
+        "price_per_sqm": prop.price_per_sqm,
+        "bedrooms": prop.bedrooms,
+        "bathrooms": prop.bathrooms,
+        "area_sqm": prop.area_sqm,
+        "furnished": prop.furnished,
+        "images": prop.images or [],
+        "days_on_market": prop.days_on_market,
+        "created_at": prop.created_at.isoformat()
+    }
+
+def float_args(*names):
+    """Parse required float query parameters; returns (values, error response)"""
+    try:
+        return [float(request.args[name]) for name in names], None
+    except (KeyError, ValueError):
+        return None, (jsonify({"detail": f"Query parameters {', '.join(names)} must be numbers"}), 400)
+
+@app.route("/api/properties", methods=["GET"])
+def get_properties():
+    """Get properties with optional lead filter"""
     db = get_db()
     try:
-        status = request.args.get('status')
-        limit = int(request.args.get('limit', 50))
+        lead_id = request.args.get('lead_id')
+        limit = min(int(request.args.get('limit', 50)), 500)
         offset = int(request.args.get('offset', 0))
         
-        query = db.query(Contract)
+        query = db.query(Property)
+        if lead_id:
+            query = query.filter(Property.lead_id == lead_id)
         
-        if status:
-            query = query.filter(Contract.status == status)
+        properties = query.order_by(Property.created_at.desc()).offset(offset).limit(limit).all()
+        return jsonify([property_to_dict(prop) for prop in properties])
+    finally:
+        db.close()
+
+@app.route("/api/properties", methods=["POST"])
+def create_property():
+    """Create a new property"""
+    db = get_db()
+    try:
+        data = request.get_json()
+        columns = set(Property.__table__.columns.keys()) - {"id", "created_at", "updated_at"}
+        prop = Property(**{key: value for key, value in data.items() if key in columns})
+        
+        db.add(prop)
+        db.commit()
+        db.refresh(prop)
         
-        contracts = query.order_by(Contract.created_at.desc()).offset(offset).limit(limit).all()
+        return jsonify(property_to_dict(prop)), 201
+    finally:
+        db.close()
+
+@app.route("/api/properties/nearby")
+def get_properties_nearby():
+    """Properties within `radius` meters of lat/lng, nearest first"""
+    values, error = float_args("lat", "lng")
+    if error:
+        return error
+    lat, lng = values
+    radius = min(float(request.args.get('radius', 3000)), 50000)
+    limit = min(int(request.args.get('limit', 100)), 500)
+    
+    with engine.connect() as conn:
+        return jsonify(properties_nearby(conn, lat, lng, radius, limit))
+
+@app.route("/api/properties/bbox")
+def get_properties_in_bbox():
+    """Properties inside a map viewport, ranked by distance to its center"""
+    values, error = float_args("south", "west", "north", "east")
+    if error:
+        return error
+    limit = min(int(request.args.get('limit', 500)), 2000)
+    
+    with engine.connect() as conn:
+        return jsonify(properties_in_bbox(conn, *values, limit=limit))
+
+# Images endpoints
+def absolute_image_url(digest, variant):
+    """Full URL of an image variant on this server, None without an image"""
+    path = image_url(digest, variant)
+    return request.host_url.rstrip("/") + path if path else None
+
+@app.route("/api/images", methods=["POST"])
+def upload_image():
+    """Store an uploaded image and attach it to a property and/or contract"""
+    upload = request.files.get("file")
+    if not upload:
+        return jsonify({"detail": "Multipart field 'file' is required"}), 400
+    property_id = request.form.get("property_id")
+    contract_id = request.form.get("contract_id")
+    
+    asset = ImageIngester(engine).ingest_one(
+        upload.read(),
+        property_ids=[property_id] if property_id else [],
+        contract_ids=[contract_id] if contract_id else []
+    )
+    if not asset:
+        return jsonify({"detail": "Unsupported or corrupt image"}), 400
+    
+    return jsonify({
+        "digest": asset["digest"],
+        "width": asset["width"],
+        "height": asset["height"],
+        "variants": {
+            name: {**info, "url": absolute_image_url(asset["digest"], name)}
+            for name, info in asset["variants"].items()
+        }
+    }), 201
+
+@app.route("/api/images/<digest>/<variant>")
+def get_image(digest, variant):
+    """Serve an image variant; content never changes for a URL, so it is cached for a year"""
+    path = ImageStore().path(digest, variant)
+    if not path or not os.path.exists(path):
+        return jsonify({"detail": "Image not found"}), 404
+    
+    # send_file resolves relative paths against the app package, not the working directory
+    response = send_file(os.path.abspath(path), mimetype="image/jpeg", etag=f"{digest}-{variant}",
+                         max_age=settings.IMAGE_CACHE_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# Scraping endpoints
+def scraping_job_to_dict(job):
+    return {
+        "id": job.id,
+        "source": job.source,
+        "targetLocation": job.target_location,
+        "status": job.status,
+        "progress": job.progress or 0,
+        "itemsFound": job.items_found or 0,
+        "estimatedCompletion": job.estimated_completion,
+        "startTime": job.start_time.isoformat() if job.start_time else None,
+        "sourceDetails": f"{job.source} - {job.target_location}",
+        "errorCount": job.error_count or 0,
+        "lastUpdate": job.updated_at.isoformat() if job.updated_at else None
+    }
+
+@app.route("/api/scraping/jobs")
+def get_scraping_jobs():
+    """Get all scraping jobs, with live counters for running ones"""
+    db = get_db()
+    try:
+        jobs = db.query(ScrapingJob).order_by(ScrapingJob.created_at.desc()).all()
+        tracker = get_progress_tracker()
         
         result = []
-        for contract in contracts:
-            result.append({
-                "id": contract.id,
-                "owner_name": contract.owner_name,
-                "owner_name_en": contract.owner_name_en,
-                "property_type": contract.property_type,
-                "location": contract.location,
-                "property_value": contract.property_value,
-                "listing_price": contract.listing_price,
-                "sale_price": contract.sale_price,
-                "commission_rate": contract.commission_rate,
-                "commission_amount": contract.commission_amount,
-                "commission_earned": contract.commission_earned,
-                "commission_paid": contract.commission_paid,
-                "status": contract.status,
-                "date_signed": contract.date_signed.isoformat() if contract.date_signed else None,
-                "date_listed": contract.date_listed.isoformat() if contract.date_listed else None,
-                "date_sold": contract.date_sold.isoformat() if contract.date_sold else None,
-                "days_on_market": contract.days_on_market,
-                "views": contract.views,
-                "inquiries": contract.inquiries,
-                "viewings": contract.viewings,
-                "offers": contract.offers,
-                "notes": contract.notes,
-                "property_image": contract.property_image,
-                "created_at": contract.created_at.isoformat()
-            })
+        for job in jobs:
+            job_dict = scraping_job_to_dict(job)
+            job_dict.update(tracker.get(job.id) or {})
+            result.append(job_dict)
         
         return jsonify(result)
     finally:
         db.close()
 
+def load_scraping_job(job_id):
+    db = get_db()
+    try:
+        job = db.query(ScrapingJob).filter(ScrapingJob.id == job_id).first()
+        return scraping_job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+def stored_progress_events(job_id, job):
+    """Events from the job's row, re-read at the tracker's flush cadence"""
+    yield f"data: {json.dumps(job)}\n\n"
+    last_sent = time.monotonic()
+    while job["status"] not in TERMINAL_STATUSES:
+        time.sleep(FLUSH_INTERVAL)
+        update = load_scraping_job(job_id)
+        if update is None:
+            return
+        if update == job:
+            if time.monotonic() - last_sent >= 15:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            continue
+        job = update
+        yield f"data: {json.dumps(job)}\n\n"
+        last_sent = time.monotonic()
+
+@app.route("/api/scraping/jobs/<job_id>/progress")
+def stream_scraping_progress(job_id):
+    """Server-sent event stream of a job's progress, served from memory"""
+    tracker = get_progress_tracker()
+    current = tracker.get(job_id)
+    
+    if current is None:
+        # Not running in this process (ingest_listings.py runs in its own):
+        # follow the row its tracker flushes, one primary-key read per flush
+        job = load_scraping_job(job_id)
+        if job is None:
+            return jsonify({"detail": "Scraping job not found"}), 404
+        return Response(
+            stream_with_context(stored_progress_events(job_id, job)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    def events(progress):
+        yield f"data: {json.dumps(progress)}\n\n"
+        while progress["status"] not in TERMINAL_STATUSES:
+            # Coalesce bursts of per-item updates into a few events per second
+            time.sleep(STREAM_MIN_INTERVAL)
+            update = tracker.wait_for_change(job_id, progress["version"], timeout=15)
+            if update is None:
+                # Finished and flushed; the final state was already sent or is in the database
+                return
+            if update["version"] == progress["version"]:
+                yield ": keep-alive\n\n"
+                continue
+            progress = update
+            yield f"data: {json.dumps(progress)}\n\n"
+    
+    return Response(
+        stream_with_context(events(current)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/api/scraping/jobs/<job_id>/results")
+def get_scraping_job_results(job_id):
+    """Stream a job's full results payload"""
+    return stream_job_payload(job_id, ScrapingJob.results_ref)
+
+@app.route("/api/scraping/jobs/<job_id>/errors")
+def get_scraping_job_errors(job_id):
+    """Stream a job's error log"""
+    return stream_job_payload(job_id, ScrapingJob.error_log_ref)
+
+def stream_job_payload(job_id, column):
+    db = get_db()
+    try:
+        job = db.query(column).filter(ScrapingJob.id == job_id).first()
+        if not job:
+            return jsonify({"detail": "Scraping job not found"}), 404
+        digest = job[0]
+    finally:
+        db.close()
+    
+    return stream_payload(digest)
+
 # Dashboard endpoint
 @app.route("/api/dashboard/stats")
 def get_dashboard_stats():
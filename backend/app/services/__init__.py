@@ -0,0 +1 @@
+# LeadGen Pro Background Services
\ No newline at end of file
@@ -0,0 +1,286 @@
+# Columnar analytics engine for the aggregate endpoints
+#
+# Stats, breakdowns and distributions over every lead and contract used to be
+# answered by SQL aggregates that scan the tables row by row on the same
+# SQLite connections the writes use; while a scan runs, its read lock keeps
+# writers from committing. The engine answers them from in-memory Arrow copies
+# of the columns they need instead, with vectorized pyarrow.compute kernels
+# that release the GIL.
+#
+# A worker thread owns the copies:
+# - Loading reads each table in LOAD_CHUNK-row keyset pages, one short read
+#   transaction per page, so a writer gets in between pages. The change feed
+#   head is taken first, and everything written during the load is re-read
+#   from the feed afterwards, which makes the copy consistent.
+# - Every ANALYTICS_REFRESH_SECONDS it reads the change feed from its cursor and
+#   re-reads only the leads / contracts that changed: their old rows are
+#   filtered out and the fresh ones appended. If retention trimmed the feed
+#   past the cursor, it reloads.
+# - After a snapshot restore (app/services/snapshots.py) it drops the tables and
+#   reloads; readers wait for the reload instead of getting pre-restore data.
+# Readers get the current immutable tables; a refresh swaps in new ones, so
+# queries never wait for it. Answers lag writes by at most one refresh.
+#
+# With ANALYTICS_ENGINE=columnar the lead / contract stats endpoints (and the
+# dashboard) use the engine; the /api/analytics breakdowns always do.
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from app.core.config import settings
+from app.services.changes import ChangeCursorExpired
+from app.services.exports import export_schema, record_batch, table_queries
+from app.services.snapshots import check_restored, on_restore
+
+logger = logging.getLogger("leadgen.analytics")
+
+LOAD_CHUNK = 50_000  # rows per read transaction while loading
+REREAD_CHUNK = 500  # ids per query when re-reading changed rows
+MAX_CHUNKS = 64  # appended pieces before a table is compacted into one chunk
+
+# Only the columns the aggregates use are held in memory
+ANALYTIC_COLUMNS = {
+    "leads": ["id", "status", "source", "location", "property_type", "automation_stage", "lead_score",
+              "property_value", "commission_potential", "created_at", "updated_at", "archived_at"],
+    "contracts": ["id", "status", "location", "property_type", "listing_price", "sale_price", "commission_rate",
+                  "commission_amount", "commission_earned", "commission_paid", "days_on_market", "date_sold",
+                  "views", "inquiries", "viewings", "offers", "created_at"],
+}
+ENTITY_TABLES = {"lead": "leads", "contract": "contracts"}
+LEAD_BREAKDOWNS = ("source", "location", "property_type", "automation_stage")
+COMMISSION_BREAKDOWNS = ("location", "property_type")
+
+
+class AnalyticsNotReady(TimeoutError):
+    pass
+
+
+class ColumnarEngine:
+    """Arrow copies of leads and contracts, kept current from the change feed by a worker thread."""
+
+    def __init__(self, router, feed, refresh_interval: Optional[float] = None):
+        self.router = router
+        self.feed = feed
+        self.refresh_interval = settings.ANALYTICS_REFRESH_SECONDS if refresh_interval is None else refresh_interval
+        self.schemas = {table: export_schema(table, names) for table, names in ANALYTIC_COLUMNS.items()}
+        self.refreshed_at: Optional[datetime] = None
+        self._tables: Dict[str, pa.Table] = {}
+        self._cursor = None
+        self._ready = threading.Event()
+        self._reload = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="analytics-engine", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._worker:
+            self._worker.join(timeout)
+
+    def tables(self, timeout: Optional[float] = None) -> Dict[str, pa.Table]:
+        """The current tables; waits for the first load."""
+        self.start()
+        if not self._ready.wait(timeout):
+            raise AnalyticsNotReady("Analytics engine is still loading; try again shortly")
+        return self._tables
+
+    def reset(self):
+        """Reload from scratch (after a snapshot restore); readers wait for the reload."""
+        self._ready.clear()
+        self._reload.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            check_restored()
+            if self._reload.is_set():
+                self._reload.clear()
+                self._ready.clear()
+                self._cursor = None
+            try:
+                self.refresh()
+            except ChangeCursorExpired:
+                logger.warning("Change feed trimmed past the analytics cursor; reloading")
+                self._cursor = None
+                continue
+            except Exception:
+                logger.exception("Analytics refresh failed; retrying")
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def refresh(self):
+        """Load everything on the first call, then apply the changes since the last one."""
+        if self._cursor is None:
+            cursor = self.feed.head()  # before reading, so writes during the load are replayed
+            self._tables = {table: self._load(table) for table in ANALYTIC_COLUMNS}
+            self._cursor = cursor
+        self._apply_changes()
+        self.refreshed_at = datetime.utcnow()
+        self._ready.set()
+
+    def _load(self, table: str) -> pa.Table:
+        batches = []
+        for engine in self.router.engines.values():
+            for query in table_queries(table, names=ANALYTIC_COLUMNS[table]):
+                row_id = query.selected_columns.id
+                last = ""
+                while True:
+                    with engine.connect() as conn:
+                        rows = conn.execute(query.where(row_id > last).order_by(row_id).limit(LOAD_CHUNK)).fetchall()
+                    if not rows:
+                        break
+                    batches.append(record_batch(rows, self.schemas[table]))
+                    last = rows[-1].id
+        return pa.Table.from_batches(batches, self.schemas[table]).combine_chunks()
+
+    def _reread(self, table: str, ids: List[str]) -> pa.Table:
+        batches = []
+        for engine in self.router.engines.values():
+            with engine.connect() as conn:
+                for query in table_queries(table, names=ANALYTIC_COLUMNS[table]):
+                    for offset in range(0, len(ids), REREAD_CHUNK):
+                        chunk = ids[offset:offset + REREAD_CHUNK]
+                        rows = conn.execute(query.where(query.selected_columns.id.in_(chunk))).fetchall()
+                        if rows:
+                            batches.append(record_batch(rows, self.schemas[table]))
+        return pa.Table.from_batches(batches, self.schemas[table])
+
+    def _apply_changes(self):
+        while True:
+            records, cursor = self.feed.read(self._cursor)
+            if not records:
+                return
+            changed: Dict[str, set] = {}
+            for record in records:
+                if record["entity"] in ENTITY_TABLES:
+                    changed.setdefault(ENTITY_TABLES[record["entity"]], set()).add(record["id"])
+            tables = dict(self._tables)
+            for table, ids in changed.items():
+                ids = sorted(ids)
+                current = tables[table]
+                kept = current.filter(pc.invert(pc.is_in(current["id"], value_set=pa.array(ids, pa.string()))))
+                updated = pa.concat_tables([kept, self._reread(table, ids)])
+                tables[table] = updated.combine_chunks() if updated["id"].num_chunks > MAX_CHUNKS else updated
+            self._tables = tables
+            self._cursor = cursor
+
+
+def _count(mask) -> int:
+    return pc.sum(pc.cast(mask, pa.int64())).as_py() or 0
+
+
+def _sum(values) -> float:
+    return pc.sum(values).as_py() or 0.0
+
+
+def lead_counts(leads: pa.Table) -> dict:
+    """The counts of GET /api/leads/stats."""
+    status = pc.fill_null(leads["status"], "")
+    return {
+        "total_leads": leads.num_rows,
+        "new_leads": _count(pc.equal(status, "new")),
+        "qualified_leads": _count(pc.equal(status, "interested")),
+        "converted_leads": _count(pc.equal(status, "converted")),
+        "archived_leads": leads.num_rows - leads["archived_at"].null_count,
+    }
+
+
+def contract_totals(contracts: pa.Table) -> dict:
+    """The totals of GET /api/contracts/stats, days on market as sum and count."""
+    status = pc.fill_null(contracts["status"], "")
+    sold = pc.equal(status, "sold")
+    paid = pc.fill_null(contracts["commission_paid"], False)
+    days = contracts.filter(sold)["days_on_market"]
+    return {
+        "total_contracts": contracts.num_rows,
+        "active_listings": _count(pc.is_in(status, value_set=pa.array(["listed", "under_offer"]))),
+        "sold_properties": _count(sold),
+        "total_commission_earned": _sum(contracts.filter(paid)["commission_earned"]),
+        "total_commission_pending": _sum(contracts.filter(pc.and_(pc.invert(paid), sold))["commission_amount"]),
+        "days_on_market_sum": pc.sum(days).as_py() or 0,
+        "days_on_market_count": len(days) - days.null_count,
+    }
+
+
+def days_on_market(contracts: pa.Table, bucket: int = 30) -> dict:
+    """Distribution of days on market over sold contracts: quantiles and `bucket`-day histogram."""
+    status = pc.fill_null(contracts["status"], "")
+    days = pc.drop_null(contracts.filter(pc.equal(status, "sold"))["days_on_market"])
+    if not len(days):
+        return {"sold": 0, "mean": None, "quantiles": {}, "histogram": []}
+    quantiles = pc.quantile(days, q=[0.1, 0.25, 0.5, 0.75, 0.9])
+    buckets = pc.value_counts(pc.multiply(pc.divide(days, bucket), bucket)).to_pylist()
+    return {
+        "sold": len(days),
+        "mean": round(pc.mean(days).as_py(), 1),
+        "quantiles": {f"p{round(q * 100)}": value for q, value in zip([0.1, 0.25, 0.5, 0.75, 0.9], quantiles.to_pylist())},
+        "histogram": [{"from": entry["values"], "to": entry["values"] + bucket - 1, "contracts": entry["counts"]}
+                      for entry in sorted(buckets, key=lambda entry: entry["values"])],
+    }
+
+
+def commission_breakdown(contracts: pa.Table, by: str) -> List[dict]:
+    """Sold contracts, sale value and commission per `by` value, largest commission first."""
+    status = pc.fill_null(contracts["status"], "")
+    sold = contracts.filter(pc.equal(status, "sold"))
+    paid = pc.fill_null(sold["commission_paid"], False)
+    pending = pc.if_else(paid, 0.0, pc.fill_null(sold["commission_amount"], 0.0))
+    grouped = (sold.select([by, "sale_price", "commission_earned", "days_on_market"])
+               .append_column("commission_pending", pending)
+               .group_by(by)
+               .aggregate([("sale_price", "count"), ("sale_price", "sum"), ("commission_earned", "sum"),
+                           ("commission_pending", "sum"), ("days_on_market", "mean")]))
+    rows = [
+        {
+            by: row[by],
+            "sold": row["sale_price_count"],
+            "sale_value": round(row["sale_price_sum"] or 0.0, 2),
+            "commission_earned": round(row["commission_earned_sum"] or 0.0, 2),
+            "commission_pending": round(row["commission_pending_sum"] or 0.0, 2),
+            "avg_days_on_market": round(row["days_on_market_mean"], 1) if row["days_on_market_mean"] is not None else None,
+        }
+        for row in grouped.to_pylist()
+    ]
+    return sorted(rows, key=lambda row: -row["commission_earned"])
+
+
+def lead_breakdown(leads: pa.Table, by: str) -> List[dict]:
+    """Lead counts per status for every `by` value, largest group first."""
+    grouped = leads.group_by([by, "status"]).aggregate([("id", "count")]).to_pylist()
+    groups: Dict[Optional[str], dict] = {}
+    for row in grouped:
+        entry = groups.setdefault(row[by], {by: row[by], "total": 0, "statuses": {}})
+        entry["statuses"][row["status"] or "unknown"] = row["id_count"]
+        entry["total"] += row["id_count"]
+    for entry in groups.values():
+        converted = entry["statuses"].get("converted", 0)
+        entry["conversion_rate"] = round(converted / entry["total"] * 100 if entry["total"] else 0, 1)
+    return sorted(groups.values(), key=lambda entry: -entry["total"])
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_analytics_engine() -> ColumnarEngine:
+    """The shared engine over every shard; its worker starts on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from app.database.shards import get_shard_router
+            from app.services.changes import get_change_feed
+            _engine = ColumnarEngine(get_shard_router(), get_change_feed())
+            on_restore(_engine.reset)
+        return _engine
@@ -0,0 +1,130 @@
+# Hot / archive tiering for leads
+#
+# Leads that are not_interested, or untouched for ARCHIVE_AFTER_DAYS, are moved
+# with their properties from `leads` / `properties` into `leads_archive` /
+# `properties_archive`, in batches of one transaction each. The hot tables and
+# their indexes then only hold the working set, so list, count and call-queue
+# queries keep fitting in the page cache however large the scraped backlog grows.
+#
+# - lists include archived leads only when asked to (lead_listing())
+# - lead counts stay complete: archived leads per status are kept in
+#   `lead_archive_counts` in the same transactions that move them
+# - a lead that is touched again (status update, explicit restore) is moved back
+#   with restore_leads(), on the caller's connection and transaction
+# - both directions are recorded in the change log as "archive" / "restore"
+# - "untouched" goes by updated_at, which bulk jobs such as valuation recompute
+#   leave alone; sold contracts still find archived properties (SOLD_QUERY)
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, literal, or_, select, text, union_all
+
+from app.core.config import settings
+from app.database.models import ArchivedLead, ArchivedProperty, Lead, LeadArchiveCount, Property
+from app.services.changes import record_changes_where
+
+ARCHIVE_STATUSES = ("not_interested",)  # archived whatever their age
+ARCHIVE_BATCH = 2000
+
+_COUNT_UPSERT = text("""
+    INSERT INTO lead_archive_counts (status, leads) VALUES (:status, :leads)
+    ON CONFLICT (status) DO UPDATE SET leads = leads + excluded.leads
+""")
+
+
+def _move(conn, source, target, where, archived_at: Optional[datetime]) -> int:
+    """Copy the rows of `source` matching `where` into `target`, then delete them."""
+    names = [column.name for column in source.columns if column.name != "archived_at"]
+    columns = [source.c[name] for name in names]
+    if archived_at is not None:
+        names.append("archived_at")
+        columns.append(literal(archived_at))
+    conn.execute(target.insert().from_select(names, select(*columns).where(where)))
+    return conn.execute(source.delete().where(where)).rowcount
+
+
+def _adjust_counts(conn, source, lead_ids: List[str], sign: int):
+    by_status = conn.execute(
+        select(source.c.status, func.count()).where(source.c.id.in_(lead_ids)).group_by(source.c.status)
+    ).all()
+    if by_status:
+        conn.execute(_COUNT_UPSERT, [{"status": status, "leads": sign * count} for status, count in by_status])
+
+
+def archive_leads(conn, lead_ids: List[str], archived_at: Optional[datetime] = None) -> Dict[str, int]:
+    """Move leads and their properties into the archive on an open connection."""
+    if not lead_ids:
+        return {"leads": 0, "properties": 0}
+    archived_at = archived_at or datetime.utcnow()
+    leads, properties = Lead.__table__, Property.__table__
+    _adjust_counts(conn, leads, lead_ids, +1)
+    record_changes_where(conn, "lead", "archive", leads.c.id, leads.c.id.in_(lead_ids), at=archived_at)
+    moved_properties = _move(conn, properties, ArchivedProperty.__table__,
+                             properties.c.lead_id.in_(lead_ids), archived_at)
+    moved_leads = _move(conn, leads, ArchivedLead.__table__, leads.c.id.in_(lead_ids), archived_at)
+    return {"leads": moved_leads, "properties": moved_properties}
+
+
+def restore_leads(conn, lead_ids: List[str]) -> Dict[str, int]:
+    """Move archived leads (and their properties) back into the hot tables.
+
+    Ids that aren't archived are ignored; returns how many rows came back.
+    """
+    if not lead_ids:
+        return {"leads": 0, "properties": 0}
+    archived, archived_properties = ArchivedLead.__table__, ArchivedProperty.__table__
+    _adjust_counts(conn, archived, lead_ids, -1)
+    record_changes_where(conn, "lead", "restore", archived.c.id, archived.c.id.in_(lead_ids))
+    moved_properties = _move(conn, archived_properties, Property.__table__,
+                             archived_properties.c.lead_id.in_(lead_ids), None)
+    moved_leads = _move(conn, archived, Lead.__table__, archived.c.id.in_(lead_ids), None)
+    return {"leads": moved_leads, "properties": moved_properties}
+
+
+def stale_condition(older_than_days: Optional[int] = None, now: Optional[datetime] = None):
+    """Leads to archive: ARCHIVE_STATUSES, or no update for `older_than_days`."""
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    return or_(Lead.status.in_(ARCHIVE_STATUSES), func.coalesce(Lead.updated_at, Lead.created_at) < cutoff)
+
+
+def count_stale_leads(engine, older_than_days: Optional[int] = None) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Lead).where(stale_condition(older_than_days))).scalar()
+
+
+def archive_stale_leads(engine, older_than_days: Optional[int] = None, batch_size: int = ARCHIVE_BATCH,
+                        limit: Optional[int] = None, progress=None) -> Dict[str, int]:
+    """Archive every stale lead, `batch_size` per transaction; returns totals."""
+    now = datetime.utcnow()
+    condition = stale_condition(older_than_days, now)
+    totals = {"leads": 0, "properties": 0, "batches": 0}
+    while limit is None or totals["leads"] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - totals["leads"])
+        with engine.begin() as conn:
+            lead_ids = conn.execute(select(Lead.id).where(condition).limit(size)).scalars().all()
+            if not lead_ids:
+                break
+            moved = archive_leads(conn, lead_ids, now)
+        totals["leads"] += moved["leads"]
+        totals["properties"] += moved["properties"]
+        totals["batches"] += 1
+        if progress:
+            progress(totals)
+    return totals
+
+
+def archived_status_counts(conn) -> Dict[str, int]:
+    """Archived leads per status, from the running counts (no archive scan)."""
+    return {status: leads for status, leads in conn.execute(
+        select(LeadArchiveCount.status, LeadArchiveCount.leads).where(LeadArchiveCount.leads > 0)
+    )}
+
+
+def lead_listing(names: Optional[List[str]] = None):
+    """Subquery with Lead's columns (or those in `names`) plus `archived`, over the hot table and the archive."""
+    columns = [column for column in Lead.__table__.columns if not names or column.name in names]
+    hot = select(*columns, literal(False).label("archived"))
+    archive = ArchivedLead.__table__
+    cold = select(*[archive.c[column.name] for column in columns], literal(True).label("archived"))
+    return union_all(hot, cold).subquery("leads_listing")
@@ -0,0 +1,216 @@
+# Call queue: best-call-time windows
+#
+# Lead.best_call_time is free text, from scraped pages and from agents:
+# "10 AM - 2 PM", "9-5", "บ่าย 13-17 น.", "หลัง 18.00 น.", "2 ทุ่ม". It is parsed
+# once, when the lead is inserted, into a minute-of-day range in Asia/Bangkok
+# time (CALL_TIMEZONE) stored in call_window_start / call_window_end, so the
+# call queue filters "callable now" on integers in the call-queue indexes
+# instead of re-reading the text (app/database/models.py).
+#
+# - A window is [start, end) in minutes after midnight; end < start wraps
+#   past midnight ("8 PM - 1 AM").
+# - "after 18.00" runs to the end of the calling day (CALL_DAY), "before 10"
+#   from its start; a single time is a one-hour window.
+# - Morning / afternoon / evening words, Thai or English, give their window
+#   and move bare hours into the afternoon ("บ่าย 1-4" is 13:00-16:00).
+#   Without a marker, hours 1-6 are afternoon: nobody asks for a 3 AM call.
+# - Empty or unreadable text gets DEFAULT_CALL_WINDOW, the "9 AM - 5 PM" the
+#   call queue has always shown for it.
+#
+# The queue itself is one query per shard: score >= CALL_QUEUE_MIN_SCORE, a
+# calling status, optionally callable at this minute, in the sort_by order.
+# Each order has its partial index, so SQLite walks it in order and stops
+# after the page instead of sorting every qualifying lead.
+import re
+from datetime import datetime
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import and_, literal_column, or_
+
+from app.core.config import settings
+from app.database.enums import URGENCY
+from app.database.models import CALL_QUEUE_MIN_SCORE, Lead
+
+DEFAULT_CALL_WINDOW = (9 * 60, 17 * 60)
+CALL_DAY = (8 * 60, 21 * 60)  # bounds of open-ended windows ("after 6 PM")
+
+PERIODS = {  # the first one the text mentions wins
+    "all day": CALL_DAY, "anytime": CALL_DAY, "any time": CALL_DAY, "ทั้งวัน": CALL_DAY, "ตลอดวัน": CALL_DAY,
+    "morning": (9 * 60, 12 * 60), "เช้า": (9 * 60, 12 * 60),
+    "afternoon": (13 * 60, 17 * 60), "บ่าย": (13 * 60, 17 * 60),
+    "evening": (17 * 60, 20 * 60), "เย็น": (17 * 60, 20 * 60), "ค่ำ": (18 * 60, 21 * 60),
+    "lunch": (12 * 60, 13 * 60), "พักเที่ยง": (12 * 60, 13 * 60),
+}
+MORNING_WORDS = ("morning", "เช้า")
+AFTERNOON_WORDS = ("afternoon", "บ่าย", "evening", "เย็น", "ค่ำ", "night", "คืน")
+AFTER_WORDS = ("after", "from", "since", "หลัง", "ตั้งแต่")
+BEFORE_WORDS = ("before", "until", "till", "by", "ก่อน")
+
+_TIME = re.compile(r"(\d{1,2})(?:\s*[:.]\s*(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)?")
+_HOURS_AFTER_DARK = re.compile(r"(\d{1,2})\s*ทุ่ม")  # Thai 1-5 ทุ่ม = 19:00-23:00
+_AFTERNOON_HOUR = re.compile(r"บ่าย\s*(\d{1,2})\s*โมง")  # บ่าย 2 โมง = 14:00
+_NOON = re.compile(r"(?<![a-z])noon|เที่ยง(?:วัน)?(?!คืน)")
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace("–", "-").replace("—", "-").replace("~", "-")
+    text = re.sub(r"\s+(?:to|ถึง)\s+|(?<=\d)\s*(?:to|ถึง)\s*(?=\d)", " - ", text)
+    text = _NOON.sub(" 12:00 ", text.replace("พักเที่ยง", "lunch"))
+    text = text.replace("เที่ยงคืน", " 24:00 ").replace("midnight", " 24:00 ")
+    # Hours with their own marker become 24-hour times, so the marker doesn't shift the other end
+    text = _HOURS_AFTER_DARK.sub(lambda match: f" {18 + int(match.group(1))}:00 ", text)
+    text = _AFTERNOON_HOUR.sub(lambda match: f" {int(match.group(1)) % 12 + 12}:00 ", text)
+    return re.sub(r"น\.|นาฬิกา|โมง", " ", text)
+
+
+def _mentions(text: str, words) -> bool:
+    # English words whole ("noon" isn't in "afternoon"); Thai is written without spaces
+    return any(re.search(rf"(?<![a-z]){re.escape(word)}(?![a-z])", text) for word in words)
+
+
+def _period(text: str) -> Optional[str]:
+    """"am" / "pm" when the text says morning / afternoon, for hours without AM / PM."""
+    if _mentions(text, AFTERNOON_WORDS):
+        return "pm"
+    if _mentions(text, MORNING_WORDS):
+        return "am"
+    return None
+
+
+def _minutes(hour: str, minute: Optional[str], meridiem: Optional[str], period: Optional[str]) -> Optional[int]:
+    hours, minutes = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if meridiem.startswith("p") else 0)
+    elif hours < 12 and (period == "pm" or (period is None and 1 <= hours <= 6)):
+        hours += 12
+    if hours > 24 or minutes > 59 or (hours == 24 and minutes):
+        return None
+    return hours * 60 + minutes
+
+
+def parse_call_window(text: Optional[str]) -> Optional[Tuple[int, int]]:
+    """(start, end) minutes after midnight of a best-call-time text; None if it can't be read."""
+    if not text or not text.strip():
+        return None
+    text = _normalize(text)
+    period = _period(text)
+    times = list(_TIME.finditer(text))[:2]
+    if not times:
+        return next((window for word, window in PERIODS.items() if _mentions(text, [word])), None)
+
+    if len(times) == 2:
+        (start_hour, start_minute, start_meridiem), (end_hour, end_minute, end_meridiem) = (
+            match.groups() for match in times)
+        end = _minutes(end_hour, end_minute, end_meridiem, period)
+        start = _minutes(start_hour, start_minute, start_meridiem, period)
+        if start is not None and end is not None and not start_meridiem and end_meridiem:
+            # "9-11 AM": the start shares the end's AM / PM unless that puts it after the end
+            shared = _minutes(start_hour, start_minute, end_meridiem, period)
+            if shared is not None and shared < end:
+                start = shared
+        if start is not None and end is not None and not end_meridiem and end <= start and end < 12 * 60:
+            end += 12 * 60  # "10-2" is 10:00-14:00
+        if start is None or end is None or start == end:
+            return None
+        return start, end % (24 * 60) if end > 24 * 60 else end
+
+    moment = _minutes(*times[0].groups(), period)
+    if moment is None:
+        return None
+    moment %= 24 * 60
+    if _mentions(text, AFTER_WORDS):
+        return (moment, CALL_DAY[1]) if moment < CALL_DAY[1] else (moment, min(moment + 60, 24 * 60))
+    if _mentions(text, BEFORE_WORDS):
+        return (CALL_DAY[0], moment) if moment > CALL_DAY[0] else (max(moment - 60, 0), moment)
+    return moment, min(moment + 60, 24 * 60)
+
+
+def call_window(text: Optional[str]) -> Tuple[int, int]:
+    """The window stored for a best_call_time: parsed, or DEFAULT_CALL_WINDOW."""
+    return parse_call_window(text) or DEFAULT_CALL_WINDOW
+
+
+def format_window(start: Optional[int], end: Optional[int]) -> Optional[dict]:
+    if start is None or end is None:
+        return None
+    return {"from": f"{start // 60:02d}:{start % 60:02d}", "to": f"{end // 60:02d}:{end % 60:02d}"}
+
+
+def minute_of_day(now: Optional[datetime] = None) -> int:
+    """Minutes after midnight in CALL_TIMEZONE, now or at a timezone-aware `now`."""
+    local = (now or datetime.now(ZoneInfo("UTC"))).astimezone(ZoneInfo(settings.CALL_TIMEZONE))
+    return local.hour * 60 + local.minute
+
+
+def callable_at(start, end, minute: int):
+    """SQL condition: the window between columns `start` and `end` contains `minute`."""
+    return or_(
+        and_(start <= minute, end > minute),
+        and_(start > end, or_(start <= minute, end > minute)),  # wraps past midnight
+    )
+
+
+def backfill_call_windows(conn, table: str) -> int:
+    """Set the window of every row of `table` from its best_call_time; returns rows updated.
+
+    Each distinct text is parsed once into a temporary lookup table, then one
+    UPDATE reads the rows once; in raw SQL so updated_at isn't touched.
+    """
+    texts = [row[0] for row in conn.exec_driver_sql(f"SELECT DISTINCT best_call_time FROM {table}")]
+    if not texts:
+        return 0
+    conn.exec_driver_sql("CREATE TEMP TABLE IF NOT EXISTS call_window_texts "
+                         "(text TEXT UNIQUE, window_start INTEGER, window_end INTEGER)")
+    conn.exec_driver_sql("DELETE FROM call_window_texts")
+    conn.exec_driver_sql("INSERT INTO call_window_texts VALUES (?, ?, ?)",
+                         [(text, *call_window(text)) for text in texts])
+    updated = conn.exec_driver_sql(
+        f"UPDATE {table} SET (call_window_start, call_window_end) = "
+        f"(SELECT window_start, window_end FROM call_window_texts WHERE text IS {table}.best_call_time)"
+    ).rowcount
+    conn.exec_driver_sql("DROP TABLE call_window_texts")
+    return updated
+
+
+CALL_QUEUE_STATUSES = ["interested", "responded", "new"]
+CALL_QUEUE_SIZE = 20
+
+
+def _urgency_rank(urgency: Optional[str]) -> int:
+    """Where SQLite's ORDER BY urgency puts it: NULL, then the codes, then words stored as text."""
+    if urgency is None:
+        return -1
+    return URGENCY.codes.get(urgency, len(URGENCY.values))
+
+
+# sort_by: (ORDER BY, the same order as a key for merging shards' pages, descending)
+CALL_QUEUE_ORDERS = {
+    "score": ([Lead.lead_score.desc()], lambda lead: lead.lead_score),
+    "value": ([Lead.property_value.desc(), Lead.lead_score.desc()],  # no value last, like SQLite's DESC
+              lambda lead: (lead.property_value is not None, lead.property_value or 0, lead.lead_score)),
+    "urgency": ([Lead.urgency, Lead.lead_score.desc()],  # codes: urgent first
+                lambda lead: (-_urgency_rank(lead.urgency), lead.lead_score)),
+}
+
+
+def call_queue_key(sort_by: str):
+    """Merge key of `sort_by`; ValueError for an unknown order."""
+    if sort_by not in CALL_QUEUE_ORDERS:
+        raise ValueError(f"sort_by must be one of: {list(CALL_QUEUE_ORDERS)}")
+    return CALL_QUEUE_ORDERS[sort_by][1]
+
+
+def call_queue_query(db, sort_by: str = "score", minute: Optional[int] = None):
+    """Leads to call, in `sort_by` order; only those callable at `minute` (minute_of_day()) if given."""
+    call_queue_key(sort_by)
+    query = db.query(Lead).filter(
+        Lead.status.in_(CALL_QUEUE_STATUSES),
+        # Inlined, not bound: SQLite only uses a partial index whose WHERE the query states literally
+        Lead.lead_score >= literal_column(str(CALL_QUEUE_MIN_SCORE)),
+    )
+    if minute is not None:
+        query = query.filter(callable_at(Lead.call_window_start, Lead.call_window_end, minute))
+    return query.order_by(*CALL_QUEUE_ORDERS[sort_by][0])
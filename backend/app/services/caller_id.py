@@ -0,0 +1,81 @@
+# Caller ID: the lead behind an incoming phone number
+#
+# Lead.phone is kept as typed or scraped ("+66 81 234 5678", "081-234-5678",
+# "๐๘๑๒๓๔๕๖๗๘"). phone_key holds the same number in E.164 (to_e164,
+# app/services/normalize.py). It is set when the lead is inserted and indexed
+# in leads and leads_archive, so a lookup normalizes the dialled number the
+# same way and does one index seek per shard instead of scanning phones.
+#
+# - A number can belong to several leads (an owner selling twice, a re-scraped
+#   listing). The most recently created one is returned, hot or archived, and
+#   the others are listed by id.
+# - Contracts don't reference leads. A lead's latest contract is the newest
+#   contract listing one of its properties: properties.lead_id on the main
+#   database (properties_archive for archived leads), then
+#   contracts.property_id on the lead's shard. Both are indexed.
+from datetime import datetime
+from typing import List, Optional
+
+from app.database.models import ArchivedLead, ArchivedProperty, Contract, Lead, Property
+from app.database.shards import MAIN_SHARD
+from app.services.normalize import to_e164
+
+
+def leads_with_phone(db, phone_key: str) -> List[tuple]:
+    """(lead, archived) for every lead of one shard with this phone_key, newest first."""
+    leads = [(lead, False) for lead in db.query(Lead).filter(Lead.phone_key == phone_key)]
+    leads += [(lead, True) for lead in db.query(ArchivedLead).filter(ArchivedLead.phone_key == phone_key)]
+    return sorted(leads, key=lambda match: match[0].created_at or datetime.min, reverse=True)
+
+
+def latest_contract(shards, shard: str, lead_id: str, archived: bool = False):
+    """Newest contract listing one of the lead's properties, or None."""
+    properties = ArchivedProperty if archived else Property
+    db = shards.session(MAIN_SHARD)
+    try:
+        property_ids = [row.id for row in db.query(properties.id).filter(properties.lead_id == lead_id)]
+    finally:
+        db.close()
+    if not property_ids:
+        return None
+    db = shards.session(shard)
+    try:
+        return (db.query(Contract).filter(Contract.property_id.in_(property_ids))
+                .order_by(Contract.created_at.desc()).first())
+    finally:
+        db.close()
+
+
+def lookup_phone(shards, number: str) -> Optional[dict]:
+    """The lead with this phone number on any shard, its latest contract and the other leads with it.
+
+    ValueError when `number` isn't a phone number; None when no lead has it.
+    """
+    phone_key = to_e164(number)
+    if not phone_key:
+        raise ValueError(f"Not a Thai phone number: {number!r}")
+    found = shards.scatter(lambda db: leads_with_phone(db, phone_key))
+    matches = sorted(((lead, archived, shard) for shard, leads in found.items() for lead, archived in leads),
+                     key=lambda match: match[0].created_at or datetime.min, reverse=True)
+    if not matches:
+        return None
+    lead, archived, shard = matches[0]
+    return {
+        "phone_key": phone_key,
+        "lead": lead,
+        "archived": archived,
+        "contract": latest_contract(shards, shard, lead.id, archived),
+        "other_lead_ids": [other.id for other, _, _ in matches[1:]],
+    }
+
+
+def backfill_phone_keys(conn, table: str) -> int:
+    """Set phone_key of every row of `table` from its phone; returns rows updated.
+
+    One UPDATE calling to_e164 as an SQL function, in raw SQL so updated_at
+    isn't touched.
+    """
+    conn.connection.create_function("to_e164", 1, to_e164, deterministic=True)
+    return conn.exec_driver_sql(
+        f"UPDATE {table} SET phone_key = to_e164(phone) WHERE phone IS NOT NULL"
+    ).rowcount
@@ -0,0 +1,233 @@
+# Transactional outbox and change feed for leads, contracts and sequences
+#
+# Every write to those tables appends one compact record per changed row to
+# `change_log` on the same connection, inside the same transaction as the write,
+# so a change is in the feed exactly when it is committed. A record holds a
+# per-database sequence number (`seq`), the entity, its id, the operation and,
+# for updates, the changed columns - not the data: consumers (caches, counters,
+# search index, call queue, exports) re-read the rows they care about.
+#
+# Consumers keep a cursor and read forward from it, over HTTP
+# (GET /api/changes?since=) or in-process (get_change_feed().subscribe()). With
+# LEAD_SHARDS each shard has its own log and the cursor holds one seq per shard
+# ("main:120,huahin:45"); unsharded it is a plain number.
+#
+# Retention: trim_changes() drops records older than CHANGE_RETENTION_DAYS and
+# remembers the highest seq it dropped; reading from an older cursor raises
+# ChangeCursorExpired and the consumer has to rebuild from a full read.
+# compact_changes() keeps only the newest record per row among records older
+# than CHANGE_COMPACT_AFTER_HOURS, which is all a consumer that re-reads rows
+# needs.
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, inspect, literal, select, text
+
+from app.core.config import settings
+from app.database.models import ChangeLogState, ChangeRecord
+
+logger = logging.getLogger("leadgen.changes")
+
+FEED_LIMIT = 500  # records per read
+POLL_INTERVAL = 0.5  # seconds between subscriber polls when caught up
+
+_COLUMNS = ["entity", "entity_id", "op", "fields", "created_at"]
+
+_SET_TRIMMED = text("""
+    INSERT INTO change_log_state (id, trimmed_through) VALUES (1, :seq)
+    ON CONFLICT (id) DO UPDATE SET trimmed_through = MAX(trimmed_through, excluded.trimmed_through)
+""")
+
+
+class ChangeCursorExpired(LookupError):
+    pass
+
+
+def _fields(fields: Optional[Iterable[str]]) -> Optional[str]:
+    return ",".join(fields) if fields else None
+
+
+def record_changes(conn, entity: str, op: str, ids: Iterable[str], fields: Optional[Iterable[str]] = None,
+                   at: Optional[datetime] = None):
+    """Append one record per id on an open connection or session, in its transaction."""
+    at = at or datetime.utcnow()
+    rows = [{"entity": entity, "entity_id": entity_id, "op": op, "fields": _fields(fields), "created_at": at}
+            for entity_id in ids]
+    if rows:
+        conn.execute(ChangeRecord.__table__.insert(), rows)
+
+
+def record_changes_where(conn, entity: str, op: str, id_column, where, fields: Optional[Iterable[str]] = None,
+                         at: Optional[datetime] = None):
+    """Append one record per row matching `where`, for set-based statements (INSERT ... SELECT)."""
+    query = select(literal(entity), id_column, literal(op), literal(_fields(fields)),
+                   literal(at or datetime.utcnow())).where(where)
+    conn.execute(ChangeRecord.__table__.insert().from_select(_COLUMNS, query))
+
+
+def record_change(db, entity: str, obj, op: str = "update"):
+    """Record a pending ORM insert / update / delete of `obj` on its session, before commit."""
+    fields = None
+    if op == "update":
+        fields = [attr.key for attr in inspect(obj).attrs
+                  if attr.key != "updated_at" and attr.history.has_changes()]
+    db.flush()  # the insert gets its id, and the record follows the write in the same transaction
+    record_changes(db, entity, op, [obj.id], fields)
+
+
+def trimmed_through(conn) -> int:
+    return conn.execute(select(ChangeLogState.trimmed_through).where(ChangeLogState.id == 1)).scalar() or 0
+
+
+def latest_seq(conn) -> int:
+    return conn.execute(select(func.max(ChangeRecord.seq))).scalar() or trimmed_through(conn)
+
+
+def read_changes(conn, since: int, limit: int = FEED_LIMIT) -> List[dict]:
+    """Records after `since`, oldest first; ChangeCursorExpired once retention dropped some of them."""
+    floor = trimmed_through(conn)
+    if since < floor:
+        raise ChangeCursorExpired(f"Changes up to seq {floor} were removed; resync and start from the head")
+    rows = conn.execute(
+        select(ChangeRecord.__table__).where(ChangeRecord.seq > since).order_by(ChangeRecord.seq).limit(limit)
+    )
+    return [
+        {
+            "seq": row.seq,
+            "entity": row.entity,
+            "id": row.entity_id,
+            "op": row.op,
+            "fields": row.fields.split(",") if row.fields else [],
+            "at": row.created_at.isoformat(),
+        }
+        for row in rows
+    ]
+
+
+def trim_changes(engine, retention_days: Optional[int] = None) -> int:
+    """Delete records older than the retention period; returns how many."""
+    days = settings.CHANGE_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    table = ChangeRecord.__table__
+    with engine.begin() as conn:
+        through = conn.execute(select(func.max(table.c.seq)).where(table.c.created_at < cutoff)).scalar()
+        if through is None:
+            return 0
+        conn.execute(_SET_TRIMMED, {"seq": through})
+        return conn.execute(table.delete().where(table.c.seq <= through)).rowcount
+
+
+def compact_changes(engine, older_than_hours: Optional[int] = None) -> int:
+    """Delete older records superseded by a newer one for the same row; returns how many."""
+    hours = settings.CHANGE_COMPACT_AFTER_HOURS if older_than_hours is None else older_than_hours
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    table = ChangeRecord.__table__
+    newest = select(func.max(table.c.seq)).group_by(table.c.entity, table.c.entity_id)
+    with engine.begin() as conn:
+        return conn.execute(
+            table.delete().where(table.c.created_at < cutoff, table.c.seq.notin_(newest))
+        ).rowcount
+
+
+class ChangeFeed:
+    """Reads the change logs of every shard with one cursor."""
+
+    def __init__(self, router, poll_interval: float = POLL_INTERVAL):
+        self.router = router
+        self.poll_interval = poll_interval
+
+    def parse_cursor(self, value: Optional[str]) -> Dict[str, int]:
+        """{shard: seq} from "120" or "main:120,huahin:45"; shards not named start at 0."""
+        cursor = dict.fromkeys(self.router.engines, 0)
+        for part in filter(None, (value or "").split(",")):
+            name, _, seq = part.rpartition(":")
+            name = name or next(iter(self.router.engines))
+            if name not in cursor or not seq.isdigit():
+                raise ValueError(f"Invalid change cursor {value!r}")
+            cursor[name] = int(seq)
+        return cursor
+
+    def format_cursor(self, cursor: Dict[str, int]) -> str:
+        if not self.router.sharded:
+            return str(next(iter(cursor.values())))
+        return ",".join(f"{name}:{seq}" for name, seq in cursor.items())
+
+    def head(self) -> Dict[str, int]:
+        """Cursor at the newest change, for consumers that just did a full read."""
+        return self.router.scatter(latest_seq)
+
+    def read(self, cursor: Dict[str, int], limit: int = FEED_LIMIT) -> Tuple[List[dict], Dict[str, int]]:
+        """Up to `limit` changes after `cursor` and the cursor to continue from."""
+        pages = {}
+        for name in self.router.engines:
+            db = self.router.session(name)
+            try:
+                pages[name] = read_changes(db, cursor[name], limit)
+            finally:
+                db.close()
+        if not self.router.sharded:
+            records = pages[next(iter(pages))]
+        else:
+            for name, page in pages.items():
+                for record in page:
+                    record["shard"] = name
+            # Shards interleave by time; each shard's records keep their seq order
+            records = list(islice(heapq.merge(*pages.values(), key=lambda record: record["at"]), limit))
+        next_cursor = dict(cursor)
+        for record in records:
+            shard = record.get("shard", next(iter(next_cursor)))
+            next_cursor[shard] = max(next_cursor[shard], record["seq"])
+        return records, next_cursor
+
+    def subscribe(self, callback: Callable[[List[dict]], None], cursor: Optional[Dict[str, int]] = None):
+        """Call `callback(records)` from a background thread for every change after `cursor` (default: now)."""
+        return ChangeSubscription(self, callback, self.head() if cursor is None else cursor)
+
+
+class ChangeSubscription:
+    """A consumer thread; its cursor only advances once the callback returned."""
+
+    def __init__(self, feed: ChangeFeed, callback: Callable[[List[dict]], None], cursor: Dict[str, int]):
+        self.feed = feed
+        self.callback = callback
+        self.cursor = cursor
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="change-subscriber", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                records, cursor = self.feed.read(self.cursor)
+                if records:
+                    self.callback(records)
+                    self.cursor = cursor
+                    continue  # drain the backlog before waiting
+            except ChangeCursorExpired as e:
+                self.error = e
+                logger.error("Change subscription stopped: %s", e)
+                return
+            except Exception:
+                logger.exception("Change subscriber failed; retrying from cursor %s", self.cursor)
+            self._stop.wait(self.feed.poll_interval)
+
+    def close(self, timeout: float = 5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+
+_feed = None
+
+
+def get_change_feed() -> ChangeFeed:
+    """The shared feed over every shard's change log."""
+    global _feed
+    if _feed is None:
+        from app.database.shards import get_shard_router
+        _feed = ChangeFeed(get_shard_router())
+    return _feed
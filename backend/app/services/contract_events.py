@@ -0,0 +1,188 @@
+# Write-behind engagement counters for contracts
+#
+# Listing views, inquiries, viewings and offers arrive as increments
+# (POST /api/contracts/<id>/events). The buffer adds them up in memory per
+# contract and UTC day and a background thread applies them at most once per
+# FLUSH_INTERVAL seconds (sooner once FLUSH_EVERY events are pending): one
+# transaction per database, with `views = views + ?` so no increment is lost to
+# a read-modify-write race, and an upsert into `contract_daily_metrics` for the
+# daily series. Thousands of hits a minute cost one write transaction a second.
+#
+# Each flush also bumps `updated_at` and appends one change log record per
+# contract it updated, so incremental exports and feed consumers see it.
+# Counters read from the database lag by at most one flush interval. With
+# LEAD_SHARDS set, every shard gets the same statements; a contract's rows only
+# match on the shard that holds it.
+import atexit
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, bindparam, select, text
+
+from app.database.models import ContractDailyMetric
+from app.services.snapshots import check_restored, on_restore
+
+EVENT_COUNTERS = ("views", "inquiries", "viewings", "offers")
+FLUSH_INTERVAL = 1.0  # seconds
+FLUSH_EVERY = 5000  # pending events
+
+_ADD_TOTALS = text("""
+    UPDATE contracts SET
+        views = COALESCE(views, 0) + :views,
+        inquiries = COALESCE(inquiries, 0) + :inquiries,
+        viewings = COALESCE(viewings, 0) + :viewings,
+        offers = COALESCE(offers, 0) + :offers,
+        updated_at = :at
+    WHERE id = :contract_id
+""").bindparams(bindparam("at", type_=DateTime))
+
+# The SELECT only yields a row where the contract exists, so a shard never gets
+# a series for another shard's contract
+_ADD_DAILY = text("""
+    INSERT INTO contract_daily_metrics (contract_id, day, views, inquiries, viewings, offers)
+    SELECT id, :day, :views, :inquiries, :viewings, :offers FROM contracts WHERE id = :contract_id
+    ON CONFLICT (contract_id, day) DO UPDATE SET
+        views = views + excluded.views,
+        inquiries = inquiries + excluded.inquiries,
+        viewings = viewings + excluded.viewings,
+        offers = offers + excluded.offers
+""")
+
+
+_ADD_CHANGES = text("""
+    INSERT INTO change_log (entity, entity_id, op, fields, created_at)
+    SELECT 'contract', id, 'update', :fields, :at FROM contracts WHERE id = :contract_id
+""").bindparams(bindparam("at", type_=DateTime))
+
+
+def parse_event_counts(data: dict) -> Dict[str, int]:
+    """{"views": 3, ...} from a request body; raises ValueError on anything else."""
+    unknown = set(data) - set(EVENT_COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown counters: {sorted(unknown)}; use {list(EVENT_COUNTERS)}")
+    counts = {}
+    for name, value in data.items():
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError(f"{name} must be a non-negative integer")
+        if value:
+            counts[name] = value
+    if not counts:
+        raise ValueError("Pass at least one counter to increment, e.g. {\"views\": 1}")
+    return counts
+
+
+class ContractEventBuffer:
+    """Per-contract, per-day deltas in memory with a background flusher."""
+
+    def __init__(self, engines: List, flush_interval: float = FLUSH_INTERVAL, flush_every: int = FLUSH_EVERY):
+        self.engines = list(engines)
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._deltas: Dict[Tuple[str, date], Dict[str, int]] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flush_now = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._unapplied: Dict[int, List[dict]] = {}  # rows a failed flush still owes a database
+        self._flusher = None
+        self.flush_count = 0
+
+    def record(self, contract_id: str, counts: Dict[str, int], day: Optional[date] = None):
+        """Add increments for a contract; they reach the database on the next flush."""
+        key = (contract_id, day or datetime.utcnow().date())
+        with self._lock:
+            delta = self._deltas.setdefault(key, dict.fromkeys(EVENT_COUNTERS, 0))
+            for name, value in counts.items():
+                delta[name] += value
+            self._pending += sum(counts.values())
+            if self._pending >= self.flush_every:
+                self._flush_now.set()
+        self._ensure_flusher()
+
+    def pending(self, contract_id: str) -> Dict[str, int]:
+        """Increments for a contract not written yet."""
+        totals = dict.fromkeys(EVENT_COUNTERS, 0)
+        with self._lock:
+            for (delta_contract, _), delta in self._deltas.items():
+                if delta_contract == contract_id:
+                    for name, value in delta.items():
+                        totals[name] += value
+        return totals
+
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name="contract-events-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._flush_now.wait(self.flush_interval)
+            self._flush_now.clear()
+            check_restored()  # deltas counted against a replaced database are dropped, not flushed
+            self.flush()
+
+    def discard(self):
+        """Drop every unwritten delta (after a snapshot restore replaced the database)."""
+        with self._flush_lock:
+            with self._lock:
+                self._deltas, self._pending = {}, 0
+            self._unapplied = {}
+
+    def flush(self):
+        """Apply every pending delta, one transaction per database."""
+        with self._flush_lock:
+            with self._lock:
+                deltas, self._deltas, self._pending = self._deltas, {}, 0
+            if not deltas and not self._unapplied:
+                return
+
+            now = datetime.utcnow()
+            rows = [{"contract_id": contract_id, "day": day.isoformat(), **delta, "at": now,
+                     "fields": ",".join(name for name in EVENT_COUNTERS if delta[name])}
+                    for (contract_id, day), delta in deltas.items()]
+            error = None
+            for index, engine in enumerate(self.engines):
+                batch = self._unapplied.pop(index, []) + rows
+                if not batch:
+                    continue
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(_ADD_TOTALS, batch)
+                        conn.execute(_ADD_DAILY, batch)
+                        conn.execute(_ADD_CHANGES, batch)
+                except Exception as e:
+                    # Kept for this database's next flush; the others already have them
+                    self._unapplied[index] = batch
+                    error = e
+            self.flush_count += 1
+        if error:
+            raise error
+
+
+def daily_metrics(db, contract_id: str, days: int) -> List[dict]:
+    """The contract's series for the last `days` UTC days, oldest first (days without events omitted)."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = db.execute(
+        select(ContractDailyMetric)
+        .where(ContractDailyMetric.contract_id == contract_id, ContractDailyMetric.day >= since)
+        .order_by(ContractDailyMetric.day)
+    ).scalars()
+    return [{"day": row.day.isoformat(), **{name: getattr(row, name) or 0 for name in EVENT_COUNTERS}}
+            for row in rows]
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_contract_event_buffer() -> ContractEventBuffer:
+    """The shared buffer, writing to every shard's database; flushed once more at exit."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            from app.database.shards import get_shard_router
+            _buffer = ContractEventBuffer(get_shard_router().engines.values())
+            atexit.register(_buffer.flush)
+            on_restore(_buffer.discard)
+        return _buffer
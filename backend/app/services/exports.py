@@ -0,0 +1,252 @@
+# Columnar exports of leads, contracts and automation sequences
+#
+# Analysts used to page through /api/leads 500 rows at a time. An export
+# writes each table to one typed, columnar file instead, streamed in
+# EXPORT_BATCH-row batches so memory stays flat at any table size:
+#
+# - "arrow": an uncompressed Arrow IPC file. `pyarrow.memory_map()` +
+#   `pyarrow.ipc.open_file()` (or `pandas.read_feather(memory_map=True)`)
+#   loads it without copying or parsing.
+# - "parquet": zstd-compressed Parquet, one row group per batch; smaller, for
+#   shipping to other tools, but decoded on read.
+#
+# Column types follow the models (DateTime -> timestamp[us], Float -> float64,
+# ...). Leads include the archive, with `archived_at` set for archived rows,
+# and every shard's rows when LEAD_SHARDS is set.
+#
+# Incremental exports take the rows the change log (app/services/changes.py)
+# has recorded since the previous export: each export stores, per table, the
+# change_log seq it read up to on every shard, and the next one reads the rows
+# with a newer record. Change records are committed with the row they describe,
+# so nothing committed late is skipped, as it could be with an `updated_at`
+# watermark. A shard whose log was trimmed past the stored seq is exported in
+# full. An explicit `since` time still selects rows by `updated_at` (or, for
+# archived leads, `archived_at`). Deleted rows don't show up in an incremental
+# export; take a full one to pick them up.
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, null, or_, select
+
+from app.core.config import settings
+from app.database.models import ArchivedLead, AutomationSequence, ChangeRecord, Contract, Lead
+from app.database.shards import MAIN_SHARD
+from app.services.changes import latest_seq, trimmed_through
+
+EXPORT_BATCH = 65_536  # rows per record batch / row group
+EXPORT_FORMATS = {"arrow": "arrow", "parquet": "parquet"}  # format -> file extension
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+# Exported table -> models read into it; the first one defines the columns
+EXPORT_TABLES = {
+    "leads": [Lead, ArchivedLead],
+    "contracts": [Contract],
+    "automation_sequences": [AutomationSequence],
+}
+SHARDED_TABLES = {"leads", "contracts"}
+CHANGE_ENTITIES = {"leads": "lead", "contracts": "contract", "automation_sequences": "sequence"}
+
+
+class ExportNotFound(LookupError):
+    pass
+
+
+def _arrow_type(column) -> pa.DataType:
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()  # String, Text, and JSON kept as its text
+
+
+def _columns(table: str, names: Optional[List[str]] = None) -> list:
+    columns = list(EXPORT_TABLES[table][0].__table__.columns)
+    if table == "leads":
+        columns.append(ArchivedLead.__table__.c.archived_at)
+    if names:
+        columns = [column for column in columns if column.name in names]
+    return columns
+
+
+def export_schema(table: str, names: Optional[List[str]] = None) -> pa.Schema:
+    """Arrow schema of `table` (or of its columns in `names`)."""
+    return pa.schema([pa.field(column.name, _arrow_type(column)) for column in _columns(table, names)])
+
+
+def table_queries(table: str, since: Optional[datetime] = None, names: Optional[List[str]] = None,
+                  after_seq: Optional[int] = None) -> list:
+    """One select per model of `table`, in export_schema() column order.
+
+    `after_seq` keeps the rows with a change_log record newer than that seq.
+    """
+    changed_ids = None
+    if after_seq is not None:
+        changed_ids = select(ChangeRecord.entity_id).where(
+            ChangeRecord.entity == CHANGE_ENTITIES[table], ChangeRecord.seq > after_seq
+        )
+    queries = []
+    for model in EXPORT_TABLES[table]:
+        source = model.__table__
+        columns = [source.c[column.name] if column.name in source.c else null().label(column.name)
+                   for column in _columns(table, names)]
+        query = select(*columns)
+        if since is not None:
+            changed = source.c.updated_at > since
+            if "archived_at" in source.c:
+                changed = or_(changed, source.c.archived_at > since)
+            query = query.where(changed)
+        if changed_ids is not None:
+            query = query.where(source.c.id.in_(changed_ids))
+        queries.append(query)
+    return queries
+
+
+def record_batch(rows: list, schema: pa.Schema) -> pa.RecordBatch:
+    """Column-typed batch from result rows in schema order."""
+    arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Writer:
+    """Record batches into an Arrow IPC or Parquet file."""
+
+    def __init__(self, path: str, schema: pa.Schema, format: str):
+        self.schema = schema
+        if format == "parquet":
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(path, schema)
+
+    def write(self, rows: list):
+        self._writer.write_batch(record_batch(rows, self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def export_table(engines: Dict[str, object], table: str, path: str, format: str = "arrow",
+                 since: Optional[datetime] = None, cursors: Optional[Dict[str, int]] = None,
+                 batch_size: int = EXPORT_BATCH) -> dict:
+    """Write `table` from every engine ({shard: engine}) to `path`.
+
+    With `cursors` ({shard: change_log seq}), only rows changed after them are
+    written. Returns the row count and the seq each shard was read up to.
+    """
+    schema = export_schema(table)
+    writer = _Writer(path, schema, format)
+    rows_written, read_through = 0, {}
+    try:
+        for shard, engine in engines.items():
+            with engine.connect() as conn, conn.begin():  # one read snapshot per database
+                # The head is taken before the rows, so a change committed while
+                # they are read is exported again next time rather than missed
+                read_through[shard] = latest_seq(conn)
+                after_seq = (cursors or {}).get(shard)
+                if after_seq is not None and after_seq < trimmed_through(conn):
+                    after_seq = None  # records were trimmed past the cursor: export the shard in full
+                for query in table_queries(table, since, after_seq=after_seq):
+                    result = conn.execution_options(stream_results=True).execute(query)
+                    while True:
+                        rows = result.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        writer.write(rows)
+                        rows_written += len(rows)
+    finally:
+        writer.close()
+    return {"rows": rows_written, "cursors": read_through}
+
+
+class ExportStore:
+    """Exports stored as `<directory>/<name>/<table>.<ext>` with a `manifest.json`."""
+
+    def __init__(self, router, directory: Optional[str] = None):
+        self.router = router
+        self.directory = directory or settings.EXPORT_DIR
+
+    def _path(self, name: str, *parts: str) -> str:
+        if not NAME_PATTERN.match(name or ""):
+            raise ValueError(f"Invalid export name {name!r}: use letters, digits, '.', '_' and '-'")
+        return os.path.join(self.directory, name, *parts)
+
+    def create(self, name: Optional[str] = None, format: str = "arrow", since: Optional[datetime] = None,
+               incremental: bool = False) -> dict:
+        """Export every table; `incremental` continues from the latest export's change_log cursors."""
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format {format!r}: use one of {list(EXPORT_FORMATS)}")
+        started = datetime.utcnow()
+        name = name or f"export-{started:%Y%m%dT%H%M%S}"
+        if os.path.exists(self._path(name)):
+            raise FileExistsError(f"Export {name!r} already exists")
+        previous = self.list()[-1].get("cursors", {}) if incremental and self.list() else {}
+
+        temp_dir = self._path(name) + f".{os.getpid()}.tmp"
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        manifest = {"name": name, "created_at": started.isoformat(), "format": format,
+                    "since": {}, "cursors": {}, "rows": {}, "files": {}}
+        try:
+            for table in EXPORT_TABLES:
+                cursors = previous.get(table)
+                engines = self.router.engines if table in SHARDED_TABLES else {MAIN_SHARD: self.router.engines[MAIN_SHARD]}
+                filename = f"{table}.{EXPORT_FORMATS[format]}"
+                written = export_table(engines, table, os.path.join(temp_dir, filename), format,
+                                       None if cursors else since, cursors)
+                manifest["since"][table] = cursors or (since.isoformat() if since else None)
+                manifest["cursors"][table] = written["cursors"]
+                manifest["rows"][table] = written["rows"]
+                manifest["files"][table] = filename
+            manifest["size"] = sum(os.path.getsize(os.path.join(temp_dir, filename))
+                                   for filename in manifest["files"].values())
+            with open(os.path.join(temp_dir, "manifest.json"), "w") as manifest_file:
+                json.dump(manifest, manifest_file, indent=2)
+            os.replace(temp_dir, self._path(name))
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        return manifest
+
+    def info(self, name: str) -> dict:
+        path = self._path(name, "manifest.json")
+        if not os.path.exists(path):
+            raise ExportNotFound(f"Export {name!r} not found in {self.directory}")
+        with open(path) as manifest_file:
+            return json.load(manifest_file)
+
+    def file(self, name: str, table: str) -> str:
+        """Path of one table's file in export `name`."""
+        filename = self.info(name)["files"].get(table)
+        if not filename:
+            raise ExportNotFound(f"Export {name!r} has no table {table!r}")
+        return self._path(name, filename)
+
+    def list(self) -> List[dict]:
+        """Manifests of every export, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [entry for entry in os.listdir(self.directory)
+                 if NAME_PATTERN.match(entry) and os.path.exists(os.path.join(self.directory, entry, "manifest.json"))]
+        return sorted((self.info(name) for name in names), key=lambda manifest: manifest["created_at"])
+
+    def delete(self, name: str):
+        self.info(name)
+        shutil.rmtree(self._path(name))
+
+
+def read_export(path: str) -> pa.Table:
+    """Load an export file; Arrow files are memory-mapped, not copied."""
+    if path.endswith(".parquet"):
+        return pq.read_table(path)
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
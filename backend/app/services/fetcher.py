@@ -0,0 +1,365 @@
+# Shared async HTTP fetcher for the scrapers
+#
+# - one keep-alive connection pool per host
+# - a token bucket per host, paced by FACEBOOK_RATE_LIMIT / ScrapingJob.rate_limit_delay
+# - a global daily request budget (MAX_DAILY_REQUESTS), persisted next to the cache
+# - an on-disk response cache revalidated with ETag / Last-Modified, so an
+#   unchanged page costs a 304 instead of a full download and re-parse
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date
+from typing import Dict, Iterable, Iterator, Mapping, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.core.config import settings
+
+# Hosts paced by FACEBOOK_RATE_LIMIT rather than the job's own delay
+FACEBOOK_HOSTS = ("facebook.com", "fb.com", "m.facebook.com", "mbasic.facebook.com")
+
+
+class DailyBudgetExceeded(Exception):
+    """Raised when MAX_DAILY_REQUESTS has been spent for today."""
+
+
+class FetchResult:
+    """A fetched page. `not_modified` is True when the server answered 304."""
+
+    def __init__(self, url: str, status: int, body: bytes, headers: Dict[str, str],
+                 from_cache: bool = False, not_modified: bool = False):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.from_cache = from_cache
+        self.not_modified = not_modified
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+class TokenBucket:
+    """Allows `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class DailyBudget:
+    """Counts requests per calendar day across runs and processes via a small JSON file.
+
+    Every spend is a read-modify-write of the file under an exclusive lock on
+    `<path>.lock`, so concurrent fetchers (threads, scraper processes) share
+    one count instead of each writing its own.
+    """
+
+    def __init__(self, limit: int, path: Optional[str] = None):
+        self.limit = limit
+        self.path = path
+        self.day = date.today().isoformat()
+        self.used = self._read(self.day) if path else 0
+        self._lock = asyncio.Lock()
+
+    def _read(self, day: str) -> int:
+        """Requests spent on `day` according to the file."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        return state.get("used", 0) if state.get("date") == day else 0
+
+    @property
+    def remaining(self) -> int:
+        return max(self.limit - self.used, 0)
+
+    async def spend(self):
+        async with self._lock:
+            today = date.today().isoformat()
+            if today != self.day:
+                self.day, self.used = today, 0
+            if not self.path:
+                if self.used >= self.limit:
+                    raise DailyBudgetExceeded(f"Daily request budget of {self.limit} spent")
+                self.used += 1
+                return
+            # flock blocks while another process holds it: keep it off the event loop
+            await asyncio.to_thread(self._spend_locked)
+
+    def _spend_locked(self):
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file closes
+            self.used = self._read(self.day)
+            if self.used >= self.limit:
+                raise DailyBudgetExceeded(f"Daily request budget of {self.limit} spent")
+            self.used += 1
+            _atomic_write(self.path, json.dumps({"date": self.day, "used": self.used}).encode())
+
+
+class ResponseCache:
+    """Content cache on disk: `<sha256(url)>.json` holds validators, `.body` the payload.
+
+    `headers` passed in must be case-insensitive (aiohttp's CIMultiDict);
+    servers disagree on "ETag" vs "Etag".
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str, suffix: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + suffix)
+
+    def get(self, url: str):
+        """Return (meta, body) for a cached url, or (None, None)."""
+        try:
+            with open(self._path(url, ".json")) as f:
+                meta = json.load(f)
+            with open(self._path(url, ".body"), "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def put(self, url: str, status: int, headers: Mapping[str, str], body: bytes):
+        meta = {
+            "url": url,
+            "status": status,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+            "fetched_at": time.time(),
+        }
+        _atomic_write(self._path(url, ".body"), body)
+        _atomic_write(self._path(url, ".json"), json.dumps(meta).encode())
+
+    def touch(self, url: str, headers: Mapping[str, str]):
+        """Refresh validators after a 304 (servers may rotate the ETag)."""
+        meta, body = self.get(url)
+        if meta is None:
+            return
+        meta["etag"] = headers.get("ETag") or meta.get("etag")
+        meta["last_modified"] = headers.get("Last-Modified") or meta.get("last_modified")
+        meta["fetched_at"] = time.time()
+        _atomic_write(self._path(url, ".json"), json.dumps(meta).encode())
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class Fetcher:
+    """Async fetcher shared by all scrapers of a process.
+
+    Usage:
+        async with Fetcher(default_delay=job.rate_limit_delay) as fetcher:
+            result = await fetcher.get(url)
+            if not result.not_modified:
+                parse(result.text)
+    """
+
+    def __init__(
+        self,
+        default_delay: Optional[float] = None,
+        host_delays: Optional[Dict[str, float]] = None,
+        daily_limit: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        connections_per_host: Optional[int] = None,
+        timeout: float = 30.0,
+    ):
+        self.default_delay = default_delay if default_delay is not None else settings.DEFAULT_RATE_LIMIT
+        self.host_delays = {host: settings.FACEBOOK_RATE_LIMIT for host in FACEBOOK_HOSTS}
+        self.host_delays.update(host_delays or {})
+        self.connections_per_host = connections_per_host or settings.FETCH_CONNECTIONS_PER_HOST
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+        cache_dir = cache_dir or settings.FETCH_CACHE_DIR
+        self.cache = ResponseCache(cache_dir)
+        self.budget = DailyBudget(
+            daily_limit if daily_limit is not None else settings.MAX_DAILY_REQUESTS,
+            os.path.join(cache_dir, "daily_budget.json"),
+        )
+
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.stats = {"requests": 0, "downloaded": 0, "not_modified": 0, "bytes": 0}
+
+    @classmethod
+    def for_job(cls, job, **kwargs) -> "Fetcher":
+        """Fetcher paced by a ScrapingJob's `rate_limit_delay`."""
+        return cls(default_delay=job.rate_limit_delay, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    def _delay_for(self, host: str) -> float:
+        for pattern, delay in self.host_delays.items():
+            if host == pattern or host.endswith("." + pattern):
+                return delay
+        return self.default_delay
+
+    def _session(self, host: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(host)
+        if session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=self.connections_per_host, keepalive_timeout=60)
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._sessions[host] = session
+        return session
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            delay = self._delay_for(host)
+            bucket = TokenBucket(rate=1.0 / delay if delay > 0 else 1e9)
+            self._buckets[host] = bucket
+        return bucket
+
+    async def get(self, url: str) -> FetchResult:
+        """GET a url through the cache, the host's rate limit and the daily budget."""
+        host = urlsplit(url).hostname or ""
+        meta, cached_body = self.cache.get(url)
+
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        await self.budget.spend()
+        await self._bucket(host).acquire()
+
+        self.stats["requests"] += 1
+        async with self._session(host).get(url, headers=headers) as response:
+            response_headers = dict(response.headers)
+            if response.status == 304 and meta is not None:
+                self.stats["not_modified"] += 1
+                self.cache.touch(url, response.headers)
+                return FetchResult(url, meta["status"], cached_body, response_headers,
+                                   from_cache=True, not_modified=True)
+
+            body = await response.read()
+            self.stats["downloaded"] += 1
+            self.stats["bytes"] += len(body)
+            if response.status == 200 and ("ETag" in response.headers or "Last-Modified" in response.headers):
+                self.cache.put(url, response.status, response.headers, body)
+            return FetchResult(url, response.status, body, response_headers)
+
+    async def get_many(self, urls: Iterable[str], concurrency: int = 16):
+        """Yield results as they complete; hosts are still paced individually.
+
+        `concurrency` workers pull URLs from `urls` one at a time, so a long
+        (or lazy) crawl list is never turned into one task per URL up front.
+        """
+        pending = iter(urls)
+        results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        done = object()
+
+        async def worker():
+            try:
+                for url in pending:
+                    try:
+                        result = await self.get(url)
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                        result = FetchResult(url, 0, str(exc).encode(), {})
+                    await results.put(result)
+            except Exception as exc:  # DailyBudgetExceeded among them: re-raised below
+                await results.put(exc)
+            else:
+                await results.put(done)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            running = len(workers)
+            while running:
+                item = await results.get()
+                if item is done:
+                    running -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+def iter_fetched(urls: Iterable[str], queue_size: int = 64, **fetcher_kwargs) -> Iterator[FetchResult]:
+    """Fetch URLs and yield the changed (200, not 304) responses.
+
+    Runs the fetcher on its own event loop thread and hands responses over
+    through a bounded queue, so synchronous code can consume them as they
+    arrive. Stops quietly when the daily budget is spent.
+    """
+    results: queue.Queue = queue.Queue(maxsize=queue_size)
+    done = object()
+
+    async def produce():
+        async with Fetcher(**fetcher_kwargs) as fetcher:
+            try:
+                async for result in fetcher.get_many(urls):
+                    if result.status == 200 and not result.not_modified:
+                        await asyncio.get_running_loop().run_in_executor(None, results.put, result)
+            except DailyBudgetExceeded:
+                # Stop for today; what was fetched so far is still handed over
+                pass
+
+    def run():
+        try:
+            asyncio.run(produce())
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=run, name="fetcher", daemon=True)
+    thread.start()
+    while True:
+        result = results.get()
+        if result is done:
+            break
+        yield result
+    thread.join()
+
+
+def iter_listing_pages(urls: Iterable[str], source: str, queue_size: int = 64, **fetcher_kwargs) -> Iterator[dict]:
+    """Fetch listing pages and yield ingest records ({"url", "source", "html"}).
+
+    Pages the server reports as unchanged (304) are skipped, so they are never
+    re-parsed, which makes this a drop-in record source for
+    `IngestPipeline.run()`.
+    """
+    for result in iter_fetched(urls, queue_size, **fetcher_kwargs):
+        yield {"url": result.url, "source": source, "html": result.text}
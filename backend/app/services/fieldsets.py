@@ -0,0 +1,103 @@
+# Sparse fieldsets for the lead and contract list endpoints
+#
+# `GET /api/leads?fields=id,owner_name,lead_score` returns only those fields,
+# and the SELECT only names the columns behind them: `notes`, `tags` and the
+# other wide text columns are neither read from the page nor decoded nor
+# serialized unless asked for. Each response field maps to the columns it is
+# built from and a function turning the row into its value; an unknown field is
+# a ValueError (400), listing the valid ones. Without `fields` every field is
+# returned, exactly as before.
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+Field = Tuple[Tuple[str, ...], Callable]
+
+
+def column(name: str) -> Field:
+    return (name,), lambda row: getattr(row, name)
+
+
+def timestamp(name: str) -> Field:
+    return (name,), lambda row: getattr(row, name).isoformat() if getattr(row, name) else None
+
+
+def json_list(name: str) -> Field:
+    return (name,), lambda row: json.loads(getattr(row, name)) if getattr(row, name) else []
+
+
+class FieldSet:
+    """Response fields of one list endpoint and the columns each one reads."""
+
+    def __init__(self, fields: Dict[str, Field]):
+        self.fields = fields
+
+    def extend(self, **fields: Field) -> "FieldSet":
+        """A copy with more (or replaced) fields."""
+        return FieldSet({**self.fields, **fields})
+
+    def parse(self, value: Optional[str]) -> List[str]:
+        """Requested field names from `?fields=a,b`; every field when empty."""
+        names = list(dict.fromkeys(name.strip() for name in (value or "").split(",") if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown}; available: {list(self.fields)}")
+        return names or list(self.fields)
+
+    def columns(self, names: List[str], *always: str) -> List[str]:
+        """Columns to select for `names`, plus `always` (e.g. the sort key)."""
+        needed = [name for field in names for name in self.fields[field][0]]
+        return list(dict.fromkeys([*needed, *always]))
+
+    def serialize(self, row, names: List[str]) -> dict:
+        return {name: self.fields[name][1](row) for name in names}
+
+
+LEAD_FIELDS = FieldSet({
+    "id": column("id"),
+    "owner_name": column("owner_name"),
+    "owner_name_en": column("owner_name_en"),
+    "phone": column("phone"),
+    "email": column("email"),
+    "property_type": column("property_type"),
+    "location": column("location"),
+    "property_value": column("property_value"),
+    "commission_potential": column("commission_potential"),
+    "status": column("status"),
+    "lead_score": column("lead_score"),
+    "urgency": column("urgency"),
+    "source": column("source"),
+    "automation_stage": column("automation_stage"),
+    "last_contact": timestamp("last_contact"),
+    "best_call_time": column("best_call_time"),
+    "notes": column("notes"),
+    "created_at": timestamp("created_at"),
+    "tags": json_list("tags"),
+})
+
+CONTRACT_FIELDS = FieldSet({
+    "id": column("id"),
+    "owner_name": column("owner_name"),
+    "owner_name_en": column("owner_name_en"),
+    "property_type": column("property_type"),
+    "location": column("location"),
+    "property_value": column("property_value"),
+    "listing_price": column("listing_price"),
+    "sale_price": column("sale_price"),
+    "commission_rate": column("commission_rate"),
+    "commission_amount": column("commission_amount"),
+    "commission_earned": column("commission_earned"),
+    "commission_paid": column("commission_paid"),
+    "status": column("status"),
+    "date_signed": timestamp("date_signed"),
+    "date_listed": timestamp("date_listed"),
+    "date_sold": timestamp("date_sold"),
+    "days_on_market": column("days_on_market"),
+    "views": column("views"),
+    "inquiries": column("inquiries"),
+    "viewings": column("viewings"),
+    "offers": column("offers"),
+    "notes": column("notes"),
+    # Routes replace this with the stored thumbnail's URL when there is one
+    "property_image": (("image_ref", "property_image"), lambda row: row.property_image),
+    "created_at": timestamp("created_at"),
+})
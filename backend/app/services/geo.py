@@ -0,0 +1,176 @@
+# Spatial index and radius / bounding-box search for properties
+#
+# Coordinates are indexed in an SQLite R*Tree (`property_rtree`) kept in sync by
+# triggers, so inserts through the ORM, Core or raw SQL are all covered. Queries
+# narrow candidates with the R*Tree box, then rank them in SQL by an
+# equirectangular distance (plain arithmetic, no trig functions needed in
+# SQLite) and only compute haversine distances for the rows actually returned.
+#
+# R*Tree ids must be integers and properties have TEXT ids, so each indexed
+# property gets one in `property_rtree_keys`, whose INTEGER PRIMARY KEY, unlike
+# the implicit rowid of `properties`, survives VACUUM.
+import math
+from typing import List, Optional
+
+from sqlalchemy import text
+
+EARTH_RADIUS_M = 6_371_000
+METERS_PER_DEGREE = 111_320
+
+SPATIAL_TRIGGERS = ["properties_rtree_insert", "properties_rtree_update", "properties_rtree_delete"]
+
+SPATIAL_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS property_rtree USING rtree(
+        id, min_lat, max_lat, min_lng, max_lng
+    )""",
+    """CREATE TABLE IF NOT EXISTS property_rtree_keys (
+        key INTEGER PRIMARY KEY,
+        property_id TEXT NOT NULL UNIQUE
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS properties_rtree_insert AFTER INSERT ON properties
+    WHEN NEW.coordinates_lat IS NOT NULL AND NEW.coordinates_lng IS NOT NULL
+    BEGIN
+        INSERT INTO property_rtree_keys (property_id) VALUES (NEW.id);
+        INSERT INTO property_rtree
+        SELECT key, NEW.coordinates_lat, NEW.coordinates_lat, NEW.coordinates_lng, NEW.coordinates_lng
+        FROM property_rtree_keys WHERE property_id = NEW.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS properties_rtree_update
+    AFTER UPDATE OF id, coordinates_lat, coordinates_lng ON properties
+    BEGIN
+        DELETE FROM property_rtree WHERE id = (SELECT key FROM property_rtree_keys WHERE property_id = OLD.id);
+        DELETE FROM property_rtree_keys WHERE property_id = OLD.id;
+        INSERT INTO property_rtree_keys (property_id)
+        SELECT NEW.id WHERE NEW.coordinates_lat IS NOT NULL AND NEW.coordinates_lng IS NOT NULL;
+        INSERT INTO property_rtree
+        SELECT key, NEW.coordinates_lat, NEW.coordinates_lat, NEW.coordinates_lng, NEW.coordinates_lng
+        FROM property_rtree_keys WHERE property_id = NEW.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS properties_rtree_delete AFTER DELETE ON properties
+    BEGIN
+        DELETE FROM property_rtree WHERE id = (SELECT key FROM property_rtree_keys WHERE property_id = OLD.id);
+        DELETE FROM property_rtree_keys WHERE property_id = OLD.id;
+    END""",
+]
+
+PROPERTY_COLUMNS = """
+    p.id, p.lead_id, p.property_type, p.address, p.location,
+    p.coordinates_lat, p.coordinates_lng, p.listing_price, p.price_per_sqm,
+    p.bedrooms, p.bathrooms, p.area_sqm
+"""
+
+# Squared equirectangular distance in "latitude degrees", :k = cos(lat)^2
+APPROX_DISTANCE = """(
+    (p.coordinates_lat - :lat) * (p.coordinates_lat - :lat)
+    + (p.coordinates_lng - :lng) * (p.coordinates_lng - :lng) * :k
+)"""
+
+
+def ensure_spatial_index(conn):
+    """Create the R*Tree, its key map and sync triggers; backfill when newly created."""
+    existed = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'property_rtree_keys'"
+    ).first()
+    if not existed:
+        # An R*Tree from before the key map was keyed on properties.rowid
+        for trigger in SPATIAL_TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS property_rtree")
+    for statement in SPATIAL_DDL:
+        conn.exec_driver_sql(statement)
+    if not existed:
+        _backfill(conn)
+
+
+def rebuild_spatial_index(engine):
+    """Re-derive property_rtree and its keys from properties."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM property_rtree")
+        conn.exec_driver_sql("DELETE FROM property_rtree_keys")
+        _backfill(conn)
+
+
+def _backfill(conn):
+    conn.exec_driver_sql("""
+        INSERT INTO property_rtree_keys (property_id)
+        SELECT id FROM properties
+        WHERE coordinates_lat IS NOT NULL AND coordinates_lng IS NOT NULL
+        ORDER BY rowid
+    """)
+    conn.exec_driver_sql("""
+        INSERT INTO property_rtree
+        SELECT k.key, p.coordinates_lat, p.coordinates_lat, p.coordinates_lng, p.coordinates_lng
+        FROM property_rtree_keys k JOIN properties p ON p.id = k.property_id
+    """)
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _rows_with_distance(rows, lat: float, lng: float, radius_m: Optional[float] = None) -> List[dict]:
+    results = []
+    for row in rows:
+        item = dict(row._mapping)
+        item["distance_m"] = round(haversine_m(lat, lng, item["coordinates_lat"], item["coordinates_lng"]), 1)
+        if radius_m is None or item["distance_m"] <= radius_m:
+            results.append(item)
+    return results
+
+
+def properties_nearby(conn, lat: float, lng: float, radius_m: float, limit: int = 100) -> List[dict]:
+    """Properties within `radius_m` meters of a point, nearest first."""
+    cos_lat = math.cos(math.radians(lat))
+    dlat = radius_m / METERS_PER_DEGREE
+    dlng = radius_m / (METERS_PER_DEGREE * max(cos_lat, 1e-6))
+
+    query = text(f"""
+        SELECT {PROPERTY_COLUMNS}
+        FROM property_rtree r
+        JOIN property_rtree_keys k ON k.key = r.id
+        JOIN properties p ON p.id = k.property_id
+        WHERE r.min_lat >= :south AND r.max_lat <= :north
+          AND r.min_lng >= :west AND r.max_lng <= :east
+          AND {APPROX_DISTANCE} <= :radius_sq
+        ORDER BY {APPROX_DISTANCE}
+        LIMIT :limit
+    """)
+    rows = conn.execute(query, {
+        "lat": lat, "lng": lng, "k": cos_lat * cos_lat,
+        "south": lat - dlat, "north": lat + dlat, "west": lng - dlng, "east": lng + dlng,
+        # A little slack; the exact haversine filter runs on the returned rows
+        "radius_sq": (dlat * 1.01) ** 2,
+        "limit": limit,
+    })
+    return _rows_with_distance(rows, lat, lng, radius_m)
+
+
+def properties_in_bbox(conn, south: float, west: float, north: float, east: float,
+                       limit: int = 500, center_lat: Optional[float] = None,
+                       center_lng: Optional[float] = None) -> List[dict]:
+    """Properties inside a map viewport, ranked by distance to its center (or a given point)."""
+    lat = center_lat if center_lat is not None else (south + north) / 2
+    lng = center_lng if center_lng is not None else (west + east) / 2
+    cos_lat = math.cos(math.radians(lat))
+
+    query = text(f"""
+        SELECT {PROPERTY_COLUMNS}
+        FROM property_rtree r
+        JOIN property_rtree_keys k ON k.key = r.id
+        JOIN properties p ON p.id = k.property_id
+        WHERE r.min_lat >= :south AND r.max_lat <= :north
+          AND r.min_lng >= :west AND r.max_lng <= :east
+        ORDER BY {APPROX_DISTANCE}
+        LIMIT :limit
+    """)
+    rows = conn.execute(query, {
+        "lat": lat, "lng": lng, "k": cos_lat * cos_lat,
+        "south": south, "north": north, "west": west, "east": east,
+        "limit": limit,
+    })
+    return _rows_with_distance(rows, lat, lng)
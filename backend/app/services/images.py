@@ -0,0 +1,232 @@
+# Property image ingestion and resized variants
+#
+# Originals are decoded once in a worker process and rendered into a fixed set
+# of JPEG variants (IMAGE_VARIANTS). Variants are stored on disk under the
+# sha256 of the original (`IMAGE_DIR/ab/abcd.../card.jpg`), so the same photo is
+# processed and stored once however many listings use it, and a variant URL
+# never changes content; it can be cached by browsers for a year. Properties and
+# contracts point at their image through `image_ref`.
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, select
+
+from app.core.config import settings
+from app.database.models import Contract, ImageAsset, Property
+from app.services.changes import record_changes_where
+
+# name -> (width, height, mode); "cover" crops to exactly that size, "fit" keeps the aspect ratio
+IMAGE_VARIANTS = {
+    "thumbnail": (160, 160, "cover"),
+    "card": (400, 300, "cover"),
+    "detail": (1200, 1200, "fit"),
+}
+JPEG_QUALITY = 82
+MAX_PIXELS = 60_000_000  # refuse decompression bombs rather than decoding them
+WRITE_BATCH = 50
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def render_variants(data: bytes) -> Optional[dict]:
+    """Decode an image and render every variant; None if it isn't a usable image.
+
+    Pure function, so it can run in a worker process.
+    """
+    from PIL import Image, ImageOps  # only where images are decoded, not on API startup
+
+    digest = hashlib.sha256(data).hexdigest()
+    try:
+        image = Image.open(io.BytesIO(data))
+        width, height = image.size
+        if width * height > MAX_PIXELS:
+            return None
+        # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale, far cheaper than full size
+        largest = max(max(size[:2]) for size in IMAGE_VARIANTS.values())
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    variants = {}
+    for name, (variant_width, variant_height, mode) in IMAGE_VARIANTS.items():
+        if mode == "cover":
+            resized = ImageOps.fit(image, (variant_width, variant_height), Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((variant_width, variant_height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        variants[name] = {"width": resized.width, "height": resized.height, "data": buffer.getvalue()}
+
+    return {"digest": digest, "width": width, "height": height, "size": len(data), "variants": variants}
+
+
+def image_url(digest: Optional[str], variant: str = "card") -> Optional[str]:
+    """Path of a stored variant (relative to the API base), None without an image."""
+    return f"/api/images/{digest}/{variant}" if digest else None
+
+
+class ImageStore:
+    """Variant files on disk, addressed by the digest of their original."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.IMAGE_DIR
+
+    def path(self, digest: str, variant: str) -> Optional[str]:
+        if not DIGEST_PATTERN.match(digest or "") or variant not in IMAGE_VARIANTS:
+            return None
+        return os.path.join(self.directory, digest[:2], digest, f"{variant}.jpg")
+
+    def has(self, digest: str) -> bool:
+        return all(os.path.exists(self.path(digest, variant)) for variant in IMAGE_VARIANTS)
+
+    def save(self, rendered: dict):
+        for variant, info in rendered["variants"].items():
+            path = self.path(rendered["digest"], variant)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as handle:
+                handle.write(info["data"])
+            os.replace(temp_path, path)
+
+
+def _asset_row(rendered: dict, source_url: Optional[str]) -> dict:
+    return {
+        "digest": rendered["digest"],
+        "source_url": source_url,
+        "width": rendered["width"],
+        "height": rendered["height"],
+        "size": rendered["size"],
+        "variants": {
+            name: {"width": info["width"], "height": info["height"], "size": len(info["data"])}
+            for name, info in rendered["variants"].items()
+        },
+    }
+
+
+class ImageIngester:
+    """Render images in a process pool and attach them to properties / contracts.
+
+    Items are dicts with the original bytes in "data", plus optional
+    "source_url", "property_ids" and "contract_ids".
+    """
+
+    def __init__(self, engine, store: Optional[ImageStore] = None, workers: Optional[int] = None):
+        self.engine = engine
+        self.store = store or ImageStore()
+        self.workers = workers or os.cpu_count() or 1
+        self.stats = {"images": 0, "stored": 0, "skipped": 0, "invalid": 0}
+
+    def ingest(self, items: Iterable[dict]) -> dict:
+        pending_rows = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # Two images per worker in flight keeps the pool busy without
+            # holding many multi-megabyte originals in memory.
+            in_flight = []
+            for item in items:
+                self.stats["images"] += 1
+                digest = hashlib.sha256(item["data"]).hexdigest()
+                if self.store.has(digest):
+                    # Already rendered (another listing uses the same photo)
+                    self.stats["skipped"] += 1
+                    self._queue(pending_rows, None, digest, item)
+                    continue
+                in_flight.append((item, pool.submit(render_variants, item["data"])))
+                item["data"] = None
+                while len(in_flight) >= self.workers * 2:
+                    self._finish(*in_flight.pop(0), pending_rows)
+            for pending in in_flight:
+                self._finish(*pending, pending_rows)
+        self._write(pending_rows)
+        return dict(self.stats)
+
+    def ingest_one(self, data: bytes, source_url: Optional[str] = None,
+                   property_ids: List[str] = (), contract_ids: List[str] = ()) -> Optional[dict]:
+        """Render and store a single image in-process; returns its asset row."""
+        rendered = render_variants(data)
+        if rendered is None:
+            return None
+        self.store.save(rendered)
+        row = _asset_row(rendered, source_url)
+        self._write([(row, row["digest"], list(property_ids), list(contract_ids))])
+        return row
+
+    def _finish(self, item: dict, future, pending_rows: list):
+        rendered = future.result()
+        if rendered is None:
+            self.stats["invalid"] += 1
+            return
+        self.store.save(rendered)
+        self.stats["stored"] += 1
+        self._queue(pending_rows, _asset_row(rendered, item.get("source_url")), rendered["digest"], item)
+
+    def _queue(self, pending_rows: list, row: Optional[dict], digest: str, item: dict):
+        pending_rows.append((row, digest, item.get("property_ids", []), item.get("contract_ids", [])))
+        if len(pending_rows) >= WRITE_BATCH:
+            self._write(pending_rows)
+            pending_rows.clear()
+
+    def _write(self, pending_rows: list):
+        if not pending_rows:
+            return
+        properties, contracts = Property.__table__, Contract.__table__
+        assets = [row for row, _, _, _ in pending_rows if row is not None]
+        property_links = [{"target_id": property_id, "new_image_ref": digest}
+                          for _, digest, property_ids, _ in pending_rows for property_id in property_ids]
+        contract_links = [{"target_id": contract_id, "new_image_ref": digest}
+                          for _, digest, _, contract_ids in pending_rows for contract_id in contract_ids]
+        with self.engine.begin() as conn:
+            if assets:
+                conn.execute(ImageAsset.__table__.insert().prefix_with("OR IGNORE"), assets)
+            if property_links:
+                conn.execute(properties.update().where(properties.c.id == bindparam("target_id"))
+                             .values(image_ref=bindparam("new_image_ref")), property_links)
+            if contract_links:
+                conn.execute(contracts.update().where(contracts.c.id == bindparam("target_id"))
+                             .values(image_ref=bindparam("new_image_ref")), contract_links)
+                record_changes_where(conn, "contract", "update", contracts.c.id,
+                                     contracts.c.id.in_([link["target_id"] for link in contract_links]), ["image_ref"])
+
+
+def pending_image_sources(conn) -> Dict[str, dict]:
+    """Remote images not ingested yet: {url: {"property_ids": [...], "contract_ids": [...]}}.
+
+    A property's cover is the first entry of `Property.images`.
+    """
+    sources: Dict[str, dict] = {}
+
+    def add(url, key, target_id):
+        if isinstance(url, str) and url.startswith(("http://", "https://")):
+            sources.setdefault(url, {"property_ids": [], "contract_ids": []})[key].append(target_id)
+
+    for property_id, images in conn.execute(
+        select(Property.id, Property.images).where(Property.image_ref.is_(None), Property.images.isnot(None))
+    ):
+        if images:
+            add(images[0], "property_ids", property_id)
+    for contract_id, url in conn.execute(
+        select(Contract.id, Contract.property_image).where(Contract.image_ref.is_(None),
+                                                           Contract.property_image.isnot(None))
+    ):
+        add(url, "contract_ids", contract_id)
+    return sources
+
+
+def lead_image_refs(conn, lead_ids: List[str]) -> Dict[str, str]:
+    """Cover image digest per lead, taken from the lead's first property that has one."""
+    if not lead_ids:
+        return {}
+    query = (
+        select(Property.lead_id, Property.image_ref)
+        .where(Property.lead_id.in_(lead_ids), Property.image_ref.isnot(None))
+        .order_by(Property.created_at)
+    )
+    refs = {}
+    for lead_id, image_ref in conn.execute(query):
+        refs.setdefault(lead_id, image_ref)
+    return refs
@@ -0,0 +1,492 @@
+# Streaming ingest pipeline for scraped listings
+#
+#   fetch -> parse (process pool) -> normalize -> dedup -> score -> insert
+#
+# Every stage runs in its own thread and hands batches to the next one through
+# a bounded queue, so a slow stage (usually insert) blocks the ones upstream of
+# it instead of letting work pile up in memory.
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, union_all
+
+from app.database.ids import new_id
+from app.database.models import ArchivedLead, Lead
+from app.database.shards import MAIN_SHARD
+from app.services.changes import record_changes
+from app.services.normalize import normalize_thai_phone, normalize_thai_price, to_e164
+from app.services.payload_store import PayloadStore, encode_payload, insert_payloads
+from app.services.rollups import record_funnel
+from app.services.scraping_progress import get_progress_tracker
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_INSERT_CHUNK = 2000
+MAX_LOGGED_REJECTS = 10_000  # rejected records kept in a job's error log; the rest are only counted
+
+# Words in a listing that mark the owner as a motivated seller
+URGENT_KEYWORDS = ("ขายด่วน", "ด่วน", "urgent", "quick sale", "must sell")
+
+# Marks the end of the stream on a queue
+_DONE = object()
+
+
+class _ListingParser(HTMLParser):
+    """Collects the text of elements carrying a known listing class."""
+
+    FIELDS = ("owner", "owner-en", "phone", "email", "price", "type", "location", "title", "description")
+
+    def __init__(self):
+        super().__init__()
+        self.fields = {}
+        self._stack = []
+
+    def handle_starttag(self, tag, attrs):
+        classes = (dict(attrs).get("class") or "").split()
+        field = next((c for c in classes if c in self.FIELDS), None)
+        self._stack.append(field)
+
+    def handle_endtag(self, tag):
+        if self._stack:
+            self._stack.pop()
+
+    def handle_data(self, data):
+        field = next((f for f in reversed(self._stack) if f), None)
+        if field and data.strip():
+            self.fields[field] = (self.fields.get(field, "") + " " + data.strip()).strip()
+
+
+def parse_listing(record: dict) -> Optional[dict]:
+    """Extract raw listing fields from one scraped record ({"url", "source", "html"})."""
+    try:
+        return _parse_listing(record)
+    except ValueError:
+        return None
+
+
+def _parse_listing(record: dict) -> dict:
+    """parse_listing(), raising ValueError with the reason a record was rejected."""
+    parser = _ListingParser()
+    try:
+        parser.feed(record.get("html") or "")
+        parser.close()
+    except Exception as exc:
+        raise ValueError(f"unparseable HTML: {exc}") from exc
+
+    fields = parser.fields
+    if not fields.get("owner"):
+        raise ValueError("no owner name")
+    return {
+        "source": record.get("source", "thai_sites"),
+        "source_url": record.get("url"),
+        "owner_name": fields["owner"],
+        "owner_name_en": fields.get("owner-en"),
+        "phone": fields.get("phone"),
+        "email": fields.get("email"),
+        "price": fields.get("price"),
+        "property_type": fields.get("type"),
+        "location": fields.get("location"),
+        "text": " ".join(filter(None, [fields.get("title"), fields.get("description")])),
+        # Compressed here, in the worker process; stored out-of-row on insert
+        "raw": encode_payload(record.get("html") or "", "text/html; charset=utf-8"),
+    }
+
+
+def parse_batch(records: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """Process-pool entry point: parse a batch into (listings, rejected records with the reason)."""
+    parsed, rejected = [], []
+    for record in records:
+        try:
+            parsed.append(_parse_listing(record))
+        except ValueError as exc:
+            rejected.append({"url": record.get("url"), "source": record.get("source"), "error": str(exc)})
+    return parsed, rejected
+
+
+def normalize_listing(listing: dict) -> dict:
+    """Convert Thai prices to baht and phone numbers to the display format."""
+    listing["property_value"] = normalize_thai_price(listing.pop("price", None))
+    listing["phone_key"] = to_e164(listing.get("phone"))
+    listing["phone"] = normalize_thai_phone(listing.get("phone")) or listing.get("phone")
+    if listing.get("location"):
+        listing["location"] = " ".join(listing["location"].split())
+    return listing
+
+
+def dedup_key(owner_name, location, phone_key=None, property_value=None) -> int:
+    """Hash of the identity of a lead: its phone when known, otherwise owner + location + value."""
+    if phone_key:
+        return hash(("phone", phone_key))
+    return hash(("owner", (owner_name or "").strip().lower(), (location or "").strip().lower(), property_value))
+
+
+def score_listing(listing: dict) -> dict:
+    """Give a freshly scraped lead its initial score, urgency and commission potential."""
+    score = 40
+    value = listing.get("property_value") or 0
+    if value >= 10_000_000:
+        score += 25
+    elif value >= 5_000_000:
+        score += 15
+    elif value > 0:
+        score += 5
+    if listing.get("phone_key"):
+        score += 15
+    if listing.get("email"):
+        score += 10
+
+    text = (listing.get("text") or "").lower()
+    urgent = any(keyword in text for keyword in URGENT_KEYWORDS)
+    if urgent:
+        score += 10
+
+    listing["lead_score"] = min(score, 100)
+    listing["urgency"] = "urgent" if urgent else ("high" if score >= 70 else "medium")
+    listing["commission_potential"] = value * 0.03 if value else None
+    return listing
+
+
+class StageMetrics:
+    """Counters for one pipeline stage."""
+
+    def __init__(self, name: str, inbox: Optional[queue.Queue]):
+        self.name = name
+        self.inbox = inbox
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+
+    def snapshot(self) -> dict:
+        end = self.finished_at or time.perf_counter()
+        elapsed = (end - self.started_at) if self.started_at else 0.0
+        return {
+            "stage": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "queue_depth": self.inbox.qsize() if self.inbox is not None else 0,
+            "queue_capacity": self.inbox.maxsize if self.inbox is not None else 0,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput_per_sec": round(self.items_out / elapsed, 1) if elapsed else 0.0,
+            "done": self.finished_at is not None,
+        }
+
+
+class IngestFailed(RuntimeError):
+    """A stage raised; `snapshot` holds the pipeline's metrics when it stopped."""
+
+    def __init__(self, message: str, snapshot: dict):
+        super().__init__(message)
+        self.snapshot = snapshot
+
+
+class IngestPipeline:
+    """Streams scraped listing records into the leads table.
+
+    `records` is any iterable of {"url", "source", "html"} dicts; it is consumed
+    lazily by the fetch stage, so a dump file or a live scraper both work.
+    When `job_id` is given, inserted leads and parse errors are reported to the
+    scraping progress tracker for that job, and when the run ends its metrics
+    and rejected records are stored as the job's results and error log. With a shard `router`, every lead
+    (and its raw payload) is written to the shard that owns its location.
+    `run()` raises IngestFailed, from the first stage error, once every stage
+    has stopped.
+    """
+
+    STAGES = ("fetch", "parse", "normalize", "dedup", "score", "insert")
+
+    def __init__(
+        self,
+        engine,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        insert_chunk: int = DEFAULT_INSERT_CHUNK,
+        parse_workers: Optional[int] = None,
+        job_id: Optional[str] = None,
+        router=None,
+    ):
+        self.engine = engine
+        self.router = router
+        self.engines = router.engines if router else {MAIN_SHARD: engine}
+        self.job_id = job_id
+        self.progress = get_progress_tracker() if job_id else None
+        self.batch_size = batch_size
+        self.insert_chunk = insert_chunk
+        self.parse_workers = parse_workers
+
+        self.queues = {stage: queue.Queue(maxsize=queue_size) for stage in self.STAGES[1:]}
+        self.metrics = {
+            stage: StageMetrics(stage, self.queues.get(stage)) for stage in self.STAGES
+        }
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._exception = None
+        self._inbox_closed = set()  # stages that have taken _DONE from their inbox
+        self._seen = set()
+        self.rejected = []  # the first MAX_LOGGED_REJECTS records parse rejected
+        self.rejected_count = 0
+
+    # Stages ---------------------------------------------------------------
+
+    def _next(self, stage: str):
+        """Next batch of `stage`'s inbox, or _DONE once upstream has finished."""
+        batch = self.queues[stage].get()
+        if batch is _DONE:
+            self._inbox_closed.add(stage)
+        return batch
+
+    def _fetch(self, records: Iterable[dict]):
+        out = self.queues["parse"]
+        stats = self.metrics["fetch"]
+        batch = []
+        for record in records:
+            stats.items_in += 1
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                out.put(batch)
+                stats.items_out += len(batch)
+                batch = []
+        if batch:
+            out.put(batch)
+            stats.items_out += len(batch)
+
+    def _parse(self):
+        out = self.queues["normalize"]
+        stats = self.metrics["parse"]
+        # At most two batches per worker are in flight, so the pool never
+        # buffers more than a handful of batches ahead of normalize.
+        workers = self.parse_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            max_in_flight = workers * 2
+            in_flight = []
+            while True:
+                batch = self._next("parse")
+                if batch is _DONE:
+                    break
+                stats.items_in += len(batch)
+                in_flight.append((len(batch), pool.submit(parse_batch, batch)))
+                while len(in_flight) >= max_in_flight:
+                    self._drain_parsed(in_flight.pop(0), out, stats)
+            for pending in in_flight:
+                self._drain_parsed(pending, out, stats)
+
+    def _drain_parsed(self, pending, out, stats):
+        size, future = pending
+        started = time.perf_counter()
+        parsed, rejected = future.result()
+        stats.busy_seconds += time.perf_counter() - started
+        self.rejected_count += len(rejected)
+        self.rejected.extend(rejected[:MAX_LOGGED_REJECTS - len(self.rejected)])
+        stats.errors += size - len(parsed)
+        stats.items_out += len(parsed)
+        if self.progress and size > len(parsed):
+            self.progress.record(self.job_id, errors=size - len(parsed))
+        if parsed:
+            out.put(parsed)
+
+    def _transform(self, stage: str, next_stage: str, func: Callable[[List[dict]], List[dict]]):
+        out = self.queues[next_stage]
+        stats = self.metrics[stage]
+        while True:
+            batch = self._next(stage)
+            if batch is _DONE:
+                break
+            started = time.perf_counter()
+            stats.items_in += len(batch)
+            result = func(batch)
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items_out += len(result)
+            if result:
+                out.put(result)
+
+    def _normalize_batch(self, batch: List[dict]) -> List[dict]:
+        return [normalize_listing(listing) for listing in batch]
+
+    def _dedup_batch(self, batch: List[dict]) -> List[dict]:
+        unique = []
+        for listing in batch:
+            key = dedup_key(
+                listing["owner_name"], listing.get("location"),
+                listing.get("phone_key"), listing.get("property_value"),
+            )
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            unique.append(listing)
+        return unique
+
+    def _score_batch(self, batch: List[dict]) -> List[dict]:
+        return [score_listing(listing) for listing in batch]
+
+    def _insert(self):
+        stats = self.metrics["insert"]
+        pending = []
+        while True:
+            batch = self._next("insert")
+            if batch is _DONE:
+                break
+            stats.items_in += len(batch)
+            pending.extend(batch)
+            if len(pending) >= self.insert_chunk:
+                self._insert_chunk(pending, stats)
+                pending = []
+        if pending:
+            self._insert_chunk(pending, stats)
+
+    def _insert_chunk(self, listings: List[dict], stats: StageMetrics):
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": new_id("lead"),
+                "owner_name": listing["owner_name"],
+                "owner_name_en": listing.get("owner_name_en"),
+                "phone": listing.get("phone"),
+                "phone_key": listing.get("phone_key"),
+                "email": listing.get("email"),
+                "property_type": listing.get("property_type"),
+                "location": listing.get("location"),
+                "property_value": listing.get("property_value"),
+                "commission_potential": listing.get("commission_potential"),
+                "status": "new",
+                "lead_score": listing["lead_score"],
+                "urgency": listing["urgency"],
+                "source": listing.get("source"),
+                "date_scraped": now,
+                "created_at": now,
+                "updated_at": now,
+                "tags": json.dumps([]),
+                "raw_data_ref": listing["raw"][0]["digest"],
+            }
+            for listing in listings
+        ]
+        by_shard = {}
+        for listing, row in zip(listings, rows):
+            shard = self.router.shard_for(row["location"]) if self.router else MAIN_SHARD
+            by_shard.setdefault(shard, []).append((listing["raw"], row))
+        # One executemany per table, shard and chunk inside a single transaction
+        for shard, shard_rows in by_shard.items():
+            with self.engines[shard].begin() as conn:
+                insert_payloads(conn, [raw for raw, _ in shard_rows])
+                conn.execute(Lead.__table__.insert(), [row for _, row in shard_rows])
+                lead_ids = [row["id"] for _, row in shard_rows]
+                record_changes(conn, "lead", "insert", lead_ids, at=now)
+                record_funnel(conn, lead_ids, "new", now)
+        stats.busy_seconds += time.perf_counter() - started
+        stats.items_out += len(rows)
+        if self.progress:
+            self.progress.record(self.job_id, items=len(rows))
+
+    # Orchestration --------------------------------------------------------
+
+    def _load_existing_keys(self):
+        """Seed the dedup set from leads already in the database(s), archived ones included."""
+        query = union_all(
+            select(Lead.phone, Lead.owner_name, Lead.location, Lead.property_value),
+            select(ArchivedLead.phone, ArchivedLead.owner_name, ArchivedLead.location, ArchivedLead.property_value),
+        )
+        for engine in self.engines.values():
+            with engine.connect() as conn:
+                result = conn.execution_options(stream_results=True).execute(query)
+                for phone, owner_name, location, property_value in result:
+                    self._seen.add(dedup_key(owner_name, location, to_e164(phone), property_value))
+
+    def _run_stage(self, stage: str, target, *args):
+        stats = self.metrics[stage]
+        stats.started_at = time.perf_counter()
+        try:
+            target(*args)
+        except Exception as exc:
+            if self._exception is None:
+                self.error, self._exception = f"{stage}: {exc}", exc
+            stats.errors += 1
+            # Keep draining the inbox so upstream stages never block forever, unless
+            # the stage failed after upstream had finished (e.g. the final flush)
+            if stage in self.queues:
+                while stage not in self._inbox_closed:
+                    self._next(stage)
+        finally:
+            stats.finished_at = time.perf_counter()
+            stage_index = self.STAGES.index(stage)
+            if stage_index + 1 < len(self.STAGES):
+                self.queues[self.STAGES[stage_index + 1]].put(_DONE)
+
+    def run(self, records: Iterable[dict]) -> dict:
+        """Run the pipeline to completion and return the final metrics."""
+        self.started_at = time.perf_counter()
+        if self.progress:
+            self.progress.start(self.job_id)
+        self._load_existing_keys()
+
+        targets = {
+            "fetch": (self._fetch, records),
+            "parse": (self._parse,),
+            "normalize": (self._transform, "normalize", "dedup", self._normalize_batch),
+            "dedup": (self._transform, "dedup", "score", self._dedup_batch),
+            "score": (self._transform, "score", "insert", self._score_batch),
+            "insert": (self._insert,),
+        }
+        threads = [
+            threading.Thread(target=self._run_stage, args=(stage,) + targets[stage], name=f"ingest-{stage}", daemon=True)
+            for stage in self.STAGES
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.finished_at = time.perf_counter()
+        try:
+            if self.job_id:
+                self._store_job_payloads()
+        finally:
+            if self.progress:
+                self.progress.finish(self.job_id, "failed" if self.error else "completed")
+        if self._exception is not None:
+            raise IngestFailed(self.error, self.snapshot()) from self._exception
+        return self.snapshot()
+
+    def _store_job_payloads(self):
+        """The run's metrics and rejected records, out-of-row on the job (on the main database)."""
+        store = PayloadStore(self.engines[MAIN_SHARD])
+        store.set_job_payload(self.job_id, "results", self.snapshot())
+        store.set_job_payload(self.job_id, "error_log", {
+            "error": self.error,
+            "rejected_count": self.rejected_count,
+            "rejected": self.rejected,
+        })
+
+    def snapshot(self) -> dict:
+        """Per-stage throughput and queue depth, safe to call while running."""
+        end = self.finished_at or time.perf_counter()
+        elapsed = (end - self.started_at) if self.started_at else 0.0
+        inserted = self.metrics["insert"].items_out
+        return {
+            "running": self.started_at is not None and self.finished_at is None,
+            "elapsed_seconds": round(elapsed, 2),
+            "records_read": self.metrics["fetch"].items_out,
+            "leads_inserted": inserted,
+            "leads_per_sec": round(inserted / elapsed, 1) if elapsed else 0.0,
+            "error": self.error,
+            "stages": [self.metrics[stage].snapshot() for stage in self.STAGES],
+        }
+
+
+def read_listing_dump(path: str) -> Iterator[dict]:
+    """Lazily yield records from a JSON-lines dump, one scraped page per line."""
+    with open(path, encoding="utf-8") as dump:
+        for line in dump:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
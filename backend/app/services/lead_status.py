@@ -0,0 +1,104 @@
+# Bulk lead status changes
+#
+# Closing out a whole scraped batch ("mark every facebook lead contacted") used
+# to be one PUT /api/leads/<id>/status per lead: a read, a write and a commit
+# each. update_statuses_by_id() / update_statuses_by_filter() apply the same
+# change (status, notes, updated_at) with one set-based UPDATE per chunk of
+# BATCH_CHUNK leads, one transaction per chunk, so the write lock is never held
+# for the whole batch.
+#
+# Leads are picked either by id or by a filter. Archived ids are restored
+# first, exactly as a single status update does, so the archived counts stay
+# right; filters only match hot leads. Every updated lead gets its change log
+# record, and leads entering a new status their funnel rollup count, in the
+# chunk's transaction.
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, select
+
+from app.database.models import Lead
+from app.services.archive import restore_leads
+from app.services.changes import record_changes, record_changes_where
+from app.services.rollups import record_funnel
+
+BATCH_CHUNK = 500
+FILTER_FIELDS = ("status", "source", "tag", "min_score", "max_score")
+
+
+def lead_filter(criteria: dict):
+    """SQL condition for a batch filter; raises ValueError on unknown or empty criteria."""
+    unknown = set(criteria) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown filter fields: {sorted(unknown)}; use {list(FILTER_FIELDS)}")
+    conditions = []
+    if criteria.get("status"):
+        conditions.append(Lead.status == criteria["status"])
+    if criteria.get("source"):
+        conditions.append(Lead.source == criteria["source"])
+    if criteria.get("tag"):
+        # tags is a JSON list; match the quoted element, not a substring of another tag
+        conditions.append(Lead.tags.contains(json.dumps(criteria["tag"], ensure_ascii=False), autoescape=True))
+    for name, compare in (("min_score", Lead.lead_score.__ge__), ("max_score", Lead.lead_score.__le__)):
+        if criteria.get(name) is not None:
+            try:
+                conditions.append(compare(int(criteria[name])))
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be an integer") from None
+    if not conditions:
+        raise ValueError("filter needs at least one of " + ", ".join(FILTER_FIELDS))
+    return and_(*conditions)
+
+
+def _values(status: str, notes: Optional[str], now: datetime) -> dict:
+    values = {"status": status, "updated_at": now}
+    if notes:
+        values["notes"] = notes
+    return values
+
+
+def _changed_fields(values: dict) -> List[str]:
+    return [name for name in values if name != "updated_at"]
+
+
+def update_statuses_by_id(engine, lead_ids: List[str], status: str, notes: Optional[str] = None,
+                          chunk_size: int = BATCH_CHUNK) -> Dict[str, int]:
+    """Set the status of the given leads; returns updated / restored counts."""
+    leads = Lead.__table__
+    values = _values(status, notes, datetime.utcnow())
+    totals = {"updated": 0, "restored": 0}
+    lead_ids = list(dict.fromkeys(lead_ids))
+    for offset in range(0, len(lead_ids), chunk_size):
+        chunk = lead_ids[offset:offset + chunk_size]
+        with engine.begin() as conn:
+            hot = set(conn.execute(select(leads.c.id).where(leads.c.id.in_(chunk))).scalars())
+            # Touching an archived lead brings it back to the hot table
+            totals["restored"] += restore_leads(conn, [lead_id for lead_id in chunk if lead_id not in hot])["leads"]
+            record_funnel(conn, chunk, status, values["updated_at"], changing=True)
+            totals["updated"] += conn.execute(leads.update().where(leads.c.id.in_(chunk)).values(values)).rowcount
+            record_changes_where(conn, "lead", "update", leads.c.id, leads.c.id.in_(chunk),
+                                 _changed_fields(values), values["updated_at"])
+    return totals
+
+
+def update_statuses_by_filter(engine, criteria: dict, status: str, notes: Optional[str] = None,
+                              chunk_size: int = BATCH_CHUNK) -> Dict[str, int]:
+    """Set the status of every hot lead matching `criteria`; returns the updated count.
+
+    Leads already in `status` are left alone, which also lets each chunk pick
+    the next leads still to change.
+    """
+    leads = Lead.__table__
+    condition = and_(lead_filter(criteria), leads.c.status.isnot(status))
+    values = _values(status, notes, datetime.utcnow())
+    updated = 0
+    while True:
+        with engine.begin() as conn:
+            chunk = conn.execute(select(leads.c.id).where(condition).limit(chunk_size)).scalars().all()
+            record_funnel(conn, chunk, status, values["updated_at"], changing=True)
+            changed = conn.execute(leads.update().where(leads.c.id.in_(chunk)).values(values)).rowcount if chunk else 0
+            record_changes(conn, "lead", "update", chunk, _changed_fields(values), values["updated_at"])
+        updated += changed
+        if changed < chunk_size:
+            return {"updated": updated}
@@ -0,0 +1,86 @@
+# Normalization helpers for scraped Thai listing data
+import re
+from typing import Optional
+
+# Thai digits ๐-๙ map onto 0-9
+THAI_DIGITS = str.maketrans("๐๑๒๓๔๕๖๗๘๙", "0123456789")
+
+# Multipliers for "ล้าน" (million), "แสน" (hundred thousand), "M", "K", ...
+PRICE_MULTIPLIERS = [
+    ("ล้านบาท", 1_000_000),
+    ("ล้าน", 1_000_000),
+    ("ลบ.", 1_000_000),
+    ("แสน", 100_000),
+    ("หมื่น", 10_000),
+    ("mb", 1_000_000),
+    ("mil", 1_000_000),
+    ("m", 1_000_000),
+    ("k", 1_000),
+]
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_NON_DIGITS_RE = re.compile(r"\D")
+
+
+def normalize_thai_price(raw) -> Optional[float]:
+    """Parse a scraped price such as "฿8,500,000", "8.5 ล้านบาท" or "THB 4.2M" into baht.
+
+    Ranges ("8-9 ล้าน") resolve to their lower bound. Returns None when no
+    number can be found.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, (int, float)):
+        return float(raw)
+
+    text = str(raw).translate(THAI_DIGITS).lower().replace(",", "").strip()
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return None
+
+    value = float(match.group())
+    suffix = text[match.end():].strip()
+    for marker, multiplier in PRICE_MULTIPLIERS:
+        if suffix.startswith(marker):
+            return value * multiplier
+    # "8-9 ล้าน": the unit sits after the upper bound
+    if suffix.startswith("-"):
+        for marker, multiplier in PRICE_MULTIPLIERS:
+            if marker in suffix:
+                return value * multiplier
+    return value
+
+
+def to_e164(raw) -> Optional[str]:
+    """Normalize a Thai phone number to E.164 ("+66812345678").
+
+    Accepts "+66 81 234 5678", "081-234-5678", "66812345678" and Thai digits.
+    Returns None for anything that is not a plausible Thai number.
+    """
+    if not raw:
+        return None
+
+    digits = _NON_DIGITS_RE.sub("", str(raw).translate(THAI_DIGITS))
+    if digits.startswith("0066"):
+        digits = digits[4:]
+    elif digits.startswith("66") and len(digits) in (10, 11):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = digits[1:]
+
+    # Mobile numbers have 9 significant digits, landlines 8
+    if len(digits) not in (8, 9) or digits.startswith("0"):
+        return None
+    return f"+66{digits}"
+
+
+def normalize_thai_phone(raw) -> Optional[str]:
+    """Format a Thai phone number the way the UI shows it ("+66 81 234 5678")."""
+    e164 = to_e164(raw)
+    if not e164:
+        return None
+
+    digits = e164[3:]
+    if len(digits) == 9:
+        return f"+66 {digits[:2]} {digits[2:5]} {digits[5:]}"
+    return f"+66 {digits[:1]} {digits[1:4]} {digits[4:]}"
@@ -0,0 +1,147 @@
+# Out-of-row storage for scraped payloads
+#
+# Raw pages (Lead.raw_data_ref) and job results / error logs
+# (ScrapingJob.results_ref / error_log_ref) are kept in `payload_blobs` +
+# `payload_chunks`, addressed by the sha256 of their content. Hot tables only
+# carry the 64-character digest, so list queries never read payload pages, and
+# identical payloads are stored once. Each chunk is compressed on its own so a
+# large payload can be streamed chunk by chunk without loading all of it.
+import hashlib
+import json
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, union
+
+from app.database.models import ArchivedLead, Lead, PayloadBlob, PayloadChunk, ScrapingJob
+
+CHUNK_SIZE = 256 * 1024  # uncompressed bytes per chunk
+COMPRESSION_LEVEL = 6
+
+JOB_PAYLOAD_COLUMNS = {"results": "results_ref", "error_log": "error_log_ref"}
+
+
+def encode_payload(payload, content_type: Optional[str] = None) -> Tuple[dict, List[dict]]:
+    """Compress a payload into (blob row, chunk rows) without touching the database.
+
+    Dicts and lists are stored as JSON, str as UTF-8. Pure function, so it can
+    run in a worker process.
+    """
+    if isinstance(payload, (dict, list)):
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        content_type = content_type or "application/json"
+    elif isinstance(payload, str):
+        data = payload.encode("utf-8")
+        content_type = content_type or "text/plain; charset=utf-8"
+    else:
+        data = bytes(payload)
+        content_type = content_type or "application/octet-stream"
+
+    digest = hashlib.sha256(data).hexdigest()
+    chunks = []
+    for seq, offset in enumerate(range(0, max(len(data), 1), CHUNK_SIZE)):
+        chunks.append({
+            "digest": digest,
+            "seq": seq,
+            "data": zlib.compress(data[offset:offset + CHUNK_SIZE], COMPRESSION_LEVEL),
+        })
+    blob = {
+        "digest": digest,
+        "content_type": content_type,
+        "encoding": "zlib",
+        "size": len(data),
+        "stored_size": sum(len(chunk["data"]) for chunk in chunks),
+        "chunk_count": len(chunks),
+    }
+    return blob, chunks
+
+
+def insert_payloads(conn, encoded: List[Tuple[dict, List[dict]]]):
+    """Store encoded payloads on an open connection; already-stored digests are skipped."""
+    unique = {}
+    for blob, chunks in encoded:
+        unique.setdefault(blob["digest"], (blob, chunks))
+    if not unique:
+        return
+    conn.execute(PayloadBlob.__table__.insert().prefix_with("OR IGNORE"), [blob for blob, _ in unique.values()])
+    conn.execute(PayloadChunk.__table__.insert().prefix_with("OR IGNORE"), [
+        chunk for _, chunks in unique.values() for chunk in chunks
+    ])
+
+
+class PayloadStore:
+    """Read/write access to payload blobs through an engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def put(self, payload, content_type: Optional[str] = None) -> str:
+        """Store a payload and return its digest."""
+        encoded = encode_payload(payload, content_type)
+        with self.engine.begin() as conn:
+            insert_payloads(conn, [encoded])
+        return encoded[0]["digest"]
+
+    def info(self, digest: str) -> Optional[dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(select(PayloadBlob.__table__).where(PayloadBlob.digest == digest)).first()
+        return dict(row._mapping) if row else None
+
+    def iter_chunks(self, digest: str) -> Iterator[bytes]:
+        """Yield the decompressed payload one chunk at a time."""
+        table = PayloadChunk.__table__
+        query = select(table.c.data).where(table.c.digest == digest).order_by(table.c.seq)
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(query)
+            for (data,) in result:
+                yield zlib.decompress(data)
+
+    def get(self, digest: str) -> Optional[bytes]:
+        if not self.info(digest):
+            return None
+        return b"".join(self.iter_chunks(digest))
+
+    def get_json(self, digest: str):
+        data = self.get(digest)
+        return json.loads(data) if data is not None else None
+
+    def set_job_payload(self, job_id: str, kind: str, payload) -> str:
+        """Replace a scraping job's results or error log."""
+        column = JOB_PAYLOAD_COLUMNS[kind]
+        encoded = encode_payload(payload)
+        table = ScrapingJob.__table__
+        with self.engine.begin() as conn:
+            insert_payloads(conn, [encoded])
+            conn.execute(table.update().where(table.c.id == job_id).values({column: encoded[0]["digest"]}))
+        return encoded[0]["digest"]
+
+    def collect_garbage(self) -> int:
+        """Delete payloads no lead (hot or archived) or job references any more; returns blobs removed."""
+        referenced = union(
+            select(Lead.raw_data_ref).where(Lead.raw_data_ref.isnot(None)),
+            select(ArchivedLead.raw_data_ref).where(ArchivedLead.raw_data_ref.isnot(None)),
+            select(ScrapingJob.results_ref).where(ScrapingJob.results_ref.isnot(None)),
+            select(ScrapingJob.error_log_ref).where(ScrapingJob.error_log_ref.isnot(None)),
+        )
+        blobs, chunks = PayloadBlob.__table__, PayloadChunk.__table__
+        with self.engine.begin() as conn:
+            orphans = [row[0] for row in conn.execute(
+                select(blobs.c.digest).where(blobs.c.digest.notin_(referenced))
+            )]
+            for offset in range(0, len(orphans), 500):
+                batch = orphans[offset:offset + 500]
+                conn.execute(chunks.delete().where(chunks.c.digest.in_(batch)))
+                conn.execute(blobs.delete().where(blobs.c.digest.in_(batch)))
+        return len(orphans)
+
+
+_store = None
+
+
+def get_payload_store() -> PayloadStore:
+    """The shared store, bound to the application engine."""
+    global _store
+    if _store is None:
+        from app.database.connection import engine
+        _store = PayloadStore(engine)
+    return _store
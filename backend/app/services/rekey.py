@@ -0,0 +1,105 @@
+# Rewrite ids from before the ULID scheme (app/database/ids.py)
+#
+# Leads, contracts and sequences whose id is not a prefixed ULID get one built
+# from their created_at, handed out in created_at order, so the rewritten
+# primary-key index is in insert order too. On each database, in one
+# transaction:
+#
+# - the id and every column referring to it (properties.lead_id,
+#   contract_daily_metrics.contract_id, the archive tables) is rewritten
+#   through a temporary old -> new map,
+# - the change feed gets a delete of the old id and an insert of the new one,
+#   as when shard_leads.py moves a row,
+# - id_aliases keeps old -> new, so /api/leads/<old id>/... still resolves
+#   (renamed_id()).
+#
+# Properties live on the main database, so when a shard is rekeyed the main
+# file is attached and its properties.lead_id is rewritten in the same
+# transaction.
+#
+# Past change_log records keep the ids they were written with.
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import column, literal, select, table, true
+
+from app.database.ids import IdGenerator, is_current_id
+from app.database.models import (
+    ArchivedLead, ArchivedProperty, AutomationSequence, Contract, ContractDailyMetric, IdAlias, Lead, Property
+)
+from app.services.changes import record_changes_where
+
+# Entity -> (id prefix, tables whose `id` it is, columns referring to it)
+REKEYED = {
+    "lead": ("lead", [Lead.__table__, ArchivedLead.__table__],
+             [Property.__table__.c.lead_id, ArchivedProperty.__table__.c.lead_id]),
+    "contract": ("contract", [Contract.__table__], [ContractDailyMetric.__table__.c.contract_id]),
+    "sequence": ("seq", [AutomationSequence.__table__], []),
+}
+
+_MAP = table("rekey_map", column("old_id"), column("new_id"))
+MAIN_TABLES = {Property.__table__.name, ArchivedProperty.__table__.name}  # on the main database when sharded
+
+
+def renamed_id(db, old_id: Optional[str]) -> Optional[str]:
+    """What rekey_ids() renamed `old_id` to on this database, or None."""
+    if not old_id or is_current_id(old_id):
+        return None
+    return db.execute(select(IdAlias.new_id).where(IdAlias.old_id == old_id)).scalar()
+
+
+def legacy_ids(conn, entity: str) -> list:
+    """(created_at, id) of the rows of `entity` without a ULID id, oldest first."""
+    _, tables, _ = REKEYED[entity]
+    rows = [row for source in tables
+            for row in conn.execute(select(source.c.created_at, source.c.id)) if not is_current_id(row.id)]
+    return sorted(rows, key=lambda row: (row.created_at or datetime.min, row.id))
+
+
+def rekey_ids(engine, dry_run: bool = False, main_database: Optional[str] = None) -> Dict[str, int]:
+    """Give every legacy id on `engine` a ULID; returns the number renamed per entity.
+
+    `main_database` is the main SQLite file when `engine` is a shard's, so
+    references in its properties are rewritten too.
+    """
+    renamed = {}
+    at = datetime.utcnow()
+    with engine.connect() as conn:
+        if main_database:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS hub", (main_database,))
+        try:
+            with conn.begin():
+                _rekey(conn, renamed, at, dry_run, "hub." if main_database else "")
+        finally:
+            if main_database:
+                conn.exec_driver_sql("DETACH DATABASE hub")
+    return renamed
+
+
+def _rekey(conn, renamed: Dict[str, int], at: datetime, dry_run: bool, main_schema: str):
+    conn.exec_driver_sql("CREATE TEMP TABLE IF NOT EXISTS rekey_map (old_id TEXT PRIMARY KEY, new_id TEXT NOT NULL)")
+    for entity, (prefix, tables, references) in REKEYED.items():
+        rows = legacy_ids(conn, entity)
+        renamed[entity] = len(rows)
+        if dry_run or not rows:
+            continue
+        generate = IdGenerator()  # its own clock: ids follow created_at, not now
+        conn.execute(_MAP.insert(), [{"old_id": row.id, "new_id": generate(prefix, row.created_at)}
+                                     for row in rows])
+        # Plain SQL: a Core update would also bump updated_at (its onupdate), and
+        # archiving goes by updated_at
+        for target in [source.c.id for source in tables] + references:
+            name, key = target.table.name, target.name
+            schema = main_schema if name in MAIN_TABLES else ""
+            conn.exec_driver_sql(
+                f"UPDATE {schema}{name} SET {key} = (SELECT new_id FROM rekey_map WHERE old_id = {name}.{key}) "
+                f"WHERE {key} IN (SELECT old_id FROM rekey_map)"
+            )
+        record_changes_where(conn, entity, "delete", _MAP.c.old_id, true(), at=at)
+        record_changes_where(conn, entity, "insert", _MAP.c.new_id, true(), at=at)
+        conn.execute(IdAlias.__table__.insert().from_select(
+            ["old_id", "new_id", "entity", "created_at"],
+            select(_MAP.c.old_id, _MAP.c.new_id, literal(entity), literal(at))
+        ))
+        conn.execute(_MAP.delete())
+    conn.exec_driver_sql("DROP TABLE rekey_map")
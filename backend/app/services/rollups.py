@@ -0,0 +1,183 @@
+# Daily funnel and monthly commission rollups
+#
+# The stats endpoints count every lead on each request; a 12-month funnel
+# chart per source would have to scan the whole table. Instead two small
+# tables are kept up to date by the writes themselves:
+#
+# - `lead_funnel_daily`: how many leads entered each status, per UTC day,
+#   source and automation stage. Creating a lead counts one "new"; a status
+#   change counts one for the status entered (re-setting the same status
+#   counts nothing). Rows are added in the same transaction as the write, with
+#   set-based upserts, so a batch update of 500 leads is one statement.
+# - `contract_commission_monthly`: sold contracts, sale value and commission
+#   earned per month of `date_sold`. A status change adds the contract's new
+#   contribution and takes back its old one, so re-pricing or un-selling a
+#   contract moves the figures instead of double counting.
+#
+# rebuild_rollups() recomputes both from the current rows (backfill_rollups.py,
+# and after seeding). Status history before the rollups existed is not stored
+# anywhere, so the rebuild counts each lead as "new" on its creation day and in
+# its current status on its last update day; intermediate steps are lost.
+#
+# With LEAD_SHARDS every shard keeps rollups for its own rows and readers add
+# them up, so moving leads between shards needs no rollup changes.
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+
+from app.database.enums import AUTOMATION_STAGE, CONTRACT_STATUS, LEAD_SOURCE, LEAD_STATUS
+
+FUNNEL_STAGES = ("new", "contacted", "interested", "converted")
+FUNNEL_GROUPS = {"source": "source", "automation_stage": "automation_stage", "none": None}
+
+# Source, stage and status are stored as codes (app/database/enums.py); the rollups hold the words
+_SOURCE = LEAD_SOURCE.decoded("source")
+_AUTOMATION_STAGE = AUTOMATION_STAGE.decoded("automation_stage")
+_STATUS = LEAD_STATUS.decoded("status")
+
+_ADD_FUNNEL = f"""
+    INSERT INTO lead_funnel_daily (day, source, automation_stage, stage, leads)
+    SELECT :day, COALESCE({_SOURCE}, ''), COALESCE({_AUTOMATION_STAGE}, ''), :stage, COUNT(*)
+    FROM leads WHERE id IN :ids {{changed}}
+    GROUP BY source, automation_stage
+    ON CONFLICT (day, source, automation_stage, stage) DO UPDATE SET leads = leads + excluded.leads
+"""
+_ADD_ENTERED = text(_ADD_FUNNEL.format(changed="")).bindparams(bindparam("ids", expanding=True))
+# Before a batch UPDATE: only leads not yet in the status enter it
+_ADD_CHANGING = text(_ADD_FUNNEL.format(changed="AND status IS NOT :status")).bindparams(
+    bindparam("ids", expanding=True))
+
+_ADD_COMMISSION = text("""
+    INSERT INTO contract_commission_monthly (month, sold, sale_value, commission_earned)
+    VALUES (:month, :sold, :sale_value, :commission_earned)
+    ON CONFLICT (month) DO UPDATE SET
+        sold = sold + excluded.sold,
+        sale_value = sale_value + excluded.sale_value,
+        commission_earned = commission_earned + excluded.commission_earned
+""")
+
+_REBUILD = [
+    "DELETE FROM lead_funnel_daily",
+    f"""
+    INSERT INTO lead_funnel_daily (day, source, automation_stage, stage, leads)
+    SELECT day, source, automation_stage, stage, COUNT(*) FROM (
+        SELECT date(created_at) AS day, COALESCE({_SOURCE}, '') AS source,
+               COALESCE({_AUTOMATION_STAGE}, '') AS automation_stage, 'new' AS stage
+        FROM (SELECT created_at, source, automation_stage FROM leads
+              UNION ALL SELECT created_at, source, automation_stage FROM leads_archive)
+        UNION ALL
+        SELECT date(COALESCE(updated_at, created_at)), COALESCE({_SOURCE}, ''), COALESCE({_AUTOMATION_STAGE}, ''),
+               {_STATUS}
+        FROM (SELECT created_at, updated_at, source, automation_stage, status FROM leads
+              UNION ALL SELECT created_at, updated_at, source, automation_stage, status FROM leads_archive)
+        WHERE status IS NOT NULL AND status != {LEAD_STATUS.code('new')}
+    )
+    WHERE day IS NOT NULL
+    GROUP BY day, source, automation_stage, stage
+    """,
+    "DELETE FROM contract_commission_monthly",
+    f"""
+    INSERT INTO contract_commission_monthly (month, sold, sale_value, commission_earned)
+    SELECT strftime('%Y-%m', date_sold), COUNT(*), SUM(COALESCE(sale_price, 0)), SUM(COALESCE(commission_earned, 0))
+    FROM contracts WHERE status = {CONTRACT_STATUS.code('sold')} AND date_sold IS NOT NULL
+    GROUP BY strftime('%Y-%m', date_sold)
+    """,
+]
+
+
+def record_funnel(conn, lead_ids: Iterable[str], status: Optional[str], at: Optional[datetime] = None,
+                  changing: bool = False):
+    """Count `lead_ids` as entering `status` on the day of `at`, on an open connection or session.
+
+    Called after the rows hold their source and automation stage; with
+    `changing`, before a batch UPDATE, so leads already in `status` are skipped.
+    """
+    lead_ids = list(lead_ids)
+    if not status or not lead_ids:
+        return
+    params = {"day": (at or datetime.utcnow()).date().isoformat(), "stage": status, "ids": lead_ids}
+    if changing:
+        conn.execute(_ADD_CHANGING, {**params, "status": LEAD_STATUS.stored(status)})
+    else:
+        conn.execute(_ADD_ENTERED, params)
+
+
+def sale_contribution(contract) -> Optional[Tuple[str, float, float]]:
+    """(month, sale value, commission) a contract adds to the monthly rollup, None unless sold."""
+    if contract.status != "sold" or not contract.date_sold:
+        return None
+    return contract.date_sold.strftime("%Y-%m"), contract.sale_price or 0.0, contract.commission_earned or 0.0
+
+
+def record_sale(conn, before: Optional[Tuple[str, float, float]], after: Optional[Tuple[str, float, float]]):
+    """Replace a contract's old sale_contribution() with its new one."""
+    if before == after:
+        return
+    for contribution, sign in ((before, -1), (after, 1)):
+        if contribution:
+            month, sale_value, commission = contribution
+            conn.execute(_ADD_COMMISSION, {"month": month, "sold": sign, "sale_value": sign * sale_value,
+                                           "commission_earned": sign * commission})
+
+
+def rebuild_rollups(conn):
+    """Recompute both rollup tables from the leads and contracts on this connection."""
+    for statement in _REBUILD:
+        conn.execute(text(statement))
+
+
+def funnel_rows(db, start: date, end: date, group_by: Optional[str]) -> List[tuple]:
+    """(day, group, stage, leads) between `start` and `end` inclusive, from the rollup only."""
+    group = FUNNEL_GROUPS[group_by] or "''"
+    return db.execute(text(f"""
+        SELECT day, {group}, stage, SUM(leads) FROM lead_funnel_daily
+        WHERE day BETWEEN :start AND :end
+        GROUP BY day, {group}, stage
+    """), {"start": start.isoformat(), "end": end.isoformat()}).fetchall()
+
+
+def funnel_report(rows: Iterable[tuple], group_by: Optional[str]) -> List[dict]:
+    """Per group: totals per funnel stage, conversion rate and the daily series, from funnel_rows()."""
+    days = defaultdict(lambda: defaultdict(lambda: dict.fromkeys(FUNNEL_STAGES, 0)))
+    for day, group, stage, leads in rows:
+        if stage in FUNNEL_STAGES:
+            days[group or None][str(day)][stage] += leads
+
+    report = []
+    for group, series in days.items():
+        totals = dict.fromkeys(FUNNEL_STAGES, 0)
+        for counts in series.values():
+            for stage, leads in counts.items():
+                totals[stage] += leads
+        report.append({
+            "group": group if group_by != "none" else None,
+            "totals": totals,
+            "conversion_rate": round(totals["converted"] / totals["new"] * 100 if totals["new"] else 0, 1),
+            "days": [{"day": day, **counts} for day, counts in sorted(series.items())],
+        })
+    report.sort(key=lambda entry: -entry["totals"]["new"])
+    return report
+
+
+def commission_rows(db, start: date, end: date) -> List[tuple]:
+    """(month, sold, sale value, commission) for the months from `start` to `end`."""
+    return db.execute(text("""
+        SELECT month, sold, sale_value, commission_earned FROM contract_commission_monthly
+        WHERE month BETWEEN :start AND :end AND sold != 0
+    """), {"start": start.strftime("%Y-%m"), "end": end.strftime("%Y-%m")}).fetchall()
+
+
+def commission_report(rows: Iterable[tuple]) -> List[dict]:
+    """Monthly totals across shards, oldest first, from commission_rows()."""
+    months: Dict[str, dict] = {}
+    for month, sold, sale_value, commission in rows:
+        entry = months.setdefault(month, {"month": month, "sold": 0, "sale_value": 0.0, "commission_earned": 0.0})
+        entry["sold"] += sold
+        entry["sale_value"] += sale_value or 0.0
+        entry["commission_earned"] += commission or 0.0
+    return [
+        {**entry, "sale_value": round(entry["sale_value"], 2), "commission_earned": round(entry["commission_earned"], 2)}
+        for _, entry in sorted(months.items())
+    ]
@@ -0,0 +1,229 @@
+# In-memory scraping progress with coalesced database writes
+#
+# Scrapers report every item to the tracker; the tracker keeps the counters in
+# memory and writes all dirty jobs to `scraping_jobs` in one transaction at most
+# once per FLUSH_INTERVAL seconds (sooner when a job has FLUSH_EVERY unsaved
+# items). The progress stream endpoint reads from memory and never touches the
+# database while a job is running.
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam
+
+from app.database.models import ScrapingJob
+from app.services.snapshots import check_restored, on_restore
+
+FLUSH_INTERVAL = 1.0  # seconds
+FLUSH_EVERY = 500  # unsaved items per job
+STREAM_MIN_INTERVAL = 0.25  # seconds between events on a progress stream
+FINISHED_TTL = 60  # seconds a finished job stays in memory for late stream readers
+
+logger = logging.getLogger("leadgen.progress")
+
+TERMINAL_STATUSES = ("completed", "failed", "paused")
+
+
+class JobProgress:
+    """Live counters for one job; `version` increases on every change."""
+
+    def __init__(self, job_id: str, total: Optional[int] = None, status: str = "running"):
+        self.job_id = job_id
+        self.total = total
+        self.status = status
+        self.progress = 0
+        self.items_found = 0
+        self.error_count = 0
+        self.updated_at = datetime.utcnow()
+        self.touched_at = time.monotonic()
+        self.version = 0
+        self.unsaved = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.job_id,
+            "status": self.status,
+            "progress": self.progress,
+            "itemsFound": self.items_found,
+            "errorCount": self.error_count,
+            "lastUpdate": self.updated_at.isoformat(),
+            "version": self.version,
+        }
+
+
+class ProgressTracker:
+    """Process-wide registry of running jobs with a background flusher."""
+
+    def __init__(self, engine, flush_interval: float = FLUSH_INTERVAL, flush_every: int = FLUSH_EVERY):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.jobs: Dict[str, JobProgress] = {}
+        self._dirty = set()
+        self._changed = threading.Condition()
+        self._flush_now = threading.Event()
+        self._flush_lock = threading.Lock()  # one flush at a time, so an older snapshot never lands last
+        self._flusher = None
+        self.flush_count = 0
+
+    # Reporting ------------------------------------------------------------
+
+    def start(self, job_id: str, total: Optional[int] = None):
+        with self._changed:
+            self.jobs[job_id] = JobProgress(job_id, total)
+            self._touch(self.jobs[job_id])
+        self._ensure_flusher()
+
+    def record(self, job_id: str, items: int = 0, errors: int = 0, progress: Optional[int] = None):
+        """Count scraped items / errors. Progress is derived from `total` unless given."""
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if job is None:
+                job = self.jobs[job_id] = JobProgress(job_id)
+            job.items_found += items
+            job.error_count += errors
+            if progress is not None:
+                job.progress = max(0, min(100, progress))
+            elif job.total:
+                job.progress = min(100, job.items_found * 100 // job.total)
+            job.unsaved += items + errors
+            self._touch(job)
+            if job.unsaved >= self.flush_every:
+                self._flush_now.set()
+        self._ensure_flusher()
+
+    def finish(self, job_id: str, status: str = "completed"):
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job.status = status
+            if status == "completed":
+                job.progress = 100
+            self._touch(job)
+        self.flush()
+
+    def reset(self):
+        """Forget every job (after a snapshot restore replaced their rows); open streams end."""
+        with self._flush_lock:
+            with self._changed:
+                self.jobs.clear()
+                self._dirty = set()
+                self._changed.notify_all()
+
+    def _touch(self, job: JobProgress):
+        job.version += 1
+        job.updated_at = datetime.utcnow()
+        job.touched_at = time.monotonic()
+        self._dirty.add(job.job_id)
+        self._changed.notify_all()
+
+    # Reading --------------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._changed:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def wait_for_change(self, job_id: str, since_version: int, timeout: float) -> Optional[dict]:
+        """Block until the job moves past `since_version` (or timeout); None once it is gone."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self.jobs.get(job_id)
+                if job is None or job.version > since_version:
+                    return job.to_dict() if job else None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return job.to_dict()
+                self._changed.wait(remaining)
+
+    # Flushing -------------------------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name="progress-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._flush_now.wait(self.flush_interval)
+            self._flush_now.clear()
+            try:
+                check_restored()
+                self.flush()
+                self._prune()
+            except Exception:
+                logger.exception("Progress flush failed; retrying")
+
+    def _prune(self):
+        """Forget finished jobs once their final state is saved and stale."""
+        cutoff = time.monotonic() - FINISHED_TTL
+        with self._changed:
+            for job_id, job in list(self.jobs.items()):
+                if (job.status in TERMINAL_STATUSES and job_id not in self._dirty
+                        and job.touched_at < cutoff):
+                    del self.jobs[job_id]
+
+    def flush(self):
+        """Write every dirty job in a single transaction.
+
+        The dirty set is taken up front so reports made during the write mark
+        their jobs dirty again; if the write fails, the taken jobs are put back.
+        Flushes are serialized so a finished job's final state is written last.
+        """
+        with self._flush_lock:
+            with self._changed:
+                if not self._dirty:
+                    return
+                rows = []
+                for job_id in self._dirty:
+                    job = self.jobs.get(job_id)
+                    if job is None:
+                        continue
+                    job.unsaved = 0
+                    rows.append({
+                        "job_id": job.job_id,
+                        "new_status": job.status,
+                        "new_progress": job.progress,
+                        "new_items_found": job.items_found,
+                        "new_error_count": job.error_count,
+                        "new_updated_at": job.updated_at,
+                    })
+                flushing, self._dirty = self._dirty, set()
+
+            if not rows:
+                return
+            table = ScrapingJob.__table__
+            statement = table.update().where(table.c.id == bindparam("job_id")).values(
+                status=bindparam("new_status"),
+                progress=bindparam("new_progress"),
+                items_found=bindparam("new_items_found"),
+                error_count=bindparam("new_error_count"),
+                updated_at=bindparam("new_updated_at"),
+            )
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(statement, rows)
+            except Exception:
+                with self._changed:
+                    self._dirty |= flushing
+                raise
+            self.flush_count += 1
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_progress_tracker() -> ProgressTracker:
+    """The shared tracker, bound to the application engine."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            from app.database.connection import engine
+            _tracker = ProgressTracker(engine)
+            on_restore(_tracker.reset)
+        return _tracker
@@ -0,0 +1,441 @@
+# Deterministic synthetic databases at any scale
+#
+# Leads, contracts (with the property each one lists), and automation sequences
+# are drawn from NumPy generators spawned from one seed, in fixed-size chunks,
+# with every column given explicitly (no `datetime.utcnow` defaults) relative to
+# a fixed EPOCH. The same seed and lead count therefore always produce the same
+# rows, and the same database file, so benchmark runs on different days and
+# machines compare like with like.
+#
+# Rows are inserted with Core executemany inside a single transaction, with enum
+# columns already as their codes (app/database/enums.py); secondary
+# indexes of the seeded tables are dropped first and rebuilt once at the end.
+# Ids are ULIDs of each row's created_at (app/database/ids.py) with the random
+# part drawn from a stream seeded with the same seed; rows of a chunk are
+# generated in created_at order, so primary-key inserts mostly append. The funnel and
+# commission rollups (app/services/rollups.py) are computed once at the end.
+# The file is vacuumed last: the pages freed by dropping the indexes are reused
+# in an order that depends on how SQLAlchemy created them, and VACUUM rewrites
+# every table and index in a fixed order, so the file comes out byte-identical.
+import json
+import random
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.database.enums import AUTOMATION_STAGE, CONTRACT_STATUS, LEAD_SOURCE, LEAD_STATUS, URGENCY
+from app.database.ids import IdGenerator
+from app.database.models import AutomationSequence, Contract, Lead, Property
+from app.services.call_queue import call_window
+from app.services.rollups import rebuild_rollups
+
+GENERATOR_CHUNK = 50_000  # rows generated and inserted per step; part of the output, don't change
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CONTRACTS_PER_LEAD = 0.05
+SEED_CACHE_PAGES = -262_144  # 256 MB page cache while rebuilding indexes
+
+# Fixed reference time: generated dates fall in the two years before it
+EPOCH = datetime(2025, 1, 1)
+HISTORY_DAYS = 730
+
+# (Thai, English) first names and surnames, combined independently
+FIRST_NAMES = [
+    ("สมชาย", "Somchai"), ("สุนีย์", "Sunee"), ("วิรัตน์", "Wirat"), ("ประยุทธ์", "Prayut"),
+    ("วาสนา", "Wasana"), ("นริศรา", "Narisara"), ("ธีรยุทธ์", "Teerayut"), ("สมศักดิ์", "Somsak"),
+    ("มาลี", "Malee"), ("อนุชา", "Anucha"), ("กิตติ", "Kitti"), ("พรทิพย์", "Pornthip"),
+    ("สุรชัย", "Surachai"), ("จันทร์เพ็ญ", "Chanpen"), ("ณัฐวุฒิ", "Nattawut"), ("ศิริพร", "Siriporn"),
+    ("ประเสริฐ", "Prasert"), ("อรุณี", "Arunee"), ("ชัยวัฒน์", "Chaiwat"), ("รัตนา", "Rattana"),
+    ("วีระ", "Weera"), ("กัญญา", "Kanya"), ("สุทธิพงษ์", "Sutthipong"), ("ปิยะนุช", "Piyanuch"),
+]
+SURNAMES = [
+    ("วงศ์ประโคน", "Wongprakorn"), ("ธนาวงศ์", "Thanawong"), ("สุขเจริญ", "Sukcharoen"),
+    ("มานะสิน", "Manasin"), ("เจริญสุข", "Charoensuk"), ("บุญมา", "Boonma"), ("สมบูรณ์", "Somboon"),
+    ("ศรีสวัสดิ์", "Srisawat"), ("แก้วมณี", "Kaewmanee"), ("ทองดี", "Thongdee"), ("รัตนพันธ์", "Rattanaphan"),
+    ("พูลสวัสดิ์", "Poonsawat"), ("จันทร์แก้ว", "Chankaew"), ("ใจดี", "Jaidee"), ("มีสุข", "Meesuk"),
+    ("สายทอง", "Saithong"), ("วัฒนกุล", "Wattanakul"), ("อินทรสุข", "Intarasuk"),
+]
+
+# name: (weight, latitude, longitude, price multiplier)
+LOCATIONS = {
+    "Hua Hin": (0.34, 12.5684, 99.9577, 1.15),
+    "Cha-am": (0.14, 12.7997, 99.9674, 0.90),
+    "Pranburi": (0.12, 12.3927, 99.9166, 0.85),
+    "Prachuap Khiri Khan": (0.09, 11.8124, 99.7973, 0.75),
+    "Koh Samui": (0.10, 9.5120, 100.0136, 1.45),
+    "Pattaya": (0.12, 12.9236, 100.8825, 1.05),
+    "Bangkok": (0.09, 13.7563, 100.5018, 1.60),
+}
+# name: (weight, median area sqm, median price per sqm, bedrooms low, bedrooms high)
+PROPERTY_TYPES = {
+    "Condo": (0.34, 45, 85_000, 1, 2),
+    "House": (0.24, 160, 32_000, 2, 4),
+    "Villa": (0.16, 320, 48_000, 3, 6),
+    "Townhouse": (0.14, 120, 30_000, 2, 3),
+    "Land": (0.12, 1_600, 6_500, 0, 0),
+}
+
+LEAD_STATUSES = {"new": 0.38, "contacted": 0.23, "interested": 0.12, "responded": 0.08,
+                 "not_interested": 0.15, "converted": 0.04}
+STATUS_SCORE_SHIFT = {"new": 0, "contacted": 4, "interested": 16, "responded": 12,
+                      "not_interested": -22, "converted": 20}
+AUTOMATION_STAGES = {
+    "new": [None, "facebook_initial"],
+    "contacted": ["facebook_initial", "day_3_email"],
+    "interested": ["ready_to_call", "property_valuation"],
+    "responded": ["email_follow_up", "ready_to_call"],
+    "not_interested": [None, "stopped"],
+    "converted": ["contract_signed", None],
+}
+SOURCES = {"facebook": 0.44, "google_maps": 0.24, "thai_sites": 0.22, "manual": 0.06, "referral": 0.04}
+# Lead score threshold (with noise) for each urgency, checked in order
+URGENCY_THRESHOLDS = [("urgent", 85), ("high", 70), ("medium", 40), ("low", -1)]
+BEST_CALL_TIMES = ["9 AM - 11 AM", "10 AM - 2 PM", "2 PM - 6 PM", "9 AM - 5 PM", "6 PM - 8 PM",
+                   "เช้า 9-12 น.", "บ่าย 13-17 น.", "หลัง 18.00 น.", None]
+TAG_SETS = [[], [], ["Sea View"], ["Quick Sale"], ["Investment Property"], ["Family Home"],
+            ["High Priority", "Quick Sale"], ["Sea View", "Pool"], ["Needs Renovation"], ["Foreign Quota"]]
+EMAIL_SHARE = 0.35
+EMAIL_DOMAINS = ["gmail.com", "hotmail.com", "yahoo.com", "outlook.co.th"]
+
+CONTRACT_STATUSES = {"listed": 0.38, "under_offer": 0.14, "sold": 0.36, "expired": 0.12}
+COMMISSION_RATES = [2.5, 3.0, 3.0, 3.0, 3.5, 5.0]
+
+SEQUENCES = [
+    ("Facebook Initial Outreach", "facebook_message",
+     "สวัสดีค่ะ! เห็นว่าคุณสนใจขายบ้านใน {location} ใช่ไหมคะ? เรามีลูกค้าที่กำลังมองหาอยู่เลยค่ะ"),
+    ("Day 3 Email Follow-up", "email",
+     "Hi! Following up on our conversation about your property in {location}. Are you still interested in selling?"),
+    ("Property Valuation Offer", "email_with_attachment",
+     "Free property valuation report attached. Let's discuss your selling timeline!"),
+]
+
+
+def parse_scale(value: str) -> Tuple[str, int]:
+    """("10k", 10000) for a named scale, (value, int(value)) for a plain lead count."""
+    name = value.lower()
+    if name in SCALES:
+        return name, SCALES[name]
+    return value, int(value.replace("_", ""))
+
+
+def _weighted(mapping: dict) -> Tuple[list, np.ndarray]:
+    names = list(mapping)
+    weights = np.array([mapping[name] if not isinstance(mapping[name], tuple) else mapping[name][0]
+                        for name in names], dtype=float)
+    return names, weights / weights.sum()
+
+
+def _column(values: list, indexes: np.ndarray) -> list:
+    return np.array(values, dtype=object)[indexes].tolist()
+
+
+def _timestamps(seconds: np.ndarray) -> np.ndarray:
+    """`seconds` after EPOCH (may be negative) in SQLAlchemy's SQLite DATETIME format."""
+    moments = np.datetime64(EPOCH, "us") + seconds.astype("timedelta64[s]")
+    return np.char.replace(np.datetime_as_string(moments, unit="us"), "T", " ").astype(object)
+
+
+def _history_seconds(rng: np.random.Generator, count: int) -> np.ndarray:
+    """Creation times over HISTORY_DAYS, denser towards EPOCH (scraping volume grows)."""
+    age = (1 - np.sqrt(rng.random(count))) * HISTORY_DAYS * 86400
+    return -age.astype(np.int64)
+
+
+def _ids(prefix: str, created_at: List[str], id_rng: Optional[random.Random]) -> list:
+    """Ids for rows created at `created_at`, handed out oldest first as rekey_ids.py does.
+
+    An IdGenerator given an earlier time than its last one reuses its last
+    millisecond, so going in time order keeps every id on its row's created_at.
+    """
+    generate = IdGenerator(id_rng.getrandbits) if id_rng else IdGenerator()
+    ids = [None] * len(created_at)
+    for position in sorted(range(len(created_at)), key=created_at.__getitem__):
+        ids[position] = generate(prefix, datetime.fromisoformat(created_at[position]))
+    return ids
+
+
+def _prices(rng: np.random.Generator, type_index: np.ndarray, location_index: np.ndarray):
+    """(area_sqm, price) for property types / locations by index, lognormally spread."""
+    type_specs = list(PROPERTY_TYPES.values())
+    location_specs = list(LOCATIONS.values())
+    median_area = np.array([spec[1] for spec in type_specs], dtype=float)[type_index]
+    median_sqm_price = np.array([spec[2] for spec in type_specs], dtype=float)[type_index]
+    multiplier = np.array([spec[3] for spec in location_specs])[location_index]
+    area = np.round(median_area * rng.lognormal(0.0, 0.35, len(type_index)))
+    price = area * median_sqm_price * multiplier * rng.lognormal(0.0, 0.2, len(type_index))
+    return area, np.maximum(np.round(price, -4), 500_000)
+
+
+def _owner_names(rng: np.random.Generator, count: int) -> Tuple[list, list, np.ndarray, np.ndarray]:
+    first = rng.integers(0, len(FIRST_NAMES), count)
+    last = rng.integers(0, len(SURNAMES), count)
+    combined = first * len(SURNAMES) + last
+    thai = [f"{first_th} {last_th}" for first_th, _ in FIRST_NAMES for last_th, _ in SURNAMES]
+    english = [f"{first_en} {last_en}" for _, first_en in FIRST_NAMES for _, last_en in SURNAMES]
+    return _column(thai, combined), _column(english, combined), first, last
+
+
+def generate_leads(rng: np.random.Generator, count: int, id_rng: Optional[random.Random] = None) -> Dict[str, list]:
+    """Columns of `count` leads in created_at order; `id_rng` makes their ids reproducible."""
+    statuses, status_p = _weighted(LEAD_STATUSES)
+    sources, source_p = _weighted(SOURCES)
+    locations, location_p = _weighted(LOCATIONS)
+    types, type_p = _weighted(PROPERTY_TYPES)
+
+    status = rng.choice(len(statuses), count, p=status_p)
+    source = rng.choice(len(sources), count, p=source_p)
+    location = rng.choice(len(locations), count, p=location_p)
+    property_type = rng.choice(len(types), count, p=type_p)
+    owner_th, owner_en, first, last = _owner_names(rng, count)
+    _, value = _prices(rng, property_type, location)
+
+    shift = np.array([STATUS_SCORE_SHIFT[name] for name in statuses])[status]
+    score = np.clip(np.round(rng.beta(2.4, 2.2, count) * 100 + shift), 0, 100).astype(np.int64)
+    urgency_score = score + rng.normal(0, 8, count)
+    urgency = np.full(count, len(URGENCY_THRESHOLDS) - 1)
+    for position, (_, threshold) in reversed(list(enumerate(URGENCY_THRESHOLDS))):
+        urgency[urgency_score > threshold] = position
+
+    created = np.sort(_history_seconds(rng, count))
+    contacted = np.minimum(created + rng.exponential(6 * 86400, count).astype(np.int64), 0)
+    has_contact = status != statuses.index("new")
+    stage = rng.integers(0, 2, count)
+    phone = rng.integers(0, 100_000_000, count)
+    email_domain = np.where(rng.random(count) < EMAIL_SHARE, rng.integers(0, len(EMAIL_DOMAINS), count), -1)
+
+    created_at = _timestamps(created)
+    stages = np.array([[AUTOMATION_STAGE.stored(name) for name in AUTOMATION_STAGES[status_name]]
+                       for status_name in statuses], dtype=object)
+    tags = [json.dumps(tag_set, ensure_ascii=False) for tag_set in TAG_SETS]
+    first_en = [name.lower() for _, name in FIRST_NAMES]
+    last_en = [name[:4].lower() for _, name in SURNAMES]
+    phones = [f"+66 {8 + number // 50_000_000}{number // 10_000_000 % 5 + 1} "
+              f"{number // 10_000 % 1000:03d} {number % 10_000:04d}" for number in phone.tolist()]
+    call_time = rng.integers(0, len(BEST_CALL_TIMES), count)
+    windows = [call_window(text) for text in BEST_CALL_TIMES]
+    return {
+        "id": _ids("lead", created_at.tolist(), id_rng),
+        "owner_name": owner_th,
+        "owner_name_en": owner_en,
+        "phone": phones,
+        "phone_key": [number.replace(" ", "") for number in phones],
+        "email": [f"{first_en[first_index]}.{last_en[last_index]}{number % 1000}@{EMAIL_DOMAINS[domain]}"
+                  if domain >= 0 else None
+                  for first_index, last_index, number, domain
+                  in zip(first.tolist(), last.tolist(), phone.tolist(), email_domain.tolist())],
+        "messenger_link": [None] * count,
+        "property_type": _column(types, property_type),
+        "location": _column(locations, location),
+        "property_value": value.tolist(),
+        "commission_potential": (value * 0.03).tolist(),
+        "estimated_value": [None] * count,
+        "status": _column([LEAD_STATUS.stored(name) for name in statuses], status),
+        "lead_score": score.tolist(),
+        "urgency": _column([URGENCY.stored(name) for name, _ in URGENCY_THRESHOLDS], urgency),
+        "source": _column([LEAD_SOURCE.stored(name) for name in sources], source),
+        "automation_stage": stages[status, stage].tolist(),
+        "last_contact": np.where(has_contact, _timestamps(contacted), None).tolist(),
+        "best_call_time": _column(BEST_CALL_TIMES, call_time),
+        "call_window_start": _column([start for start, _ in windows], call_time),
+        "call_window_end": _column([end for _, end in windows], call_time),
+        "date_scraped": created_at.tolist(),
+        "created_at": created_at.tolist(),
+        "updated_at": _timestamps(np.where(has_contact, contacted, created)).tolist(),
+        "tags": _column(tags, rng.integers(0, len(tags), count)),
+        "notes": [None] * count,
+        "raw_data_ref": [None] * count,
+    }
+
+
+def generate_contracts(rng: np.random.Generator, count: int,
+                       id_rng: Optional[random.Random] = None) -> Tuple[Dict[str, list], Dict[str, list]]:
+    """Columns of `count` contracts, in signing order, and of the property each one lists."""
+    statuses, status_p = _weighted(CONTRACT_STATUSES)
+    locations, location_p = _weighted(LOCATIONS)
+    types, type_p = _weighted(PROPERTY_TYPES)
+    location_specs = list(LOCATIONS.values())
+    type_specs = list(PROPERTY_TYPES.values())
+
+    status = rng.choice(len(statuses), count, p=status_p)
+    location = rng.choice(len(locations), count, p=location_p)
+    property_type = rng.choice(len(types), count, p=type_p)
+    owner_th, owner_en, _, _ = _owner_names(rng, count)
+    area, price = _prices(rng, property_type, location)
+    latitude = np.array([spec[1] for spec in location_specs])[location] + rng.normal(0, 0.03, count)
+    longitude = np.array([spec[2] for spec in location_specs])[location] + rng.normal(0, 0.03, count)
+    bedrooms_low = np.array([spec[3] for spec in type_specs])[property_type]
+    bedrooms_high = np.array([spec[4] for spec in type_specs])[property_type]
+    bedrooms = rng.integers(bedrooms_low, bedrooms_high + 1)
+    furnished = rng.random(count) < 0.45
+    rate = np.array(COMMISSION_RATES)[rng.integers(0, len(COMMISSION_RATES), count)]
+
+    signed = np.sort(-(rng.random(count) * 540 * 86400).astype(np.int64))
+    listed = np.minimum(signed + rng.integers(0, 7 * 86400, count), 0)
+    on_market = np.minimum(rng.gamma(2.0, 30.0, count).astype(np.int64), -listed // 86400)
+    sold = status == statuses.index("sold")
+    sale_price = np.round(price * rng.uniform(0.88, 1.0, count), -4)
+    paid = sold & (rng.random(count) < 0.7)
+    views = rng.poisson(4 * (on_market + 1))
+    inquiries = rng.binomial(views, 0.07)
+    viewings = rng.binomial(inquiries, 0.5)
+    offers = rng.binomial(viewings, 0.25)
+
+    signed_at, listed_at = _timestamps(signed), _timestamps(listed)
+    property_ids = _ids("prop", signed_at.tolist(), id_rng)
+    sold_at = _timestamps(listed + on_market * 86400)
+    nothing = [None] * count
+    properties = {
+        "id": property_ids,
+        "lead_id": nothing,
+        "property_type": _column(types, property_type),
+        "address": nothing,
+        "location": _column(locations, location),
+        "coordinates_lat": np.round(latitude, 6).tolist(),
+        "coordinates_lng": np.round(longitude, 6).tolist(),
+        "listing_price": price.tolist(),
+        "price_per_sqm": np.round(price / area, 2).tolist(),
+        "rental_yield": nothing,
+        "bedrooms": bedrooms.tolist(),
+        "bathrooms": np.where(bedrooms > 0, np.maximum(bedrooms - 1, 1), None).tolist(),
+        "area_sqm": area.tolist(),
+        "furnished": furnished.astype(np.int64).tolist(),
+        "description_thai": nothing,
+        "description_english": nothing,
+        "images": nothing,
+        "image_ref": nothing,
+        "virtual_tour_url": nothing,
+        "days_on_market": on_market.tolist(),
+        "views_count": views.tolist(),
+        "inquiries_count": inquiries.tolist(),
+        "created_at": signed_at.tolist(),
+        "updated_at": signed_at.tolist(),
+    }
+    contracts = {
+        "id": _ids("contract", signed_at.tolist(), id_rng),
+        "property_id": property_ids,
+        "owner_name": owner_th,
+        "owner_name_en": owner_en,
+        "property_type": properties["property_type"],
+        "location": properties["location"],
+        "property_value": price.tolist(),
+        "listing_price": price.tolist(),
+        "sale_price": np.where(sold, sale_price, None).tolist(),
+        "commission_rate": rate.tolist(),
+        "commission_amount": (price * rate / 100).tolist(),
+        "commission_earned": np.where(sold, sale_price * rate / 100, None).tolist(),
+        "commission_paid": paid.astype(np.int64).tolist(),
+        "status": _column([CONTRACT_STATUS.stored(name) for name in statuses], status),
+        "date_signed": signed_at.tolist(),
+        "date_listed": listed_at.tolist(),
+        "date_sold": np.where(sold, sold_at, None).tolist(),
+        "days_on_market": on_market.tolist(),
+        "views": views.tolist(),
+        "inquiries": inquiries.tolist(),
+        "viewings": viewings.tolist(),
+        "offers": offers.tolist(),
+        "notes": nothing,
+        "property_image": nothing,
+        "image_ref": nothing,
+        "created_at": signed_at.tolist(),
+        "updated_at": np.where(sold, sold_at, listed_at).tolist(),
+    }
+    return contracts, properties
+
+
+def generate_sequences(rng: np.random.Generator, count: int, id_rng: Optional[random.Random] = None) -> Dict[str, list]:
+    locations = list(LOCATIONS)
+    rows = []
+    for i in range(count):
+        name, sequence_type, template = SEQUENCES[i % len(SEQUENCES)]
+        location = locations[i // len(SEQUENCES) % len(locations)]
+        created = -int(rng.integers(30, HISTORY_DAYS)) * 86400
+        daily_limit = int(rng.choice([20, 30, 50, 100]))
+        rows.append({
+            "name": name if i < len(SEQUENCES) else f"{name} - {location} #{i // len(SEQUENCES)}",
+            "type": sequence_type,
+            "status": "active" if rng.random() < 0.75 else "paused",
+            "template": template.format(location=location),
+            "daily_limit": daily_limit,
+            "leads_in_sequence": int(rng.integers(20, 2_000)),
+            "success_rate": round(float(rng.uniform(8, 40)), 1),
+            "sent_today": int(rng.integers(0, daily_limit + 1)),
+            "last_sent": -int(rng.integers(1, 48)) * 3600,
+            "next_execution": int(rng.integers(1, 24)) * 3600,
+            "created_at": created,
+            "updated_at": created,
+        })
+    columns = {key: [row[key] for row in rows] for key in rows[0]} if rows else {}
+    for key in ("last_sent", "next_execution", "created_at", "updated_at"):
+        columns[key] = _timestamps(np.array(columns.get(key, []), dtype=np.int64)).tolist()
+    columns["id"] = _ids("seq", columns["created_at"], id_rng)
+    return columns
+
+
+def seed_counts(leads: int) -> Dict[str, int]:
+    contracts = int(leads * CONTRACTS_PER_LEAD)
+    return {
+        "leads": leads,
+        "contracts": contracts,
+        "properties": contracts,
+        "sequences": len(SEQUENCES) * (3 + int(np.log10(max(leads, 1)))),
+    }
+
+
+def _insert(conn, table, columns: Dict[str, list]):
+    """executemany the INSERT Core compiles for `table`, with every column supplied.
+
+    Values are already in their stored form (datetimes as SQLAlchemy's SQLite
+    strings, booleans as 0/1), so rows skip SQLAlchemy's per-value processing,
+    and no column falls back to a `datetime.utcnow` default.
+    """
+    names = [column.name for column in table.columns]
+    missing = set(names) - set(columns)
+    if missing:
+        raise ValueError(f"{table.name}: no generated values for {sorted(missing)}")
+    rows = list(zip(*(columns[name] for name in names)))
+    if rows:
+        conn.exec_driver_sql(str(table.insert().compile(dialect=conn.dialect)), rows)
+
+
+def _chunks(total: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, total, GENERATOR_CHUNK):
+        yield start, min(GENERATOR_CHUNK, total - start)
+
+
+def seed_database(engine, leads: int, seed: int = 42, progress=None) -> Dict[str, int]:
+    """Fill an empty database with `leads` leads and proportional contracts / sequences.
+
+    Runs in one transaction: either the whole data set is stored or none of it.
+    `progress(table, rows_done, rows_total)` is called after every chunk.
+    """
+    counts = seed_counts(leads)
+    lead_rng, contract_rng, sequence_rng = (
+        np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(3)
+    )
+    id_rng = random.Random(seed)  # random part of the ids, apart from the column generators
+    tables = [Lead.__table__, Property.__table__, Contract.__table__, AutomationSequence.__table__]
+    deferred = [index for table in tables for index in sorted(table.indexes, key=lambda index: index.name)]
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA cache_size = {SEED_CACHE_PAGES}")
+        for index in deferred:
+            index.drop(conn, checkfirst=True)
+
+        for start, size in _chunks(counts["leads"]):
+            _insert(conn, Lead.__table__, generate_leads(lead_rng, size, id_rng))
+            if progress:
+                progress("leads", start + size, counts["leads"])
+        for start, size in _chunks(counts["contracts"]):
+            contracts, properties = generate_contracts(contract_rng, size, id_rng)
+            _insert(conn, Property.__table__, properties)
+            _insert(conn, Contract.__table__, contracts)
+            if progress:
+                progress("contracts", start + size, counts["contracts"])
+        _insert(conn, AutomationSequence.__table__, generate_sequences(sequence_rng, counts["sequences"], id_rng))
+
+        for index in deferred:
+            index.create(conn)
+        rebuild_rollups(conn)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+    return counts
@@ -0,0 +1,230 @@
+# Named snapshots of the SQLite database
+#
+# A snapshot is a complete copy of the database file taken through SQLite's
+# online backup API, so it is consistent even while the app is writing, plus a
+# small JSON sidecar (creation time, size, row counts). Restoring copies the
+# pages back through the same API into the live database instead of replacing
+# the file, so connections already open in a running server see the restored
+# data, and WAL / journal files stay consistent. Both directions are page
+# copies: a 1M-lead database is saved or restored in seconds, where deleting
+# and re-seeding rows takes minutes.
+#
+# With LEAD_SHARDS, every shard file is copied along with the main database,
+# into `<name>.shards/<shard>.db`, and restored with it; a snapshot is only
+# restored into the same set of shards it was taken from.
+#
+# What a process keeps in memory about the data is not in the files: contract
+# events and scraping progress not written yet, the analytics engine's tables
+# and change cursor, the valuation comparables. restore() replaces
+# `<database>.restored`; each of those registers a reset with on_restore(), and
+# a process runs its resets once it sees the marker change (check_restored(),
+# before every API request and in the background threads before they write or
+# refresh). The restoring process runs its own right away.
+#
+# Image variant files (IMAGE_DIR) live outside the database and are not part of
+# a snapshot.
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.database.shards import shard_paths
+
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+COUNTED_TABLES = ["leads", "contracts", "properties", "automation_sequences", "scraping_jobs"]
+
+logger = logging.getLogger("leadgen.snapshots")
+
+_restore_hooks: List[Callable[[], None]] = []
+_restore_lock = threading.Lock()
+_UNSEEN = object()
+_seen_marker = _UNSEEN  # the restore marker this process last acted on
+
+
+class SnapshotNotFound(LookupError):
+    pass
+
+
+def _backup(source_path: str, target_path: str):
+    with closing(sqlite3.connect(source_path)) as source, closing(sqlite3.connect(target_path)) as target:
+        source.backup(target)  # all pages in one step, under a read lock on the source
+
+
+def on_restore(hook: Callable[[], None]):
+    """Call `hook()` in this process after a snapshot is restored, by this or another process."""
+    _restore_hooks.append(hook)
+
+
+def _marker(database: str):
+    """Identity of `<database>.restored`; a new file on every restore."""
+    try:
+        stat = os.stat(f"{database}.restored")
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _run_restore_hooks():
+    for hook in list(_restore_hooks):
+        try:
+            hook()
+        except Exception:
+            logger.exception("Reset after snapshot restore failed: %r", hook)
+
+
+def check_restored(database: Optional[str] = None) -> bool:
+    """Run the on_restore() hooks if a snapshot was restored since the last check.
+
+    The first check only notes the marker: nothing was in memory before it.
+    """
+    global _seen_marker
+    marker = _marker(database or settings.DATABASE_PATH)
+    if marker == _seen_marker:
+        return False
+    with _restore_lock:
+        if marker == _seen_marker:
+            return False
+        first, _seen_marker = _seen_marker is _UNSEEN, marker
+        if first:
+            return False
+        logger.warning("Database was restored from a snapshot; resetting in-memory state")
+        _run_restore_hooks()
+    return True
+
+
+def _mark_restored(database: str):
+    global _seen_marker
+    path = f"{database}.restored"
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as marker_file:
+        marker_file.write(datetime.utcnow().isoformat())
+    os.replace(temp_path, path)
+    with _restore_lock:
+        _seen_marker = _marker(database)
+        _run_restore_hooks()
+
+
+def _row_counts(path: str) -> dict:
+    counts = {}
+    with closing(sqlite3.connect(path)) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in COUNTED_TABLES:
+            if table in tables:
+                counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    return counts
+
+
+class SnapshotStore:
+    """Snapshots of one database (and its shards), stored as `<directory>/<name>.db` + `<name>.json`."""
+
+    def __init__(self, database: Optional[str] = None, directory: Optional[str] = None,
+                 shards: Optional[Dict[str, str]] = None):
+        self.database = database or settings.DATABASE_PATH
+        self.directory = directory or settings.SNAPSHOT_DIR
+        self.shards = shard_paths() if shards is None else shards  # {shard name: SQLite file}
+
+    def _path(self, name: str, extension: str) -> str:
+        if not NAME_PATTERN.match(name or ""):
+            raise ValueError(f"Invalid snapshot name {name!r}: use letters, digits, '.', '_' and '-'")
+        return os.path.join(self.directory, f"{name}.{extension}")
+
+    def _shard_path(self, name: str, shard: str) -> str:
+        return os.path.join(self._path(name, "shards"), f"{shard}.db")
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name, "db"))
+
+    def save(self, name: str, overwrite: bool = False) -> dict:
+        """Copy the database and its shards into snapshot `name`; returns its metadata."""
+        path, meta_path, shard_dir = self._path(name, "db"), self._path(name, "json"), self._path(name, "shards")
+        if os.path.exists(path) and not overwrite:
+            raise FileExistsError(f"Snapshot {name!r} already exists")
+        for database in [self.database, *self.shards.values()]:
+            if not os.path.exists(database):
+                raise FileNotFoundError(f"Database {database} does not exist")
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path, temp_shard_dir = f"{path}.{os.getpid()}.tmp", f"{shard_dir}.{os.getpid()}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        shutil.rmtree(temp_shard_dir, ignore_errors=True)
+        _backup(self.database, temp_path)
+        size, rows = os.path.getsize(temp_path), _row_counts(temp_path)
+        if self.shards:
+            os.makedirs(temp_shard_dir)
+        for shard, database in self.shards.items():
+            shard_copy = os.path.join(temp_shard_dir, f"{shard}.db")
+            _backup(database, shard_copy)
+            size += os.path.getsize(shard_copy)
+            for table, count in _row_counts(shard_copy).items():
+                rows[table] = rows.get(table, 0) + count
+        meta = {
+            "name": name,
+            "database": os.path.abspath(self.database),
+            "shards": sorted(self.shards),
+            "created_at": datetime.utcnow().isoformat(),
+            "size": size,
+            "rows": rows,
+        }
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        if self.shards:
+            os.replace(temp_shard_dir, shard_dir)
+        os.replace(temp_path, path)
+        with open(meta_path, "w") as meta_file:
+            json.dump(meta, meta_file, indent=2)
+        return meta
+
+    def restore(self, name: str) -> dict:
+        """Overwrite the database and its shards with snapshot `name`; returns its metadata."""
+        path = self._path(name, "db")
+        if not os.path.exists(path):
+            raise SnapshotNotFound(f"Snapshot {name!r} not found in {self.directory}")
+        meta = self.info(name)
+        saved = set(meta.get("shards", []))
+        if saved != set(self.shards):
+            raise ValueError(f"Snapshot {name!r} has shards {sorted(saved) or 'none'}, "
+                             f"LEAD_SHARDS has {sorted(self.shards) or 'none'}")
+        _backup(path, self.database)
+        for shard, database in self.shards.items():
+            _backup(self._shard_path(name, shard), database)
+        _mark_restored(self.database)
+        return meta
+
+    def info(self, name: str) -> dict:
+        path, meta_path = self._path(name, "db"), self._path(name, "json")
+        if not os.path.exists(path):
+            raise SnapshotNotFound(f"Snapshot {name!r} not found in {self.directory}")
+        if os.path.exists(meta_path):
+            with open(meta_path) as meta_file:
+                return json.load(meta_file)
+        # Snapshot file copied in by hand, without a sidecar
+        modified = datetime.utcfromtimestamp(os.path.getmtime(path))
+        shard_dir = self._path(name, "shards")
+        shards = sorted(entry[:-3] for entry in os.listdir(shard_dir) if entry.endswith(".db")) \
+            if os.path.isdir(shard_dir) else []
+        return {"name": name, "database": None, "shards": shards, "created_at": modified.isoformat(),
+                "size": os.path.getsize(path), "rows": {}}
+
+    def list(self) -> List[dict]:
+        """Metadata of every snapshot, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [entry[:-3] for entry in os.listdir(self.directory)
+                 if entry.endswith(".db") and NAME_PATTERN.match(entry[:-3])]
+        return sorted((self.info(name) for name in names), key=lambda meta: meta["created_at"])
+
+    def delete(self, name: str):
+        path, meta_path = self._path(name, "db"), self._path(name, "json")
+        if not os.path.exists(path):
+            raise SnapshotNotFound(f"Snapshot {name!r} not found in {self.directory}")
+        os.remove(path)
+        shutil.rmtree(self._path(name, "shards"), ignore_errors=True)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
@@ -0,0 +1,394 @@
+# Comparable-sales valuation for leads
+#
+# Sold contracts (`Contract.sale_price`) and the features of the property each
+# one sold (area, bedrooms, type, location, coordinates) are loaded once into
+# NumPy arrays. A lead is valued from its k nearest sold comparables of the same
+# property type: every comparable's price is adjusted to the lead's floor area
+# through its price per sqm, and the adjusted prices are averaged with inverse
+# distance weights. Whole segments are valued as one matrix operation per
+# property type and written back with a single executemany.
+#
+# With LEAD_SHARDS, sold contracts are loaded from every shard and each shard's
+# leads are valued and written on that shard. Properties stay on the main
+# database, so the features of a shard's rows are looked up there by id
+# (fill_from_main()).
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, func, text
+
+from app.database.enums import CONTRACT_STATUS
+from app.database.models import Lead
+from app.database.shards import MAIN_SHARD
+from app.services.changes import record_changes
+from app.services.snapshots import on_restore
+
+K_NEAREST = 8
+DEFAULT_COMMISSION_RATE = 3.0  # Percentage, same default as Contract.commission_rate
+INDEX_TTL = 300  # seconds before get_valuation_index() reloads sold contracts
+WRITE_CHUNK = 5000
+LOOKUP_CHUNK = 10_000  # ids per IN (...) when looking up a shard's properties on the main database
+
+# Distance scales: a difference of one scale unit adds 1 to the squared distance
+GEO_SCALE_KM = 5.0
+AREA_SCALE = 0.35  # log(area), ~40% larger or smaller
+BEDROOM_SCALE = 1.5
+LOCATION_MISMATCH = 2.0  # used instead of geography when either side lacks coordinates
+MISSING_FEATURE = 1.0  # squared-distance cost of a feature one side doesn't have
+TYPE_MISMATCH = 25.0  # only when a type has fewer than k sold comparables
+
+KM_PER_DEGREE = 111.32
+MATRIX_BUDGET = 4_000_000  # target x comparable cells per block, bounds memory
+
+# A converted lead may have been archived since, so its property is looked up
+# in properties_archive when it isn't in properties
+SOLD_QUERY = f"""
+    SELECT c.id, c.sale_price, c.property_id,
+           COALESCE(p.property_type, a.property_type, c.property_type) AS property_type,
+           COALESCE(p.location, a.location, c.location) AS location,
+           COALESCE(p.area_sqm, a.area_sqm) AS area_sqm,
+           COALESCE(p.bedrooms, a.bedrooms) AS bedrooms,
+           COALESCE(p.coordinates_lat, a.coordinates_lat) AS coordinates_lat,
+           COALESCE(p.coordinates_lng, a.coordinates_lng) AS coordinates_lng
+    FROM contracts c
+    LEFT JOIN properties p ON p.id = c.property_id
+    LEFT JOIN properties_archive a ON p.id IS NULL AND a.id = c.property_id
+    WHERE c.status = {CONTRACT_STATUS.code('sold')} AND c.sale_price > 0
+    ORDER BY c.id
+"""
+
+# One property per lead (the first one stored) supplies its features
+LEAD_QUERY = """
+    SELECT l.id, l.property_type, l.location,
+           p.area_sqm, p.bedrooms, p.coordinates_lat, p.coordinates_lng
+    FROM leads l LEFT JOIN properties p
+      ON p.rowid = (SELECT MIN(rowid) FROM properties WHERE lead_id = l.id)
+"""
+
+# The same features on the main database, for rows of other shards
+SOLD_PROPERTY_QUERY = """
+    SELECT id AS key, property_type, location, area_sqm, bedrooms, coordinates_lat, coordinates_lng
+    FROM properties WHERE id IN :keys
+    UNION ALL
+    SELECT id AS key, property_type, location, area_sqm, bedrooms, coordinates_lat, coordinates_lng
+    FROM properties_archive WHERE id IN :keys
+"""
+LEAD_PROPERTY_QUERY = """
+    SELECT lead_id AS key, area_sqm, bedrooms, coordinates_lat, coordinates_lng
+    FROM properties
+    WHERE rowid IN (SELECT MIN(rowid) FROM properties WHERE lead_id IN :keys GROUP BY lead_id)
+"""
+
+SEGMENT_FILTERS = {
+    "location": "l.location = :location",
+    "source": "l.source = :source",
+    "status": "l.status = :status",
+    "property_type": "l.property_type = :property_type",
+}
+
+
+def _key(value) -> str:
+    return (value or "").strip().lower()
+
+
+def _floats(values) -> np.ndarray:
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+class Features:
+    """Column arrays for a set of properties (comparables or leads)."""
+
+    def __init__(self, rows: List[dict]):
+        self.ids = [row["id"] for row in rows]
+        self.labels = [(row["property_type"], row["location"]) for row in rows]
+        self.types = [_key(row["property_type"]) for row in rows]
+        self.locations = [_key(row["location"]) for row in rows]
+        self.area = _floats(row["area_sqm"] for row in rows)
+        self.area[self.area <= 0] = np.nan
+        self.bedrooms = _floats(row["bedrooms"] for row in rows)
+        self.lat = _floats(row["coordinates_lat"] for row in rows)
+        self.lng = _floats(row["coordinates_lng"] for row in rows)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class ComparablesIndex:
+    """Sold comparables in NumPy arrays, answering k-nearest queries in batch."""
+
+    def __init__(self, sold: Features, prices: np.ndarray, k: int = K_NEAREST):
+        self.sold = sold
+        self.k = k
+        self.prices = prices
+        self.price_per_sqm = prices / sold.area  # NaN where the area is unknown
+        self.loaded_at = time.monotonic()
+
+        # Integer codes so type / location comparisons are vectorized
+        self.location_codes: Dict[str, int] = {}
+        self.sold_location = self._encode_locations(sold.locations)
+        self.sold_type = np.array(sold.types, dtype=object)
+        self.by_type: Dict[str, np.ndarray] = {
+            property_type: np.flatnonzero(self.sold_type == property_type) for property_type in set(sold.types)
+        }
+
+        lat = sold.lat[~np.isnan(sold.lat)]
+        self.km_per_degree_lng = KM_PER_DEGREE * np.cos(np.radians(lat.mean() if lat.size else 13.0))
+        self.sold_scaled = self._scaled(sold)
+
+    @classmethod
+    def load(cls, shards, k: int = K_NEAREST) -> "ComparablesIndex":
+        """Sold contracts of every shard (a ShardRouter), in id order.
+
+        The order decides which of equally distant comparables are the nearest,
+        so it doesn't depend on how contracts are spread over shards.
+        """
+        found = shards.scatter(lambda db: [dict(row._mapping) for row in db.execute(text(SOLD_QUERY))])
+        rows = found.pop(MAIN_SHARD)
+        if found:
+            sharded = [row for shard_rows in found.values() for row in shard_rows]
+            with shards.engines[MAIN_SHARD].connect() as conn:
+                fill_from_main(conn, sharded, "property_id", SOLD_PROPERTY_QUERY)
+            rows = sorted(rows + sharded, key=lambda row: row["id"])
+        return cls(Features(rows), _floats(row["sale_price"] for row in rows), k)
+
+    def __len__(self):
+        return len(self.sold)
+
+    def _encode_locations(self, locations: List[str]) -> np.ndarray:
+        codes = [self.location_codes.setdefault(location, len(self.location_codes)) if location else -1
+                 for location in locations]
+        return np.array(codes, dtype=np.int64)
+
+    def _target_locations(self, locations: List[str]) -> np.ndarray:
+        # Locations no comparable has (or none at all) never match
+        return np.array([self.location_codes.get(location, -2) if location else -2
+                         for location in locations], dtype=np.int64)
+
+    def estimate(self, targets: Features) -> dict:
+        """Value every target; returns arrays `value` (NaN without comparables),
+        `neighbors` (sold positions, -1 padded) and `distance`."""
+        n = len(targets)
+        k = min(self.k, len(self))
+        value = np.full(n, np.nan)
+        neighbors = np.full((n, max(k, 1)), -1, dtype=np.int64)
+        distance = np.full((n, max(k, 1)), np.inf)
+        if n == 0 or k == 0:
+            return {"value": value, "neighbors": neighbors, "distance": distance}
+
+        target = self._scaled(targets)
+        target_location = self._target_locations(targets.locations)
+        all_sold = np.arange(len(self))
+
+        target_types = np.array(targets.types, dtype=object)
+        for property_type in set(targets.types):
+            rows = np.flatnonzero(target_types == property_type)
+            candidates = self.by_type.get(property_type)
+            mixed = candidates is None or len(candidates) < k
+            if mixed:
+                candidates = all_sold
+
+            block = max(1, MATRIX_BUDGET // len(candidates))
+            for start in range(0, len(rows), block):
+                chunk = rows[start:start + block]
+                d2 = self._distances(chunk, candidates, target, target_location)
+                if mixed:
+                    d2 += np.float32(TYPE_MISMATCH) * (self.sold_type[candidates] != property_type)[None, :]
+
+                nearest = np.argpartition(d2, k - 1, axis=1)[:, :k]
+                nearest_d2 = np.take_along_axis(d2, nearest, axis=1)
+                order = np.argsort(nearest_d2, axis=1)
+                nearest = np.take_along_axis(nearest, order, axis=1)
+                nearest_d2 = np.take_along_axis(nearest_d2, order, axis=1)
+                sold_positions = candidates[nearest]
+
+                value[chunk] = self._weighted_prices(sold_positions, nearest_d2, targets.area[chunk])
+                neighbors[chunk, :k] = sold_positions
+                distance[chunk, :k] = np.sqrt(nearest_d2)
+
+        return {"value": value, "neighbors": neighbors, "distance": distance}
+
+    def _scaled(self, features: Features) -> Dict[str, np.ndarray]:
+        """Features in distance units (float32 keeps the matrices small and fast)."""
+        return {
+            "area": (np.log(features.area) / AREA_SCALE).astype(np.float32),
+            "bedrooms": (features.bedrooms / BEDROOM_SCALE).astype(np.float32),
+            "y": (features.lat * KM_PER_DEGREE / GEO_SCALE_KM).astype(np.float32),
+            "x": (features.lng * self.km_per_degree_lng / GEO_SCALE_KM).astype(np.float32),
+        }
+
+    def _distances(self, rows, candidates, target, target_location) -> np.ndarray:
+        """Squared feature distance, targets (rows) x sold comparables (columns)."""
+        def term(name):
+            diff = target[name][rows][:, None] - self.sold_scaled[name][candidates][None, :]
+            return np.where(np.isnan(diff), np.float32(MISSING_FEATURE), diff * diff)
+
+        d2 = term("area")
+        d2 += term("bedrooms")
+        has_coordinates = (~np.isnan(target["y"][rows]))[:, None] & (~np.isnan(self.sold_scaled["y"][candidates]))[None, :]
+        location_cost = np.float32(LOCATION_MISMATCH) * (
+            target_location[rows][:, None] != self.sold_location[candidates][None, :]
+        )
+        d2 += np.where(has_coordinates, term("y") + term("x"), location_cost)
+        return d2
+
+    def _weighted_prices(self, sold_positions, d2, target_area) -> np.ndarray:
+        # Scale each comparable to the target's area when both areas are known
+        adjusted = self.price_per_sqm[sold_positions] * target_area[:, None]
+        adjusted = np.where(np.isnan(adjusted), self.prices[sold_positions], adjusted)
+        weights = 1.0 / (np.sqrt(d2) + 0.1)
+        return (adjusted * weights).sum(axis=1) / weights.sum(axis=1)
+
+    def comparables(self, neighbors: np.ndarray, distance: np.ndarray) -> List[dict]:
+        """Describe one target's neighbors (a row of `estimate()` output)."""
+        result = []
+        for position, dist in zip(neighbors, distance):
+            if position < 0:
+                continue
+            property_type, location = self.sold.labels[position]
+            area = self.sold.area[position]
+            result.append({
+                "contract_id": self.sold.ids[position],
+                "sale_price": float(self.prices[position]),
+                "property_type": property_type,
+                "location": location,
+                "area_sqm": None if np.isnan(area) else round(float(area), 1),
+                "distance": round(float(dist), 3),
+            })
+        return result
+
+
+def commission_for(value, rate: float = DEFAULT_COMMISSION_RATE):
+    return value * rate / 100
+
+
+def fill_from_main(main_conn, rows: List[dict], key: str, query: str):
+    """Set the property features of rows read on a shard from the main database.
+
+    `query` returns a `key` column matching row[key] plus the features; values
+    it has replace the row's, NULLs keep them.
+    """
+    keys = list({row[key] for row in rows if row[key]})
+    found = {}
+    for offset in range(0, len(keys), LOOKUP_CHUNK):
+        statement = text(query).bindparams(bindparam("keys", expanding=True))
+        for feature in main_conn.execute(statement, {"keys": keys[offset:offset + LOOKUP_CHUNK]}):
+            features = dict(feature._mapping)
+            found[features.pop("key")] = {name: value for name, value in features.items() if value is not None}
+    for row in rows:
+        row.update(found.get(row[key], ()))
+
+
+def load_lead_features(conn, segment: Optional[dict] = None, lead_ids: Optional[List[str]] = None,
+                       main_conn=None) -> Features:
+    """Features of the leads in a segment (see SEGMENT_FILTERS) or of specific leads.
+
+    Pass `main_conn` when `conn` is on a shard other than main, so properties
+    are read from the main database.
+    """
+    segment = {key: value for key, value in (segment or {}).items() if value is not None}
+    clauses = [SEGMENT_FILTERS[key] for key in segment]
+    params = dict(segment)
+    if lead_ids is not None:
+        clauses.append("l.id IN :lead_ids")
+        params["lead_ids"] = list(lead_ids)
+    query = text(LEAD_QUERY + (" WHERE " + " AND ".join(clauses) if clauses else ""))
+    # Typed, so source and status are bound as their stored codes
+    query = query.bindparams(*[bindparam(key, type_=Lead.__table__.c[key].type) for key in segment])
+    if lead_ids is not None:
+        query = query.bindparams(bindparam("lead_ids", expanding=True))
+    rows = [dict(row._mapping) for row in conn.execute(query, params)]
+    if main_conn is not None:
+        fill_from_main(main_conn, rows, "id", LEAD_PROPERTY_QUERY)
+    return Features(rows)
+
+
+def recompute_segment(shards, segment: Optional[dict] = None, overwrite: bool = False,
+                      index: Optional[ComparablesIndex] = None) -> dict:
+    """Value every lead in a segment, on every shard, and store the estimates.
+
+    Always writes `estimated_value`; `property_value` is only filled where it is
+    empty unless `overwrite` is set, so values an operator typed are kept.
+    `commission_potential` is computed from the same value as `property_value`.
+    `updated_at` is left alone: a recompute isn't activity on the lead, and
+    archiving goes by it (app/services/archive.py).
+    """
+    started = time.perf_counter()
+    index = index or ComparablesIndex.load(shards)
+    result = {"leads": 0, "valued": 0, "comparables": len(index),
+              "load_seconds": round(time.perf_counter() - started, 3), "estimate_seconds": 0.0, "write_seconds": 0.0}
+    for shard, engine in shards.engines.items():
+        main_engine = shards.engines[MAIN_SHARD] if shard != MAIN_SHARD else None
+        for name, value in _recompute_shard(engine, main_engine, segment, overwrite, index).items():
+            result[name] = round(result[name] + value, 3)
+    return result
+
+
+def _recompute_shard(engine, main_engine, segment: Optional[dict], overwrite: bool,
+                     index: ComparablesIndex) -> dict:
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        if main_engine is None:
+            targets = load_lead_features(conn, segment)
+        else:
+            with main_engine.connect() as main_conn:
+                targets = load_lead_features(conn, segment, main_conn=main_conn)
+    loaded = time.perf_counter()
+
+    values = index.estimate(targets)["value"]
+    estimated = time.perf_counter()
+
+    valued = np.flatnonzero(~np.isnan(values))
+    now = datetime.utcnow()
+    rows = []
+    for position in valued:
+        value = round(float(values[position]), -3)
+        rows.append({
+            "lead_id": targets.ids[position],
+            "new_estimated_value": value,
+        })
+
+    table = Lead.__table__
+    property_value = bindparam("new_estimated_value")
+    if not overwrite:
+        property_value = func.coalesce(func.nullif(table.c.property_value, 0), property_value)
+    statement = table.update().where(table.c.id == bindparam("lead_id")).values(
+        estimated_value=bindparam("new_estimated_value"),
+        commission_potential=func.round(commission_for(property_value), 2),
+        property_value=property_value,
+        updated_at=table.c.updated_at,  # set explicitly, so Lead's onupdate doesn't stamp it
+    )
+    with engine.begin() as conn:
+        for offset in range(0, len(rows), WRITE_CHUNK):
+            conn.execute(statement, rows[offset:offset + WRITE_CHUNK])
+        record_changes(conn, "lead", "update", [row["lead_id"] for row in rows],
+                       ["estimated_value", "commission_potential", "property_value"], now)
+
+    return {
+        "leads": len(targets),
+        "valued": len(rows),
+        "load_seconds": loaded - started,
+        "estimate_seconds": estimated - loaded,
+        "write_seconds": time.perf_counter() - estimated,
+    }
+
+
+_index = None
+
+
+def get_valuation_index(max_age: float = INDEX_TTL) -> ComparablesIndex:
+    """The shared comparables index, reloaded from every shard when stale."""
+    global _index
+    if _index is None or time.monotonic() - _index.loaded_at > max_age:
+        from app.database.shards import get_shard_router
+        _index = ComparablesIndex.load(get_shard_router())
+    return _index
+
+
+def _drop_index():
+    global _index
+    _index = None
+
+
+on_restore(_drop_index)  # comparables of a replaced database
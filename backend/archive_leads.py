@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Move cold leads (not_interested, or untouched for ARCHIVE_AFTER_DAYS) to the archive
+
+    python archive_leads.py                          # run from cron, e.g. nightly
+    python archive_leads.py --older-than-days 90 --dry-run
+    python archive_leads.py --restore lead_1234abcd
+
+Archived leads keep counting in lead stats, are listed with
+GET /api/leads?include_archived=true and come back on their next status update
+(app/services/archive.py). With LEAD_SHARDS set, every shard is archived in turn.
+"""
+
+import argparse
+import sys
+import time
+
+from app.core.config import settings
+from app.database.schema import migrate_all
+from app.database.shards import get_shard_router
+from app.services.archive import ARCHIVE_BATCH, archive_stale_leads, count_stale_leads, restore_leads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                        help="archive leads not updated for this many days (default: ARCHIVE_AFTER_DAYS)")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH, help="leads moved per transaction")
+    parser.add_argument("--limit", type=int, help="archive at most this many leads")
+    parser.add_argument("--dry-run", action="store_true", help="only count the leads that would be archived")
+    parser.add_argument("--restore", nargs="+", metavar="LEAD_ID", help="move these leads back instead")
+    args = parser.parse_args()
+
+    migrate_all()
+    engines = get_shard_router().engines
+    started = time.perf_counter()
+
+    if args.restore:
+        restored = {"leads": 0, "properties": 0}
+        for shard_engine in engines.values():
+            with shard_engine.begin() as conn:
+                for key, moved in restore_leads(conn, args.restore).items():
+                    restored[key] += moved
+        print(f"✅ Restored {restored['leads']:,} leads and {restored['properties']:,} properties")
+        return 0
+
+    if args.dry_run:
+        stale = sum(count_stale_leads(shard_engine, args.older_than_days) for shard_engine in engines.values())
+        print(f"🔎 {stale:,} leads would be archived")
+        return 0
+
+    print(f"🗄️  Archiving not_interested leads and leads untouched for {args.older_than_days} days...")
+    totals = {"leads": 0, "properties": 0, "batches": 0}
+    for shard, shard_engine in engines.items():
+        def report(shard_totals):
+            if shard_totals["batches"] % 25 == 0:
+                print(f"   • {shard}: {shard_totals['leads']:,} leads ({time.perf_counter() - started:.1f}s)")
+
+        limit = None if args.limit is None else args.limit - totals["leads"]
+        if limit is not None and limit <= 0:
+            break
+        shard_totals = archive_stale_leads(shard_engine, args.older_than_days, args.batch_size, limit, progress=report)
+        for key, value in shard_totals.items():
+            totals[key] += value
+    print(f"✅ Archived {totals['leads']:,} leads and {totals['properties']:,} properties "
+          f"in {totals['batches']:,} batches ({time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
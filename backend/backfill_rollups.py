@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Rebuild the funnel and commission rollups from the current leads and contracts
+
+    python backfill_rollups.py
+
+Run it once on a database created before the rollups existed, or to repair
+them. Writes keep the rollups up to date from then on (app/services/rollups.py).
+Past status changes are not stored, so the rebuild counts every lead as "new" on
+its creation day and in its current status on its last update day. With
+LEAD_SHARDS set, every shard is rebuilt from its own rows, one transaction each.
+"""
+
+import argparse
+import sys
+import time
+
+from sqlalchemy import func, select
+
+from app.database.models import ContractCommissionMonthly, LeadFunnelDaily
+from app.database.schema import migrate_all
+from app.database.shards import get_shard_router
+from app.services.rollups import rebuild_rollups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    migrate_all()
+    started = time.perf_counter()
+    for shard, shard_engine in get_shard_router().engines.items():
+        with shard_engine.begin() as conn:
+            rebuild_rollups(conn)
+            days = conn.execute(select(func.count()).select_from(LeadFunnelDaily)).scalar()
+            months = conn.execute(select(func.count()).select_from(ContractCommissionMonthly)).scalar()
+        print(f"📊 {shard}: {days:,} funnel rows, {months:,} commission months")
+    print(f"✅ Rollups rebuilt in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
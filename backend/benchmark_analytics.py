@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark the columnar analytics engine against the SQLAlchemy aggregate path
+
+    python benchmark_analytics.py --scale 1m
+    python benchmark_analytics.py --scale 100k --rounds 50
+
+Runs on a throwaway copy of the seeded database for the scale (the same one
+benchmark_endpoints.py builds under data/bench/). For every aggregate - the
+lead and contract stats endpoints, a commission breakdown, a lead breakdown and
+the days-on-market distribution - it reports the median and p95 latency of the
+SQL path and of the engine (app/services/analytics.py), plus the engine's load
+time and memory. It then measures lead status updates while a reader runs the
+aggregates in a loop, once per path, to show how much the scans hold up writes.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark_endpoints import seeded_database
+from app.services.seed import parse_scale
+
+
+def timed(fn, rounds):
+    """Median and p95 milliseconds of `rounds` calls."""
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def sql_aggregates(db, Contract, Lead, func):
+    """The aggregates the engine replaces, written the way the SQL endpoints are."""
+    return {
+        "commission_breakdown": lambda: db.query(
+            Contract.location, func.count(Contract.id), func.sum(Contract.sale_price),
+            func.sum(Contract.commission_earned), func.avg(Contract.days_on_market)
+        ).filter(Contract.status == "sold").group_by(Contract.location).all(),
+        "lead_breakdown": lambda: db.query(
+            Lead.source, Lead.status, func.count(Lead.id)
+        ).group_by(Lead.source, Lead.status).all(),
+        "days_on_market": lambda: db.query(
+            (Contract.days_on_market / 30) * 30, func.count(Contract.id)
+        ).filter(Contract.status == "sold", Contract.days_on_market.isnot(None))
+        .group_by((Contract.days_on_market / 30) * 30).all(),
+    }
+
+
+def write_latencies(client, lead_ids, reader, seconds):
+    """Status update latencies (ms) while `reader` runs in a loop on another thread."""
+    stop = threading.Event()
+
+    def read_loop():
+        while not stop.is_set():
+            reader()
+
+    thread = threading.Thread(target=read_loop, daemon=True)
+    thread.start()
+    samples, index, deadline = [], 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        client.put(f"/api/leads/{lead_ids[index % len(lead_ids)]}/status", json={"status": "contacted"})
+        samples.append((time.perf_counter() - started) * 1000)
+        index += 1
+    stop.set()
+    thread.join()
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)], samples[-1], len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="1m", help="10k, 100k, 1m or a lead count (default: 1m)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rounds", type=int, default=20, help="calls per aggregate and path")
+    parser.add_argument("--write-seconds", type=float, default=5.0, help="duration of each write measurement")
+    args = parser.parse_args()
+    scale_name, leads = parse_scale(args.scale)
+
+    source = seeded_database(scale_name, leads, args.seed)
+    workdir = tempfile.mkdtemp(prefix="bench-analytics-")
+    database = os.path.join(workdir, "leadgen.db")
+    shutil.copyfile(source, database)
+    # Settings are read on import: point the app at the copy first
+    os.environ.update({"DATABASE_PATH": database, "LEAD_SHARDS": "", "ANALYTICS_REFRESH_SECONDS": "1"})
+    try:
+        from sqlalchemy import func
+        from app.core.config import settings
+        from app.database.models import Contract, Lead
+        from app.main import app, get_db
+        from app.services import analytics
+
+        client = app.test_client()
+        engine = analytics.get_analytics_engine()
+        started = time.perf_counter()
+        tables = engine.tables()
+        load_seconds = time.perf_counter() - started
+        memory = sum(table.nbytes for table in tables.values())
+        print(f"🧮 {leads:,} leads: engine loaded in {load_seconds:.1f}s, "
+              f"{memory / 1_048_576:.0f} MB for {', '.join(f'{t.num_rows:,} {n}' for n, t in tables.items())}")
+
+        db = get_db()
+        sql = {
+            "lead_stats": lambda: client.get("/api/leads/stats"),
+            "contract_stats": lambda: client.get("/api/contracts/stats"),
+            **sql_aggregates(db, Contract, Lead, func),
+        }
+        columnar = {
+            "lead_stats": lambda: client.get("/api/leads/stats"),
+            "contract_stats": lambda: client.get("/api/contracts/stats"),
+            "commission_breakdown": lambda: analytics.commission_breakdown(engine.tables()["contracts"], "location"),
+            "lead_breakdown": lambda: analytics.lead_breakdown(engine.tables()["leads"], "source"),
+            "days_on_market": lambda: analytics.days_on_market(engine.tables()["contracts"]),
+        }
+
+        print(f"\n{'aggregate':<22} {'sql p50':>9} {'sql p95':>9} {'arrow p50':>10} {'arrow p95':>10} {'speedup':>8}")
+        for name in sql:
+            settings.ANALYTICS_ENGINE = "sql"
+            sql_p50, sql_p95 = timed(sql[name], args.rounds)
+            settings.ANALYTICS_ENGINE = "columnar"
+            arrow_p50, arrow_p95 = timed(columnar[name], args.rounds)
+            print(f"{name:<22} {sql_p50:8.1f}ms {sql_p95:8.1f}ms {arrow_p50:9.1f}ms {arrow_p95:9.1f}ms "
+                  f"{sql_p50 / arrow_p50:7.1f}x")
+
+        lead_ids = [lead_id for (lead_id,) in db.query(Lead.id).limit(2000)]
+        db.close()
+        print(f"\n{'status updates while':<22} {'p50':>9} {'p95':>9} {'max':>9} {'writes':>8}")
+        for path, reader in (("sql", sql["lead_stats"]), ("columnar", columnar["lead_stats"])):
+            settings.ANALYTICS_ENGINE = path
+            p50, p95, worst, count = write_latencies(client, lead_ids, reader, args.write_seconds)
+            print(f"{path + ' stats loop':<22} {p50:8.1f}ms {p95:8.1f}ms {worst:8.1f}ms {count:8,}")
+        engine.stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Benchmark the API endpoints used by the frontend (src/services/api.js)
+
+    python benchmark_endpoints.py --scale 10k                   # compare against benchmarks/baselines/10k.json
+    python benchmark_endpoints.py --scale 100k --save-baseline  # record a new baseline
+    python benchmark_endpoints.py --scale 1m --only leads_list,call_queue
+
+Each run starts the Flask app in a subprocess on a fresh copy of a seeded
+database, so writes never leak between runs and the working database is never
+touched. Exits with status 1 when an endpoint's p50 or p95 latency regresses
+by more than --tolerance against the stored baseline.
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from app.services.seed import parse_scale, seed_database
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+RESULTS_DIR = os.path.join(BACKEND_DIR, "data", "bench", "results")
+SEEDED_DIR = os.path.join(BACKEND_DIR, "data", "bench")
+
+GATED_METRICS = ("p50_ms", "p95_ms")
+
+# name -> (method, path, body); {lead_id} / {contract_id} / {sequence_id} rotate
+# through existing rows, {n} is a per-request counter
+SCENARIOS = {
+    "health": ("GET", "/health", None),
+    "dashboard_stats": ("GET", "/api/dashboard/stats", None),
+    "lead_stats": ("GET", "/api/leads/stats", None),
+    "leads_list": ("GET", "/api/leads?limit=50", None),
+    "leads_list_by_status": ("GET", "/api/leads?status=interested&limit=50", None),
+    "leads_page_500": ("GET", "/api/leads?limit=500", None),
+    "leads_page_500_fields": ("GET", "/api/leads?limit=500&fields=id,owner_name,phone,lead_score,status,location", None),
+    "call_queue": ("GET", "/api/leads/call-queue", None),
+    "create_lead": ("POST", "/api/leads", {
+        "owner_name": "ผู้ทดสอบ {n}", "owner_name_en": "Bench Owner {n}", "phone": "+66 81 000 {n}",
+        "property_type": "Condo", "location": "Hua Hin", "property_value": 4200000, "source": "manual",
+    }),
+    "update_lead_status": ("PUT", "/api/leads/{lead_id}/status", {"status": "contacted", "notes": "Called {n}"}),
+    "automation_sequences": ("GET", "/api/automation/sequences", None),
+    "automation_stats": ("GET", "/api/automation/stats", None),
+    "automation_performance": ("GET", "/api/automation/performance", None),
+    "create_sequence": ("POST", "/api/automation/sequences", {
+        "name": "Bench sequence {n}", "type": "email", "template": "Hello", "daily_limit": 50,
+    }),
+    "update_sequence_status": ("PUT", "/api/automation/sequences/{sequence_id}/status", {"status": "active"}),
+    "contracts_list": ("GET", "/api/contracts?limit=50", None),
+    "contracts_page_500": ("GET", "/api/contracts?limit=500", None),
+    "contracts_page_500_fields": ("GET", "/api/contracts?limit=500&fields=id,owner_name,status,listing_price,commission_amount,property_image", None),
+    "contract_stats": ("GET", "/api/contracts/stats", None),
+    "create_contract": ("POST", "/api/contracts", {
+        "owner_name": "ผู้ทดสอบ {n}", "property_type": "Villa", "location": "Hua Hin",
+        "property_value": 8500000, "listing_price": 8500000,
+    }),
+    "update_contract_status": ("PUT", "/api/contracts/{contract_id}/status", {"status": "under_offer"}),
+    "mark_commission_paid": ("PUT", "/api/contracts/{contract_id}/commission/paid", None),
+    "update_contract_metrics": ("PUT", "/api/contracts/{contract_id}/metrics", {"views": 10}),
+    "scraping_jobs": ("GET", "/api/scraping/jobs", None),
+}
+
+
+def seeded_database(scale_name, leads, seed, reseed=False):
+    """Path of the seeded database for this scale / seed, built on first use."""
+    from sqlalchemy import create_engine
+    from app.database.schema import init_db
+
+    path = os.path.join(SEEDED_DIR, f"leads_{scale_name}_seed{seed}.db")
+    if os.path.exists(path) and not reseed:
+        engine = create_engine(f"sqlite:///{path}")
+        init_db(engine)  # seeded under an older schema version
+        engine.dispose()
+        return path
+    os.makedirs(SEEDED_DIR, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    print(f"🌱 Seeding {leads:,} leads (seed {seed}) into {path}...")
+    started = time.perf_counter()
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    seed_database(engine, leads, seed)
+    engine.dispose()
+    print(f"   done in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def sample_ids(path, seed, count=500):
+    rng = random.Random(seed)
+    ids = {}
+    with sqlite3.connect(path) as conn:
+        for key, table in (("lead_id", "leads"), ("contract_id", "contracts"), ("sequence_id", "automation_sequences")):
+            rows = [row[0] for row in conn.execute(f"SELECT id FROM {table} ORDER BY id LIMIT 20000")]
+            ids[key] = rng.sample(rows, min(count, len(rows))) if rows else ["missing"]
+    return ids
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """The Flask app in a subprocess, on a private copy of the database."""
+
+    def __init__(self, database):
+        self.workdir = tempfile.mkdtemp(prefix="leadgen-bench-")
+        self.database = os.path.join(self.workdir, "bench.db")
+        shutil.copyfile(database, self.database)
+        self.port = free_port()
+        self.process = None
+
+    def __enter__(self):
+        env = dict(os.environ, DATABASE_PATH=self.database, PYTHONPATH=BACKEND_DIR)
+        code = f"from app.main import app; app.run(host='127.0.0.1', port={self.port}, threaded=True)"
+        self.log = open(os.path.join(self.workdir, "server.log"), "w")
+        self.process = subprocess.Popen([sys.executable, "-c", code], cwd=self.workdir, env=env,
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited, see {self.log.name}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                conn.request("GET", "/health")
+                if conn.getresponse().status == 200:
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("Server did not become healthy within 60s")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+        self.log.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def fill(template, ids, n):
+    if template is None:
+        return None
+    if isinstance(template, dict):
+        return {key: fill(value, ids, n) for key, value in template.items()}
+    if isinstance(template, str):
+        values = {key: choices[n % len(choices)] for key, choices in ids.items()}
+        return template.format(n=n, **values)
+    return template
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(port, scenario, ids, requests, concurrency, warmup):
+    method, path, body = scenario
+    counter = iter(range(requests + warmup))
+    lock = threading.Lock()
+    latencies, errors, statuses, sizes = [], [], set(), []
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                break
+            payload = fill(body, ids, n)
+            data = json.dumps(payload).encode() if payload is not None else None
+            headers = {"Content-Type": "application/json"} if data is not None else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, fill(path, ids, n), body=data, headers=headers)
+                response = conn.getresponse()
+                size = len(response.read())
+                status = response.status
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                status, size = type(exc).__name__, 0
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses.add(status)
+                if n < warmup:
+                    continue
+                latencies.append(elapsed)
+                sizes.append(size)
+                if not isinstance(status, int) or status >= 400:
+                    errors.append(status)
+        conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "method": method,
+        "path": path,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "statuses": sorted(str(status) for status in statuses),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "throughput_rps": round((requests + warmup) / wall, 1),
+        "response_bytes": sorted(sizes)[len(sizes) // 2],
+    }
+
+
+def median_round(rounds):
+    """Combine repeated measurements: the median of each statistic, total errors."""
+    combined = dict(rounds[0])
+    for key in ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "throughput_rps"):
+        combined[key] = sorted(stats[key] for stats in rounds)[len(rounds) // 2]
+    combined["requests"] = sum(stats["requests"] for stats in rounds)
+    combined["errors"] = sum(stats["errors"] for stats in rounds)
+    combined["statuses"] = sorted({status for stats in rounds for status in stats["statuses"]})
+    return combined
+
+
+def is_served(port, scenario, ids):
+    """False when the app has no such route (404/405 without a JSON body)."""
+    method, path, body = scenario
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    payload = fill(body, ids, 0)
+    conn.request(method, fill(path, ids, 0), body=json.dumps(payload).encode() if payload else None,
+                 headers={"Content-Type": "application/json"} if payload else {})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return not (response.status in (404, 405) and "json" not in (response.getheader("Content-Type") or ""))
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Regressions as (endpoint, metric, baseline, current)."""
+    regressions = []
+    for name, current in results["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        for metric in GATED_METRICS:
+            if (current[metric] > before[metric] * (1 + tolerance)
+                    and current[metric] - before[metric] > min_delta_ms):
+                regressions.append((name, metric, before[metric], current[metric]))
+    return regressions
+
+
+def print_table(results, baseline):
+    print(f"   {'endpoint':<26} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'KB':>7} {'err':>5}  {'p95 vs baseline':>16}")
+    for name, stats in results["endpoints"].items():
+        before = (baseline or {}).get("endpoints", {}).get(name)
+        change = f"{(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%" if before and before["p95_ms"] else "-"
+        print(
+            f"   {name:<26} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+            f"{stats['throughput_rps']:>8.1f} {stats.get('response_bytes', 0) / 1024:>7.1f} {stats['errors']:>5}  {change:>16}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1m or a number of leads")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--only", help="comma-separated endpoint names")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50/p95 slowdown (0.25 = 25%%)")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="measure each endpoint this many times and keep the median of each statistic")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="ignore slowdowns smaller than this, however large relatively")
+    parser.add_argument("--baseline", help="baseline file (default: benchmarks/baselines/<scale>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--reseed", action="store_true", help="rebuild the seeded database")
+    args = parser.parse_args()
+
+    scale_name, leads = parse_scale(args.scale)
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    database = seeded_database(scale_name, leads, args.seed, args.reseed)
+    ids = sample_ids(database, args.seed)
+    results = {
+        "scale": scale_name,
+        "leads": leads,
+        "seed": args.seed,
+        "requests": args.requests,
+        "rounds": args.rounds,
+        "concurrency": args.concurrency,
+        "created_at": datetime.utcnow().isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "endpoints": {},
+        "not_served": [],
+    }
+
+    print(f"🏁 Benchmarking {len(names)} endpoints at {scale_name} "
+          f"({args.rounds} x {args.requests} requests, concurrency {args.concurrency})")
+    with Server(database) as server:
+        for name in names:
+            if not is_served(server.port, SCENARIOS[name], ids):
+                results["not_served"].append(name)
+                continue
+            rounds = [
+                run_scenario(server.port, SCENARIOS[name], ids, args.requests, args.concurrency, args.warmup)
+                for _ in range(args.rounds)
+            ]
+            results["endpoints"][name] = median_round(rounds)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{scale_name}.json")
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    print_table(results, baseline)
+    if results["not_served"]:
+        print(f"   ⏭️  Not served by the app: {', '.join(results['not_served'])}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{scale_name}-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    with open(result_path, "w") as result_file:
+        json.dump(results, result_file, indent=2)
+    print(f"📄 Results written to {result_path}")
+
+    failed = [name for name, stats in results["endpoints"].items() if stats["errors"]]
+    if failed:
+        print(f"❌ Requests failed on: {', '.join(failed)}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"💾 Baseline saved to {baseline_path}")
+        return 1 if failed else 0
+
+    if baseline is None:
+        print(f"⚠️  No baseline at {baseline_path}; run with --save-baseline to create one")
+        return 1 if failed else 0
+
+    if baseline.get("machine") != results["machine"]:
+        print(f"⚠️  Baseline was recorded on a different machine ({baseline.get('machine')}); "
+              "latencies may not be comparable")
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    for name, metric, before, current in regressions:
+        print(f"❌ {name}: {metric} {before:.1f} ms -> {current:.1f} ms (tolerance {args.tolerance:.0%})")
+    if regressions or failed:
+        return 1
+    print(f"✅ No endpoint regressed by more than {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
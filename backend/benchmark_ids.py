@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark lead inserts and index size with random vs time-ordered ids
+
+    python benchmark_ids.py                     # 500k leads, 500 per transaction
+    python benchmark_ids.py --rows 1000000 --batch 1000
+
+Inserts the same generated leads (app/services/seed.py), plus a property for
+every 20th lead, into a fresh database once per id scheme:
+
+- random: the old model default, `lead_` + 8 random hex digits
+- ulid:   the prefixed ULIDs of app/database/ids.py
+
+one batch per transaction, as the ingest pipeline writes. It reports insert
+throughput overall and over the last tenth (when the indexes are largest),
+ids that collided (and were skipped), and from dbstat the size and page fill
+of the primary-key index and of the foreign-key index referring to it.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from app.database.ids import new_id
+from app.database.models import Lead, Property
+from app.services.seed import generate_leads
+
+PROPERTY_EVERY = 20
+INDEXES = ("sqlite_autoindex_leads_1", "ix_properties_lead_id")
+
+SCHEMES = {
+    "random": lambda prefix: f"{prefix}_{uuid.uuid4().hex[:8]}",
+    "ulid": new_id,
+}
+
+
+def insert_leads(path, columns, make_id, batch):
+    """Insert every generated lead with ids from `make_id`; returns timings and collisions."""
+    engine = create_engine(f"sqlite:///{path}")
+    Lead.__table__.create(engine)
+    Property.__table__.create(engine)
+    names = [column.name for column in Lead.__table__.columns]
+    lead_sql = str(Lead.__table__.insert().compile(dialect=engine.dialect))
+    total = len(columns["owner_name"])
+    seen, collisions, batch_seconds = set(), 0, []
+    for start in range(0, total, batch):
+        ids = []
+        for _ in range(min(batch, total - start)):
+            row_id = make_id("lead")
+            while row_id in seen:
+                collisions += 1
+                row_id = make_id("lead")
+            seen.add(row_id)
+            ids.append(row_id)
+        values = {**{name: columns[name][start:start + len(ids)] for name in names if name != "id"}, "id": ids}
+        rows = list(zip(*(values[name] for name in names)))
+        properties = [(make_id("prop"), lead_id) for lead_id in ids[::PROPERTY_EVERY]]
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.exec_driver_sql(lead_sql, rows)
+            conn.exec_driver_sql("INSERT INTO properties (id, lead_id) VALUES (?, ?)", properties)
+        batch_seconds.append(time.perf_counter() - started)
+    engine.dispose()
+    tail = batch_seconds[-max(1, len(batch_seconds) // 10):]
+    return {
+        "rows_per_s": total / sum(batch_seconds),
+        "tail_rows_per_s": min(batch, total) * len(tail) / sum(tail),
+        "collisions": collisions,
+    }
+
+
+def index_stats(path):
+    """{index: (bytes, page fill)} from dbstat, plus the file size."""
+    conn = sqlite3.connect(path)
+    stats = {
+        name: (size, 1 - unused / size if size else 0)
+        for name, size, unused in conn.execute(
+            f"SELECT name, SUM(pgsize), SUM(unused) FROM dbstat WHERE name IN ({', '.join('?' * len(INDEXES))}) "
+            "GROUP BY name", INDEXES)
+    }
+    conn.close()
+    return stats, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000, help="leads to insert per scheme")
+    parser.add_argument("--batch", type=int, default=500, help="leads per transaction")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"🧪 Generating {args.rows:,} leads...")
+    columns = generate_leads(np.random.default_rng(args.seed), args.rows)
+    workdir = tempfile.mkdtemp(prefix="bench-ids-")
+    try:
+        print(f"\n{'scheme':<8} {'rows/s':>9} {'last 10%':>9} {'collided':>9} "
+              f"{'pk index':>10} {'fill':>5} {'fk index':>10} {'fill':>5} {'file':>9}")
+        for scheme, make_id in SCHEMES.items():
+            path = os.path.join(workdir, f"{scheme}.db")
+            result = insert_leads(path, columns, make_id, args.batch)
+            stats, file_size = index_stats(path)
+            (pk_size, pk_fill), (fk_size, fk_fill) = (stats.get(name, (0, 0)) for name in INDEXES)
+            print(f"{scheme:<8} {result['rows_per_s']:9,.0f} {result['tail_rows_per_s']:9,.0f} "
+                  f"{result['collisions']:9,} {pk_size / 1_048_576:8.1f}MB {pk_fill:5.0%} "
+                  f"{fk_size / 1_048_576:8.1f}MB {fk_fill:5.0%} {file_size / 1_048_576:7.0f}MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
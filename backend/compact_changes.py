@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Apply retention and compaction to the change log
+
+    python compact_changes.py                        # run from cron, e.g. nightly
+    python compact_changes.py --retention-days 3 --compact-after-hours 6
+
+Records older than --retention-days are deleted; a consumer whose cursor is
+behind them gets 410 from GET /api/changes and has to resync. Among records
+older than --compact-after-hours only the newest one per row is kept
+(app/services/changes.py). With LEAD_SHARDS set, every shard's log is processed.
+"""
+
+import argparse
+import sys
+import time
+
+from app.core.config import settings
+from app.database.schema import migrate_all
+from app.database.shards import get_shard_router
+from app.services.changes import compact_changes, trim_changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, default=settings.CHANGE_RETENTION_DAYS,
+                        help="delete records older than this (default: CHANGE_RETENTION_DAYS)")
+    parser.add_argument("--compact-after-hours", type=int, default=settings.CHANGE_COMPACT_AFTER_HOURS,
+                        help="keep one record per row among older records (default: CHANGE_COMPACT_AFTER_HOURS)")
+    args = parser.parse_args()
+
+    migrate_all()
+    started = time.perf_counter()
+    for shard, shard_engine in get_shard_router().engines.items():
+        trimmed = trim_changes(shard_engine, args.retention_days)
+        compacted = compact_changes(shard_engine, args.compact_after_hours)
+        print(f"🧹 {shard}: {trimmed:,} records past retention, {compacted:,} superseded records removed")
+    print(f"✅ Change log compacted in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Export leads, contracts and automation sequences to columnar files
+
+    python export_tables.py                        # full export, Arrow IPC
+    python export_tables.py --incremental          # rows changed since the last export
+    python export_tables.py --since 2026-10-01 --format parquet
+    python export_tables.py --list
+
+Each export is a directory in EXPORT_DIR (default data/exports) with one file
+per table and a manifest.json of row counts and change_log cursors
+(app/services/exports.py). Arrow files load zero-copy:
+
+    import pyarrow as pa
+    leads = pa.ipc.open_file(pa.memory_map("data/exports/<name>/leads.arrow")).read_all()
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from app.core.config import settings
+from app.database.schema import migrate_all
+from app.database.shards import get_shard_router
+from app.services.exports import EXPORT_FORMATS, ExportStore
+
+
+def describe(manifest):
+    rows = ", ".join(f"{count:,} {table}" for table, count in manifest["rows"].items())
+    since = "incremental" if any(manifest["since"].values()) else "full"
+    return (f"{manifest['name']:<26} {manifest['created_at'][:19]}  {manifest['format']:<7} {since:<11} "
+            f"{manifest['size'] / 1_048_576:8.1f} MB  {rows}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--name", help="export name (default: export-<timestamp>)")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="arrow")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only rows updated after this UTC time")
+    parser.add_argument("--incremental", action="store_true", help="only rows changed since the last export")
+    parser.add_argument("--directory", default=settings.EXPORT_DIR, help="export directory (default: EXPORT_DIR)")
+    parser.add_argument("--list", action="store_true", help="list exports and exit")
+    args = parser.parse_args()
+
+    migrate_all()
+    store = ExportStore(get_shard_router(), args.directory)
+    if args.list:
+        exports = store.list()
+        if not exports:
+            print(f"📭 No exports in {args.directory}")
+        for manifest in exports:
+            print(describe(manifest))
+        return 0
+
+    started = time.perf_counter()
+    try:
+        manifest = store.create(args.name, args.format, args.since, args.incremental)
+    except (FileExistsError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"📦 Exported {describe(manifest)} ({time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Ingest property images and render their card / thumbnail / detail variants
+
+    python ingest_images.py                                  # remote images of properties and contracts
+    python ingest_images.py photos/*.jpg --property-id prop_1234abcd
+"""
+
+import argparse
+import sys
+import time
+
+from app.database.connection import engine
+from app.database.schema import init_db
+from app.services.fetcher import iter_fetched
+from app.services.images import ImageIngester, pending_image_sources
+
+
+def remote_items(sources):
+    """Download pending images; unchanged ones (304 from the fetch cache) are skipped."""
+    for result in iter_fetched(list(sources)):
+        yield {"data": result.body, "source_url": result.url, **sources[result.url]}
+
+
+def local_items(paths, property_id=None, contract_id=None):
+    for path in paths:
+        with open(path, "rb") as image_file:
+            yield {
+                "data": image_file.read(),
+                "source_url": None,
+                "property_ids": [property_id] if property_id else [],
+                "contract_ids": [contract_id] if contract_id else [],
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="local image files (default: fetch pending remote images)")
+    parser.add_argument("--property-id", help="attach local images to this property")
+    parser.add_argument("--contract-id", help="attach local images to this contract")
+    parser.add_argument("--workers", type=int, default=None, help="resize processes (default: CPU count)")
+    args = parser.parse_args()
+
+    init_db(engine)
+    ingester = ImageIngester(engine, workers=args.workers)
+    started = time.perf_counter()
+
+    if args.paths:
+        print(f"🖼️  Processing {len(args.paths):,} local images...")
+        items = local_items(args.paths, args.property_id, args.contract_id)
+    else:
+        with engine.connect() as conn:
+            sources = pending_image_sources(conn)
+        if not sources:
+            print("✅ Every property and contract image is already ingested")
+            return 0
+        print(f"🖼️  Fetching {len(sources):,} images...")
+        items = remote_items(sources)
+
+    stats = ingester.ingest(items)
+    print(
+        f"✅ {stats['images']:,} images: {stats['stored']:,} rendered, {stats['skipped']:,} already stored, "
+        f"{stats['invalid']:,} unreadable ({time.perf_counter() - started:.1f}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
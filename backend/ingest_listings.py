@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Stream a dump of scraped listings into the leads table
+
+    python ingest_listings.py listings.jsonl
+    python ingest_listings.py --generate-fixture 100000 listings.jsonl
+    python ingest_listings.py --crawl urls.txt --source thai_sites
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+from datetime import datetime
+
+from app.database.connection import SessionLocal, engine
+from app.database.models import ScrapingJob
+from app.database.schema import migrate_all
+from app.database.shards import get_shard_router
+from app.services.fetcher import iter_listing_pages
+from app.services.ingest import IngestFailed, IngestPipeline, read_listing_dump
+
+FIXTURE_OWNERS = [
+    ("สมชาย วงศ์ประโคน", "Somchai Wongprakorn"),
+    ("สุนีย์ ธนาวงศ์", "Sunee Thanawong"),
+    ("วิรัตน์ สุขเจริญ", "Wirat Sukcharoen"),
+    ("นริศรา บุญมา", "Narisara Boonma"),
+    ("ธีรยุทธ์ สมบูรณ์", "Teerayut Somboon"),
+    ("วาสนา เจริญสุข", "Wasana Charoenuck"),
+]
+FIXTURE_LOCATIONS = ["Hua Hin", "Prachuap Khiri Khan", "Koh Samui", "Cha-am", "Pranburi"]
+FIXTURE_TYPES = ["Villa", "Condo", "House", "Townhouse", "Land"]
+FIXTURE_SOURCES = ["facebook", "google_maps", "thai_sites"]
+
+
+def fixture_price(rng):
+    value = rng.randint(15, 300) * 100_000
+    style = rng.randrange(4)
+    if style == 0:
+        return f"฿{value:,}"
+    if style == 1:
+        return f"{value / 1_000_000:g} ล้านบาท"
+    if style == 2:
+        return f"THB {value / 1_000_000:g}M"
+    return f"{value:,} บาท"
+
+
+def fixture_phone(rng):
+    number = f"{rng.choice('689')}{rng.randint(10_000_000, 99_999_999)}"
+    if rng.random() < 0.5:
+        return f"+66 {number[:2]} {number[2:5]} {number[5:]}"
+    return f"0{number[:2]}-{number[2:5]}-{number[5:]}"
+
+
+def generate_fixture(path, count, seed=42):
+    """Write `count` synthetic scraped pages, ~5% duplicates and ~1% junk."""
+    rng = random.Random(seed)
+    previous = []
+    with open(path, "w", encoding="utf-8") as dump:
+        for i in range(count):
+            if previous and rng.random() < 0.05:
+                html = rng.choice(previous)
+            elif rng.random() < 0.01:
+                html = "<html><body><p>ไม่พบประกาศ</p></body></html>"
+            else:
+                owner, owner_en = rng.choice(FIXTURE_OWNERS)
+                urgent = "ขายด่วน! " if rng.random() < 0.1 else ""
+                html = (
+                    "<html><body><div class=\"listing\">"
+                    f"<h1 class=\"title\">{urgent}{rng.choice(FIXTURE_TYPES)} for sale</h1>"
+                    f"<span class=\"owner\">{owner}</span>"
+                    f"<span class=\"owner-en\">{owner_en}</span>"
+                    f"<span class=\"phone\">{fixture_phone(rng)}</span>"
+                    f"<span class=\"price\">{fixture_price(rng)}</span>"
+                    f"<span class=\"type\">{rng.choice(FIXTURE_TYPES)}</span>"
+                    f"<span class=\"location\">{rng.choice(FIXTURE_LOCATIONS)}</span>"
+                    "<p class=\"description\">บ้านสวย ใกล้ทะเล พร้อมโอน</p>"
+                    "</div></body></html>"
+                )
+                previous = (previous + [html])[-100:]
+            record = {"url": f"https://example.co.th/listing/{i}", "source": rng.choice(FIXTURE_SOURCES), "html": html}
+            dump.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def create_job(source, target):
+    """A `scraping_jobs` row for this run; the pipeline reports its progress to it."""
+    db = SessionLocal()
+    try:
+        job = ScrapingJob(source=source, target_location=target, status="running", start_time=datetime.utcnow())
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def close_job(job_id):
+    db = SessionLocal()
+    try:
+        db.query(ScrapingJob).filter(ScrapingJob.id == job_id).update(
+            {ScrapingJob.end_time: datetime.utcnow()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def print_stages(snapshot):
+    print(f"   {'stage':<10} {'in':>9} {'out':>9} {'err':>6} {'queue':>7} {'rate/s':>10}")
+    for stage in snapshot["stages"]:
+        queue_depth = f"{stage['queue_depth']}/{stage['queue_capacity']}"
+        print(
+            f"   {stage['stage']:<10} {stage['items_in']:>9} {stage['items_out']:>9} "
+            f"{stage['errors']:>6} {queue_depth:>7} {stage['throughput_per_sec']:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dump", help="JSON-lines dump of scraped pages (or a list of URLs with --crawl)")
+    parser.add_argument("--crawl", action="store_true", help="fetch the URLs listed in DUMP; unchanged pages are skipped")
+    parser.add_argument("--source", default="thai_sites", help="lead source for crawled pages")
+    parser.add_argument("--generate-fixture", type=int, metavar="N", help="write N synthetic listings to DUMP first")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None, help="HTML parser processes (default: CPU count)")
+    parser.add_argument("--progress", type=float, default=2.0, help="seconds between progress reports")
+    args = parser.parse_args()
+
+    if args.generate_fixture:
+        print(f"🧪 Writing {args.generate_fixture:,} fixture listings to {args.dump}...")
+        generate_fixture(args.dump, args.generate_fixture)
+
+    migrate_all()
+    job_id = create_job(args.source if args.crawl else "dump", args.dump)
+    pipeline = IngestPipeline(engine, batch_size=args.batch_size, parse_workers=args.workers,
+                              job_id=job_id, router=get_shard_router())
+
+    done = threading.Event()
+
+    def report():
+        while not done.wait(args.progress):
+            snapshot = pipeline.snapshot()
+            print(f"⏱️  {snapshot['elapsed_seconds']}s - {snapshot['leads_inserted']:,} leads inserted")
+            print_stages(snapshot)
+
+    print(f"🚚 Ingesting {args.dump} as job {job_id}...")
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    if args.crawl:
+        with open(args.dump) as url_list:
+            urls = [line.strip() for line in url_list if line.strip()]
+        records = iter_listing_pages(urls, args.source)
+    else:
+        records = read_listing_dump(args.dump)
+    try:
+        snapshot = pipeline.run(records)
+    except IngestFailed as e:
+        print_stages(e.snapshot)
+        print(f"❌ Ingest failed: {e}")
+        return 1
+    finally:
+        done.set()
+        close_job(job_id)
+
+    print_stages(snapshot)
+    print(
+        f"✅ {snapshot['records_read']:,} pages -> {snapshot['leads_inserted']:,} new leads "
+        f"in {snapshot['elapsed_seconds']}s ({snapshot['leads_per_sec']:,} leads/s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Bring the main database and every shard up to the current schema version
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # show each database's version and what is pending
+
+Run it once per deploy, before starting the new workers: workers only check
+the schema version on startup and refuse to start on a database that is
+behind (app/database/schema.py). Databases from before versioned migrations
+are at version 0 and are brought up to date whatever state they are in.
+Migrations that rebuild large tables hold the write lock for their duration
+(about 4 s for 1M leads), so run it while the API is stopped or quiet.
+"""
+
+import argparse
+import sys
+import time
+
+from sqlalchemy import create_engine
+
+from app.core.config import settings
+from app.database.schema import MIGRATIONS, SCHEMA_VERSION, migrate_all, schema_version
+from app.database.shards import MAIN_SHARD, shard_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="only show versions and pending migrations")
+    args = parser.parse_args()
+
+    if args.status:
+        for name, path in {MAIN_SHARD: settings.DATABASE_PATH, **shard_paths()}.items():
+            engine = create_engine(f"sqlite:///{path}")
+            with engine.connect() as conn:
+                version = schema_version(conn)
+            engine.dispose()
+            pending = [f"{number}: {description}" for number, description, _ in MIGRATIONS if number > version]
+            print(f"{'✅' if not pending else '⏳'} {name} ({path}): version {version} of {SCHEMA_VERSION}")
+            for line in pending:
+                print(f"   • {line}")
+        return 0
+
+    started = time.perf_counter()
+    applied = migrate_all()
+    for name, versions in applied.items():
+        if versions:
+            print(f"🗃️ {name}: applied {', '.join(map(str, versions))}")
+        else:
+            print(f"✅ {name}: already at version {SCHEMA_VERSION}")
+    print(f"✅ Schema version {SCHEMA_VERSION} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
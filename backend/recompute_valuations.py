@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Recompute comparable-sales estimates and commission potential for leads
+
+    python recompute_valuations.py
+    python recompute_valuations.py --location "Hua Hin" --status new
+    python recompute_valuations.py --overwrite
+
+With LEAD_SHARDS set, comparables come from every shard and every shard's
+leads are valued.
+"""
+
+import argparse
+import sys
+
+from app.database.schema import migrate_all
+from app.database.shards import get_shard_router
+from app.services.valuation import SEGMENT_FILTERS, recompute_segment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for name in SEGMENT_FILTERS:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, help=f"only leads with this {name}")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="replace property_value too (by default only empty values are filled)")
+    args = parser.parse_args()
+
+    migrate_all()
+    segment = {name: getattr(args, name) for name in SEGMENT_FILTERS}
+    print("💰 Valuing leads from comparable sales...")
+    result = recompute_segment(get_shard_router(), segment, overwrite=args.overwrite)
+
+    if not result["comparables"]:
+        print("⚠️  No sold contracts with a sale price - nothing to compare against")
+        return 1
+    print(
+        f"✅ {result['valued']:,} of {result['leads']:,} leads valued from {result['comparables']:,} sold contracts "
+        f"(load {result['load_seconds']}s, estimate {result['estimate_seconds']}s, write {result['write_seconds']}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Give leads, contracts and sequences with pre-ULID ids a time-ordered one
+
+    python rekey_ids.py --dry-run
+    python rekey_ids.py
+
+Run it once, with the API stopped, after upgrading to the ULID id scheme
+(app/database/ids.py). Every database (each shard with LEAD_SHARDS) is
+rewritten in one transaction (with the properties on the main database
+referring to a shard's leads) and then vacuumed, so its primary-key indexes
+are rebuilt in id order. Old ids keep resolving in /api/leads/<id>/... and
+/api/contracts/<id>/... through id_aliases (app/services/rekey.py); renamed
+rows show up in the change feed as a delete of the old id and an insert of
+the new one. Take a full export (export_tables.py) afterwards: incremental
+exports don't carry the deletes of the old ids.
+"""
+
+import argparse
+import sys
+import time
+
+from app.database.schema import migrate_all
+from app.database.shards import MAIN_SHARD, get_shard_router
+from app.services.rekey import rekey_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only count the ids that would be rewritten")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip the VACUUM after rewriting")
+    args = parser.parse_args()
+
+    migrate_all()
+    router = get_shard_router()
+    for name, shard_engine in router.engines.items():
+        started = time.perf_counter()
+        # A shard's leads are referenced from properties on the main database
+        main_database = router.paths[MAIN_SHARD] if name != MAIN_SHARD else None
+        renamed = rekey_ids(shard_engine, dry_run=args.dry_run, main_database=main_database)
+        counts = ", ".join(f"{count:,} {entity}s" for entity, count in renamed.items())
+        if args.dry_run:
+            print(f"🔍 {name}: would rewrite {counts}")
+            continue
+        if any(renamed.values()) and not args.no_vacuum:
+            with shard_engine.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+        print(f"🔑 {name}: rewrote {counts} ({time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,31 @@
 #!/usr/bin/env python3
 """
 Reset database to original sample data
+
+Restores the "original" snapshot (see snapshot.py). Create it once from the
+data you want to come back to:
+
+    python add_sample_data.py && python snapshot.py save original
 """
 
-from app.database.connection import engine
-from app.database.models import Base, Lead, AutomationSequence, Contract
-from sqlalchemy.orm import sessionmaker
+import sys
+
+from app.services.snapshots import SnapshotNotFound, SnapshotStore
+
+SNAPSHOT = "original"
 
-Session = sessionmaker(bind=engine)
-db = Session()
+store = SnapshotStore()
 
 print("🔄 Resetting database to original sample data...")
 
 try:
-    # Clear all data
-    db.query(Lead).delete()
-    db.query(AutomationSequence).delete() 
-    db.query(Contract).delete()
-    db.commit()
-    
-    print("✅ Database cleared!")
-    print("🔄 Run 'python add_sample_data.py' to restore original data")
-    print("📊 Dashboard should show empty states until you reload sample data")
-    
-except Exception as e:
-    print(f"❌ Error: {e}")
-    db.rollback()
-finally:
-    db.close() 
\ No newline at end of file
+    meta = store.restore(SNAPSHOT)
+    print(f"✅ Database restored from snapshot '{SNAPSHOT}' ({meta['created_at'][:19]})")
+    print("📊 Dashboard shows the original data on its next refresh")
+except SnapshotNotFound:
+    print(f"❌ No '{SNAPSHOT}' snapshot yet")
+    print("🔄 Run 'python add_sample_data.py && python snapshot.py save original' to create it")
+    sys.exit(1)
+except ValueError as e:
+    print(f"❌ {e}")
+    sys.exit(1)
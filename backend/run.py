@@ -4,9 +4,13 @@ LeadGen Pro Backend - Phase 1
 Simple script to run the Flask server
 """
 
-from app.main import app
+from app.database.schema import migrate_all
 
 if __name__ == "__main__":
+    # The development server migrates first; production workers only check (migrate.py)
+    migrate_all()
+    from app.main import app
+    
     print("🚀 Starting LeadGen Pro Backend - Phase 1")
     print("📍 API will be available at: http://localhost:8000")
     print("💚 Health Check: http://localhost:8000/health")
@@ -17,4 +21,4 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         debug=True
-    ) 
\ No newline at end of file
+    ) 
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Move existing leads and contracts to the shard that owns their location
+
+    LEAD_SHARDS="huahin=Hua Hin|Cha-am;samui=Koh Samui" python shard_leads.py --dry-run
+    LEAD_SHARDS="huahin=Hua Hin|Cha-am;samui=Koh Samui" python shard_leads.py
+
+Run it once after setting or changing LEAD_SHARDS (app/database/shards.py):
+rows of every database that another shard now owns are copied there with
+their raw payloads and deleted from the source, one batch per transaction.
+Archived leads are restored first and move as hot leads; the next
+archive_leads.py run archives them again on their new shard. Moved rows show up
+in the change feed as a delete on the source and an insert on the target.
+Properties and everything else stay on the main database.
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.database.models import ArchivedLead, Contract, Lead, PayloadBlob, PayloadChunk
+from app.database.schema import migrate_all
+from app.database.shards import get_shard_router
+from app.services.archive import ARCHIVE_BATCH, restore_leads
+from app.services.payload_store import PayloadStore
+
+MOVE_BATCH = 5000
+MOVED_TABLES = [Lead.__table__, Contract.__table__]
+CHANGE_ENTITIES = {"leads": "lead", "contracts": "contract"}
+
+
+def misplaced_locations(conn, router, shard):
+    """{target shard: [locations]} of the rows on `shard` that another shard owns."""
+    targets = {}
+    for (location,) in conn.execute(
+        "SELECT location FROM leads UNION SELECT location FROM leads_archive UNION SELECT location FROM contracts"
+    ):
+        owner = router.shard_for(location)
+        if owner != shard:
+            targets.setdefault(owner, []).append(location)
+    return targets
+
+
+def location_filter(locations):
+    """SQL condition and parameters matching rows in `locations` (None matches NULL)."""
+    named = [location for location in locations if location is not None]
+    clause = f"location IN ({', '.join('?' * len(named))})" if named else "0"
+    if None in locations:
+        clause = f"({clause} OR location IS NULL)"
+    return clause, named
+
+
+def restore_archived(shard_engine, locations):
+    """Bring the archived leads of `locations` back to the hot table, so they move with it."""
+    named = [location for location in locations if location is not None]
+    condition = ArchivedLead.location.in_(named)
+    if None in locations:
+        condition = condition | ArchivedLead.location.is_(None)
+    restored = 0
+    while True:
+        with shard_engine.begin() as conn:
+            lead_ids = conn.execute(select(ArchivedLead.id).where(condition).limit(ARCHIVE_BATCH)).scalars().all()
+            if not lead_ids:
+                return restored
+            restored += restore_leads(conn, lead_ids)["leads"]
+
+
+def move_rows(conn, table, where, params):
+    """Copy the rows of `table` matching `where` into the attached shard, then delete them."""
+    columns = ", ".join(column.name for column in table.columns)
+    moved = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM temp.moving")
+        conn.execute(f"INSERT INTO temp.moving SELECT id FROM main.{table.name} WHERE {where} LIMIT ?",
+                     params + [MOVE_BATCH])
+        count = conn.execute("SELECT COUNT(*) FROM temp.moving").fetchone()[0]
+        if not count:
+            conn.execute("COMMIT")
+            return moved
+        if table is Lead.__table__:
+            for payload_table in (PayloadBlob.__table__, PayloadChunk.__table__):
+                payload_columns = ", ".join(column.name for column in payload_table.columns)
+                conn.execute(
+                    f"INSERT OR IGNORE INTO shard.{payload_table.name} ({payload_columns}) "
+                    f"SELECT {payload_columns} FROM main.{payload_table.name} WHERE digest IN "
+                    f"(SELECT raw_data_ref FROM main.leads WHERE id IN (SELECT id FROM temp.moving))"
+                )
+        conn.execute(f"INSERT INTO shard.{table.name} ({columns}) "
+                     f"SELECT {columns} FROM main.{table.name} WHERE id IN (SELECT id FROM temp.moving)")
+        for schema, op in (("main", "delete"), ("shard", "insert")):
+            conn.execute(f"INSERT INTO {schema}.change_log (entity, entity_id, op, created_at) "
+                         f"SELECT ?, id, ?, ? FROM temp.moving",
+                         (CHANGE_ENTITIES[table.name], op, str(datetime.utcnow())))
+        conn.execute(f"DELETE FROM main.{table.name} WHERE id IN (SELECT id FROM temp.moving)")
+        conn.execute("COMMIT")
+        moved += count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only count the rows that would move")
+    args = parser.parse_args()
+
+    migrate_all()
+    router = get_shard_router()
+    if not router.sharded:
+        print("❌ LEAD_SHARDS is not set; there is nothing to shard")
+        return 1
+
+    started = time.perf_counter()
+    totals = {table.name: 0 for table in MOVED_TABLES}
+    for source, source_engine in router.engines.items():
+        with closing(sqlite3.connect(router.paths[source])) as probe:
+            targets = misplaced_locations(probe, router, source)
+            if args.dry_run:
+                for target, locations in targets.items():
+                    where, params = location_filter(locations)
+                    counts = [
+                        probe.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+                        for table in ("leads", "leads_archive", "contracts")
+                    ]
+                    print(f"🔎 {source} -> {target}: {counts[0] + counts[1]:,} leads "
+                          f"({counts[1]:,} archived), {counts[2]:,} contracts")
+                continue
+        if args.dry_run or not targets:
+            continue
+
+        for target, locations in targets.items():
+            restored = restore_archived(source_engine, locations)
+            if restored:
+                print(f"   • {source}: restored {restored:,} archived leads before moving them")
+
+        source_engine.dispose()  # no pooled connection holds a read lock while rows move
+        with closing(sqlite3.connect(router.paths[source], isolation_level=None)) as conn:
+            conn.execute("CREATE TEMP TABLE moving (id TEXT PRIMARY KEY)")
+            for target, locations in targets.items():
+                where, params = location_filter(locations)
+                conn.execute("ATTACH DATABASE ? AS shard", (router.paths[target],))
+                for table in MOVED_TABLES:
+                    moved = move_rows(conn, table, where, params)
+                    totals[table.name] += moved
+                    print(f"🚚 {source} -> {target}: {moved:,} {table.name} ({time.perf_counter() - started:.1f}s)")
+                conn.execute("DETACH DATABASE shard")
+
+        removed = PayloadStore(source_engine).collect_garbage()
+        if removed:
+            print(f"   • {source}: removed {removed:,} payloads that moved away")
+
+    if not args.dry_run:
+        print(f"✅ Moved {totals['leads']:,} leads and {totals['contracts']:,} contracts "
+              f"in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
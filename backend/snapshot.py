@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Save, restore and list named snapshots of the database
+
+    python snapshot.py save seeded-1m          # after python add_sample_data.py --scale 1m
+    python snapshot.py restore seeded-1m       # back to that state, in seconds
+    python snapshot.py list
+    python snapshot.py delete seeded-1m
+
+Snapshots are page-level copies made with SQLite's backup API
+(app/services/snapshots.py), stored in SNAPSHOT_DIR (default data/snapshots).
+With LEAD_SHARDS set, the shard files are saved and restored with the database.
+A running server picks up a restored database on its next query.
+"""
+
+import argparse
+import sys
+import time
+
+from app.core.config import settings
+from app.services.snapshots import SnapshotNotFound, SnapshotStore
+
+
+def describe(meta):
+    rows = ", ".join(f"{count:,} {table}" for table, count in meta["rows"].items() if count)
+    return f"{meta['name']:<24} {meta['created_at'][:19]}  {meta['size'] / 1_048_576:8.1f} MB  {rows}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["save", "restore", "list", "delete"])
+    parser.add_argument("name", nargs="?", help="snapshot name (letters, digits, '.', '_', '-')")
+    parser.add_argument("--database", default=settings.DATABASE_PATH, help="SQLite file (default: DATABASE_PATH)")
+    parser.add_argument("--directory", default=settings.SNAPSHOT_DIR, help="snapshot directory (default: SNAPSHOT_DIR)")
+    parser.add_argument("--overwrite", action="store_true", help="replace an existing snapshot on save")
+    args = parser.parse_args()
+    if args.command != "list" and not args.name:
+        parser.error(f"{args.command} needs a snapshot name")
+
+    store = SnapshotStore(args.database, args.directory)
+    started = time.perf_counter()
+    try:
+        if args.command == "list":
+            snapshots = store.list()
+            if not snapshots:
+                print(f"📭 No snapshots in {args.directory}")
+            for meta in snapshots:
+                print(describe(meta))
+        elif args.command == "save":
+            meta = store.save(args.name, overwrite=args.overwrite)
+            print(f"📸 Saved {args.database} as {describe(meta)} ({time.perf_counter() - started:.1f}s)")
+        elif args.command == "restore":
+            meta = store.restore(args.name)
+            print(f"⏪ Restored {args.database} from {describe(meta)} ({time.perf_counter() - started:.1f}s)")
+        else:
+            store.delete(args.name)
+            print(f"🗑️  Deleted snapshot {args.name}")
+    except (SnapshotNotFound, FileExistsError, FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
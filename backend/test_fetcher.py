@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test the shared fetcher against a local HTTP server: conditional GETs,
+per-host pacing and the daily budget
+"""
+
+import asyncio
+import hashlib
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.fetcher import DailyBudgetExceeded, Fetcher
+
+LISTING_HTML = "<html><body><span class=\"owner\">สมชาย วงศ์ประโคน</span></body></html>".encode()
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    full_downloads = 0
+    not_modified = 0
+
+    def do_GET(self):
+        etag = '"' + hashlib.md5(LISTING_HTML).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            ListingHandler.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        ListingHandler.full_downloads += 1
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 20 Jan 2025 10:30:00 GMT")
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(LISTING_HTML)))
+        self.end_headers()
+        self.wfile.write(LISTING_HTML)
+
+    def log_message(self, *args):
+        pass
+
+
+async def run_checks(base_url, cache_dir):
+    urls = [f"{base_url}/listing/{i}" for i in range(5)]
+
+    # First crawl downloads everything
+    async with Fetcher(default_delay=0, cache_dir=cache_dir, daily_limit=100) as fetcher:
+        results = [result async for result in fetcher.get_many(urls)]
+    assert all(r.status == 200 and not r.not_modified for r in results), "first crawl should download"
+    assert ListingHandler.full_downloads == 5
+    print("✅ First crawl downloaded 5 pages")
+
+    # Re-crawl of unchanged pages costs only 304s, served from the cache
+    async with Fetcher(default_delay=0, cache_dir=cache_dir, daily_limit=100) as fetcher:
+        results = [result async for result in fetcher.get_many(urls)]
+    assert all(r.not_modified and r.body == LISTING_HTML for r in results), "re-crawl should revalidate"
+    assert ListingHandler.full_downloads == 5 and ListingHandler.not_modified == 5
+    print("✅ Re-crawl answered with 5 x 304 from the on-disk cache")
+
+    # A lazy crawl list is pulled by a bounded set of workers, not all at once
+    pulled = []
+
+    def crawl_list():
+        for i in range(1000):
+            pulled.append(i)
+            yield f"{base_url}/listing/{i % 5}"
+
+    async with Fetcher(default_delay=0, cache_dir=cache_dir, daily_limit=100) as fetcher:
+        async for result in fetcher.get_many(crawl_list(), concurrency=4):
+            break
+    assert len(pulled) <= 16, f"get_many pulled {len(pulled)} URLs for one result"
+    print(f"✅ get_many pulled {len(pulled)} of 1000 URLs for the first result")
+
+    # Per-host token bucket: 4 requests at 0.2s spacing take >= 0.6s
+    async with Fetcher(default_delay=0.2, cache_dir=cache_dir, daily_limit=100) as fetcher:
+        started = time.monotonic()
+        for url in urls[:4]:
+            await fetcher.get(url)
+        elapsed = time.monotonic() - started
+    assert elapsed >= 0.6, f"host pacing not enforced ({elapsed:.2f}s)"
+    print(f"✅ Per-host rate limit held 4 requests to {elapsed:.2f}s")
+
+    # Daily budget is shared across fetchers through the cache directory
+    async with Fetcher(default_delay=0, cache_dir=cache_dir, daily_limit=15) as fetcher:
+        try:
+            for url in urls:
+                await fetcher.get(url)
+        except DailyBudgetExceeded:
+            print(f"✅ Daily budget stopped the crawl after {fetcher.budget.used} requests")
+        else:
+            raise AssertionError("daily budget was not enforced")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ListingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print("🧪 Testing fetcher against", base_url)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            asyncio.run(run_checks(base_url, cache_dir))
+    finally:
+        server.shutdown()
+    print("Test completed")
+
+
+if __name__ == "__main__":
+    main()
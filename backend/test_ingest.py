@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Ingest a fixture dump as a scraping job and read its stored results back
+
+    python test_ingest.py
+    python test_ingest.py --listings 20000
+
+Runs ingest_listings.py on a fresh database in a temporary directory, then
+checks through the API that the job finished and that its results (the run's
+metrics) and error log (the rejected records) are served by
+/api/scraping/jobs/<id>/results and /errors. Exits 1 when a check fails.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ingest-")
+    try:
+        database = os.path.join(workdir, "ingest.db")
+        os.environ.update(DATABASE_PATH=database, LEAD_SHARDS="")
+        dump = os.path.join(workdir, "listings.jsonl")
+        print(f"🚚 Ingesting {args.listings:,} fixture listings...")
+        subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "ingest_listings.py"),
+                        "--generate-fixture", str(args.listings), dump],
+                       cwd=workdir, env=dict(os.environ, PYTHONPATH=BACKEND_DIR), check=True, capture_output=True)
+
+        sys.path.insert(0, BACKEND_DIR)
+        from app.main import app
+        client = app.test_client()
+        jobs = client.get("/api/scraping/jobs").get_json()
+        if len(jobs) != 1 or jobs[0]["status"] != "completed":
+            print(f"❌ Expected one completed job, got {[(job['id'], job['status']) for job in jobs]}")
+            return 1
+        job = jobs[0]
+
+        response = client.get(f"/api/scraping/jobs/{job['id']}/results")
+        results = json.loads(response.data) if response.status_code == 200 else None
+        if not results or results["records_read"] != args.listings:
+            print(f"❌ Results: HTTP {response.status_code}, {results}")
+            return 1
+        print(f"✅ Results: {results['records_read']:,} pages -> {results['leads_inserted']:,} leads")
+
+        response = client.get(f"/api/scraping/jobs/{job['id']}/errors")
+        errors = json.loads(response.data) if response.status_code == 200 else None
+        if not errors or errors["rejected_count"] != job["errorCount"] or len(errors["rejected"]) != job["errorCount"]:
+            print(f"❌ Error log: HTTP {response.status_code}, job counted {job['errorCount']} errors")
+            return 1
+        print(f"✅ Error log: {errors['rejected_count']} rejected records, e.g. {errors['rejected'][:1]}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("Test completed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
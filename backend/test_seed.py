@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Seed determinism: the same --scale and --seed must give a byte-identical file
+
+    python test_seed.py                         # two 10k-lead seeds
+    python test_seed.py --scale 100k --seed 7
+
+Each seed runs add_sample_data.py in its own interpreter, into a temporary
+directory, so anything that varies between processes (set and dict order of
+the SQLAlchemy metadata, hash randomization) shows up as a different file.
+Exits 1 when the two files differ, and prints the first differing pages.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGE_SIZE = 4096
+
+
+def seed(path, scale, seed_value, workdir):
+    env = dict(os.environ, DATABASE_PATH=path, LEAD_SHARDS="", PYTHONPATH=BACKEND_DIR)
+    subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "add_sample_data.py"),
+                    "--scale", scale, "--seed", str(seed_value), "--database", path],
+                   cwd=workdir, env=env, check=True, capture_output=True)
+    with open(path, "rb") as database:
+        return database.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="seed-")
+    try:
+        print(f"🌱 Seeding {args.scale} leads (seed {args.seed}) twice...")
+        first = seed(os.path.join(workdir, "first.db"), args.scale, args.seed, workdir)
+        second = seed(os.path.join(workdir, "second.db"), args.scale, args.seed, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    digests = [hashlib.sha256(content).hexdigest() for content in (first, second)]
+    if digests[0] == digests[1]:
+        print(f"✅ Identical files: {len(first):,} bytes, sha256 {digests[0][:16]}")
+        print("Test completed")
+        return 0
+    pages = [number + 1 for number in range(max(len(first), len(second)) // PAGE_SIZE)
+             if first[number * PAGE_SIZE:(number + 1) * PAGE_SIZE] != second[number * PAGE_SIZE:(number + 1) * PAGE_SIZE]]
+    print(f"❌ Files differ: {len(first):,} vs {len(second):,} bytes, pages {pages[:10]}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
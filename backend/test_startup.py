@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Startup-time budget: import-to-first-request latency of a fresh API worker
+
+    python test_startup.py                      # 5 cold starts on a seeded 10k-lead database
+    python test_startup.py --database leadgen_pro.db --runs 10 --budget 0.5
+
+Each run starts a new interpreter, imports app.main and serves GET /health,
+the way an autoscaled worker starts. The median time from the import to the
+first response must stay within the budget; the script also checks that
+startup leaves the database file untouched (workers only check the schema
+version) and that a worker refuses to start on a database with pending
+migrations. Exits 1 when a check fails.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+STARTUP_BUDGET = 0.5  # seconds, median import-to-first-request
+
+WORKER = """
+import json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+response = app.test_client().get("/health")
+served = time.perf_counter()
+print(json.dumps({"import": imported - started, "first_request": served - imported, "status": response.status_code}))
+"""
+
+
+def start_worker(database, workdir):
+    """Run one cold start; returns the worker's timings and its exit code / stderr."""
+    env = dict(os.environ, DATABASE_PATH=database, LEAD_SHARDS="", PYTHONPATH=BACKEND_DIR)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", WORKER], cwd=workdir, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    timings = json.loads(result.stdout.strip().splitlines()[-1]) if result.returncode == 0 else None
+    return timings, wall, result
+
+
+def prepare_database(source, workdir):
+    """A migrated copy of `source`, or a freshly seeded 10k-lead database."""
+    from sqlalchemy import create_engine
+    from app.database.schema import init_db
+    from app.services.seed import seed_database
+
+    path = os.path.join(workdir, "startup.db")
+    if source:
+        shutil.copyfile(source, path)
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    if not source:
+        seed_database(engine, 10_000)
+    engine.dispose()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", help="copy this database instead of seeding one")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET, help="seconds (default: %(default)s)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-")
+    failures = []
+    try:
+        database = prepare_database(args.database, workdir)
+        before = os.stat(database).st_mtime_ns
+
+        print(f"🚀 {args.runs} cold starts on {args.database or 'a seeded 10k-lead database'}")
+        totals = []
+        for run in range(args.runs):
+            timings, wall, result = start_worker(database, workdir)
+            if timings is None or timings["status"] != 200:
+                print(f"❌ Worker failed:\n{result.stderr}")
+                return 1
+            total = timings["import"] + timings["first_request"]
+            totals.append(total)
+            print(f"   • run {run + 1}: import {timings['import'] * 1000:.0f} ms, "
+                  f"first request {timings['first_request'] * 1000:.0f} ms, process {wall * 1000:.0f} ms")
+        median = statistics.median(totals)
+        if median > args.budget:
+            failures.append(f"median import-to-first-request {median * 1000:.0f} ms over the "
+                            f"{args.budget * 1000:.0f} ms budget")
+        print(f"{'✅' if median <= args.budget else '❌'} Median {median * 1000:.0f} ms "
+              f"(budget {args.budget * 1000:.0f} ms)")
+
+        if os.stat(database).st_mtime_ns != before:
+            failures.append("startup wrote to the database")
+        print(f"{'✅' if os.stat(database).st_mtime_ns == before else '❌'} Startup left the database untouched")
+
+        with sqlite3.connect(database) as conn:
+            conn.execute("PRAGMA user_version = 0")
+        _, _, result = start_worker(database, workdir)
+        refused = result.returncode != 0 and "migrate.py" in result.stderr
+        if not refused:
+            failures.append("a worker started on a database with pending migrations")
+        print(f"{'✅' if refused else '❌'} A database with pending migrations is refused")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
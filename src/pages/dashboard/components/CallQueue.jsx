@@ -136,7 +136,7 @@ const CallQueue = () => {
             <div className="flex items-center space-x-4">
               <div className="relative">
                 <Image 
-                  src={lead.property_image}
+                  src={lead.property_image || '/assets/images/no_image.png'}
                   alt="Property"
                   className="w-12 h-12 rounded-lg object-cover"
                 />
@@ -1,72 +1,58 @@
 import React, { useState, useEffect } from 'react';
 import Icon from 'components/AppIcon';
+import ApiService from '../../../services/api';
+
+// Keyed by the stored scraping_jobs.source values
+const SOURCE_ICONS = {
+  facebook: 'Facebook',
+  google_maps: 'MapPin',
+  thai_sites: 'Globe',
+  website: 'Globe',
+  dump: 'FileText'
+};
+
+const SOURCE_LABELS = {
+  facebook: 'Facebook Groups',
+  google_maps: 'Google Maps',
+  thai_sites: 'Thai Classifieds',
+  website: 'Website',
+  dump: 'Listing Dump'
+};
 
 const ScrapingStatus = () => {
   const [refreshTime, setRefreshTime] = useState(new Date());
+  const [scrapingJobs, setScrapingJobs] = useState([]);
 
   useEffect(() => {
-    const timer = setInterval(() => {
-      setRefreshTime(new Date());
-    }, 30000); // Update every 30 seconds
-
-    return () => clearInterval(timer);
+    loadScrapingJobs();
   }, []);
 
-  // Mock data for scraping jobs
-  const scrapingJobs = [
-    {
-      id: 1,
-      source: "Facebook Groups",
-      icon: "Facebook",
-      status: "running",
-      progress: 67,
-      totalTargets: 15,
-      completedTargets: 10,
-      leadsFound: 234,
-      estimatedCompletion: "12 minutes",
-      lastUpdate: "2 minutes ago",
-      color: "primary"
-    },
-    {
-      id: 2,
-      source: "Google Maps",
-      icon: "MapPin",
-      status: "running",
-      progress: 89,
-      totalTargets: 8,
-      completedTargets: 7,
-      leadsFound: 156,
-      estimatedCompletion: "4 minutes",
-      lastUpdate: "1 minute ago",
-      color: "accent"
-    },
-    {
-      id: 3,
-      source: "Thai Classifieds",
-      icon: "Globe",
-      status: "completed",
-      progress: 100,
-      totalTargets: 12,
-      completedTargets: 12,
-      leadsFound: 89,
-      estimatedCompletion: "Completed",
-      lastUpdate: "5 minutes ago",
-      color: "success"
-    },
-    {
-      id: 4,
-      source: "Pantip Forum",
-      icon: "MessageSquare",
-      status: "queued",
-      progress: 0,
-      totalTargets: 6,
-      completedTargets: 0,
-      leadsFound: 0,
-      estimatedCompletion: "Waiting...",
-      lastUpdate: "Queued",
-      color: "warning"
+  // Running jobs push their progress over a server-sent event stream instead
+  // of the whole job list being re-polled
+  useEffect(() => {
+    const streams = scrapingJobs
+      .filter(job => job.status === 'running')
+      .map(job => ApiService.streamScrapingProgress(job.id, (progress) => {
+        setScrapingJobs(jobs => jobs.map(j => (j.id === progress.id ? { ...j, ...progress } : j)));
+        setRefreshTime(new Date());
+      }));
+
+    return () => streams.forEach(stream => stream.close());
+  }, [scrapingJobs.map(job => `${job.id}:${job.status}`).join(',')]);
+
+  const loadScrapingJobs = async () => {
+    try {
+      const jobs = await ApiService.getScrapingJobs();
+      setScrapingJobs(jobs.map(job => ({
+        ...job,
+        icon: SOURCE_ICONS[job.source] || 'Search',
+        sourceLabel: SOURCE_LABELS[job.source] || job.source
+      })));
+      setRefreshTime(new Date());
+    } catch (error) {
+      console.error('Failed to load scraping jobs:', error);
     }
-  ];
+  };
 
   const getStatusColor = (status) => {
     const statusMap = {
@@ -99,7 +85,7 @@ const ScrapingStatus = () => {
   };
 
   const totalActiveJobs = scrapingJobs.filter(job => job.status === 'running').length;
-  const totalLeadsToday = scrapingJobs.reduce((sum, job) => sum + job.leadsFound, 0);
+  const totalLeadsToday = scrapingJobs.reduce((sum, job) => sum + job.itemsFound, 0);
 
   return (
     <div className="bg-surface rounded-lg border border-border">
@@ -118,7 +104,7 @@ const ScrapingStatus = () => {
                 {refreshTime.toLocaleTimeString('th-TH', { hour: '2-digit', minute: '2-digit' })}
               </div>
             </div>
-            <button className="p-2 rounded-lg hover:bg-secondary-50 nav-transition">
+            <button onClick={loadScrapingJobs} className="p-2 rounded-lg hover:bg-secondary-50 nav-transition">
               <Icon name="RefreshCw" size={16} className="text-text-secondary" />
             </button>
           </div>
@@ -155,9 +141,9 @@ const ScrapingStatus = () => {
                     <Icon name={job.icon} size={20} className="text-text-secondary" />
                   </div>
                   <div>
-                    <h3 className="font-medium text-text-primary">{job.source}</h3>
+                    <h3 className="font-medium text-text-primary">{job.sourceLabel}</h3>
                     <p className="text-sm text-text-secondary">
-                      {job.completedTargets}/{job.totalTargets} targets • {job.leadsFound} leads
+                      {job.targetLocation} • {job.itemsFound} leads • {job.errorCount} errors
                     </p>
                   </div>
                 </div>
@@ -188,11 +174,13 @@ const ScrapingStatus = () => {
               <div className="grid grid-cols-2 gap-4 text-sm">
                 <div>
                   <span className="text-text-secondary">Estimated Completion:</span>
-                  <div className="font-medium text-text-primary">{job.estimatedCompletion}</div>
+                  <div className="font-medium text-text-primary">{job.estimatedCompletion || '—'}</div>
                 </div>
                 <div>
                   <span className="text-text-secondary">Last Update:</span>
-                  <div className="font-medium text-text-primary">{job.lastUpdate}</div>
+                  <div className="font-medium text-text-primary">
+                    {job.lastUpdate ? new Date(job.lastUpdate).toLocaleTimeString('th-TH', { hour: '2-digit', minute: '2-digit' }) : '—'}
+                  </div>
                 </div>
               </div>
 
@@ -133,6 +133,24 @@ class ApiService {
     });
   }
 
+  // Scraping
+  async getScrapingJobs() {
+    return this.request('/api/scraping/jobs');
+  }
+
+  // Server-sent progress events for one job; call .close() on the result to stop
+  streamScrapingProgress(jobId, onProgress) {
+    const source = new EventSource(`${API_BASE_URL}/api/scraping/jobs/${jobId}/progress`);
+    source.onmessage = (event) => {
+      const progress = JSON.parse(event.data);
+      onProgress(progress);
+      if (['completed', 'failed', 'paused'].includes(progress.status)) {
+        source.close();
+      }
+    };
+    return source;
+  }
+
   // Health check
   async healthCheck() {
     return this.request('/health');